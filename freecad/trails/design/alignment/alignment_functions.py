@@ -27,6 +27,7 @@ Define Alignment Object functions.
 
 import FreeCAD
 import Draft, Part
+import numpy as np
 
 from .alignment_model import AlignmentModel
 from ..geometry import support
@@ -37,37 +38,23 @@ from copy import deepcopy
 
 class DataFunctions:
     def get_shape(self, lines, curves, spirals, base):
-        line_obj = []
-        for line in lines:
-            points = []
-            for pnt in line:
-                points.append(FreeCAD.Vector(pnt).sub(base))
-            wire = Part.makePolygon(points)
-            line_obj.append(wire)
-
-        line_comp = Part.makeCompound(line_obj)
-
-        curve_obj = []
-        for curve in curves:
-            points = []
-            for pnt in curve:
-                points.append(FreeCAD.Vector(pnt).sub(base))
-            wire = Part.makePolygon(points)
-            curve_obj.append(wire)
-
-        curve_comp = Part.makeCompound(curve_obj)
-
-        spiral_obj = []
-        for spiral in spirals:
-            points = []
-            for pnt in spiral:
-                points.append(FreeCAD.Vector(pnt).sub(base))
-            wire = Part.makePolygon(points)
-            spiral_obj.append(wire)
-
-        spiral_comp = Part.makeCompound(spiral_obj)
-
-        return Part.makeCompound([line_comp, curve_comp, spiral_comp])
+        """
+        Return a compound of line, curve and spiral wires from point arrays.
+        Points become vectors only here, when the shape is built.
+        """
+        base = tuple(base)
+
+        compounds = []
+        for group in (lines, curves, spirals):
+            wires = []
+            for points in group:
+                points = (np.asarray(points, dtype=float) - base).tolist()
+                wires.append(
+                    Part.makePolygon([FreeCAD.Vector(*pnt) for pnt in points]))
+
+            compounds.append(Part.makeCompound(wires))
+
+        return Part.makeCompound(compounds)
 
     def initialize_model(self, model, obj):
         """
@@ -25,10 +25,13 @@
 Class for managing 2D Horizontal Alignment data
 """
 import ast
+import math
+import numpy
 
 from FreeCAD import Vector
 
 from ..project.support import units
+from ..project.support.utils import Constants as C
 from ..geometry import arc, line, spiral, support
 from freecad_python_support.tuple_math import TupleMath
 
@@ -54,6 +57,8 @@ class AlignmentModel:
         """
         self.errors = []
         self.data = []
+        self.station_index = None
+        self.projection_index = None
 
         if geometry:
             if not self.construct_geometry(geometry, zero_reference):
@@ -91,6 +96,8 @@ class AlignmentModel:
             geometry = ast.literal_eval(geometry)
 
         self.data = geometry
+        self.station_index = None
+        self.projection_index = None
         _geometry = []
 
         for _i, _geo in enumerate(self.data.get('geometry')):
@@ -142,10 +149,121 @@ class AlignmentModel:
         if zero_reference:
             self.zero_reference_coordinates()
 
-        #run discretization to force coordinate transformation updates
+        #index the updated geometry for station lookups
+        self.build_station_index()
 
         return True
 
+    @staticmethod
+    def get_equation_table(start_station, equations):
+        """
+        Return the stations where the parts between station equations
+        begin and end and their distances from the alignment start
+        """
+
+        begins = [start_station]
+        ends = []
+        positions = [0.0]
+
+        for _eq in equations:
+
+            ends.append(_eq['Back'])
+            positions.append(positions[-1] + _eq['Back'] - begins[-1])
+            begins.append(_eq['Ahead'])
+
+        ends.append(numpy.inf)
+
+        return numpy.array(begins, dtype=float), \
+            numpy.array(ends, dtype=float), numpy.array(positions)
+
+    def build_station_index(self):
+        """
+        Build the internal start stations of the geometry and the station
+        equation tables once, so stations are located by binary search
+        """
+
+        self.station_index = None
+
+        geometry = self.data.get('geometry')
+        start_sta = self.data.get('meta').get('StartStation')
+
+        if not start_sta:
+            start_sta = 0.0
+
+        eqs = self.data.get('station')
+
+        if not eqs:
+            eqs = []
+
+        self.station_index = {
+            'Geometry': numpy.array(
+                [_v.get('InternalStation')[0] for _v in geometry], dtype=float),
+            'Internal': self.get_equation_table(start_sta, eqs[1:]),
+            'Alignment': self.get_equation_table(start_sta, [
+                _eq for _eq in eqs[1:]
+                if _eq['Description'] == _eq['Alignment']]),
+        }
+
+    def get_internal_stations(self, stations):
+        """
+        Return the internal stations of an array of stations, scaled to
+        the document units, using the station index
+        """
+
+        if not self.station_index:
+            self.build_station_index()
+
+        _stations = numpy.asarray(stations, dtype=float).reshape(-1)
+        begins, ends, positions = self.station_index['Internal']
+
+        #parts between equations follow each other unless an equation
+        #steps back, then the first part holding the station is used
+        if numpy.all(ends[:-1] <= begins[1:]):
+            _part = numpy.searchsorted(ends, _stations, side='right')
+
+        else:
+            _match = (begins <= _stations[:, None]) & (_stations[:, None] < ends)
+            _part = numpy.where(
+                _match.any(axis=1), _match.argmax(axis=1), len(ends) - 1)
+
+        _part = numpy.minimum(_part, len(ends) - 1)
+        position = positions[_part] + _stations - begins[_part]
+        position[numpy.abs(position) < C.TOLERANCE] = 0.0
+
+        return position * units.scale_factor()
+
+    def get_alignment_stations(self, internal_stations):
+        """
+        Return the alignment stations of an array of internal stations,
+        using the station index
+        """
+
+        if not self.station_index:
+            self.build_station_index()
+
+        _dist = numpy.asarray(internal_stations, dtype=float).reshape(-1) \
+            / units.scale_factor()
+
+        begins, ends, positions = self.station_index['Alignment']
+
+        #part holding each distance
+        _part = numpy.searchsorted(positions[1:], _dist, side='left')
+
+        return begins[_part] + _dist - positions[_part]
+
+    def locate_curves(self, stations):
+        """
+        Return the geometry indices of an array of stations, -1 before the
+        first geometry, and their internal stations
+        """
+
+        int_stas = self.get_internal_stations(stations)
+
+        _index = numpy.searchsorted(
+            self.station_index['Geometry'], int_stas, side='right') - 1
+
+        return _index, int_stas
+
     def zero_reference_coordinates(self):
         """
         Reference the coordinates to the start point
@@ -552,6 +670,9 @@ class AlignmentModel:
         Using the station equations, determine the internal station
         (position) along the alignment, scaled to the document units
         """
+
+        if self.station_index:
+            return float(self.get_internal_stations([station])[0])
         start_sta = self.data.get('meta').get('StartStation')
 
         if not start_sta:
@@ -593,6 +714,9 @@ class AlignmentModel:
         if internal_station is None:
             return None
 
+        if self.station_index:
+            return float(self.get_alignment_stations([internal_station])[0])
+
         _start_sta = self.data.get('meta').get('StartStation')
         _dist = internal_station
 
@@ -618,44 +742,342 @@ class AlignmentModel:
     def get_station_offset(self, coordinate):
         """
         Locate the provided coordinate along the alignment, returning
-        the internal station or None if not within tolerance.
+        the internal station, offset and geometry index, or None if the
+        coordinate does not project on the alignment.
         """
 
-        _matches = []
-        _classes = {'Line': line, 'Curve': arc, 'Spiral': spiral}
+        int_stas, offsets, indices = self.project_points([tuple(coordinate)])
 
-        #iterate the geometry, creating a list of potential matches
-        for _i, _v in enumerate(self.data.get('geometry')):
+        if indices[0] < 0:
+            return None, None
 
-            _class = _classes[_v.get('Type')]
+        return float(int_stas[0]), float(offsets[0]), int(indices[0])
 
-            _pos, _dist, _b = _class.get_position_offset(_v, coordinate)
+    def get_geometry_bounds(self, samples=32):
+        """
+        Return (m, 2) arrays of lower and upper corners of the geometry
+        bounding boxes, from points sampled along each element and
+        padded for the bulge between them
+        """
 
-            #if position is before geometry, quit
-            if _b < 0:
-                break
+        geometry = self.data.get('geometry')
 
-            #if position is after geometry, skip to next
-            if _b > 0:
-                continue
+        lower = numpy.zeros((len(geometry), 2))
+        upper = numpy.zeros((len(geometry), 2))
 
-            #save result
-            _matches.append((_pos, _dist, _i))
+        _fn = {
+            'Line': line,
+            'Curve': arc,
+            'Spiral': spiral,
+        }
 
-        if not _matches:
-            return None, None
+        for _i, curve in enumerate(geometry):
+
+            _length = curve.get('Length')
+            _coords = _fn[curve.get('Type')].get_tangent_vectors(
+                curve, numpy.linspace(0.0, _length, samples + 1))[0][:, :2]
+
+            _pad = _length / samples / 4.0
+
+            lower[_i] = _coords.min(axis=0) - _pad
+            upper[_i] = _coords.max(axis=0) + _pad
+
+        return lower, upper
+
+    @staticmethod
+    def get_cell_ranges(first, last, shape):
+        """
+        Expand (n, 2) first and last grid cells of boxes, clipped to the
+        grid shape, returning the owning box and the flat index of each
+        cell
+        """
+
+        _first = numpy.maximum(first, 0)
+        _last = numpy.minimum(last, shape - 1)
+
+        _width = numpy.maximum(_last - _first + 1, 0)
+        _counts = _width[:, 0] * _width[:, 1]
+        _owner = numpy.repeat(numpy.arange(len(_first)), _counts)
+        _offset = numpy.arange(_counts.sum()) \
+            - numpy.repeat(numpy.cumsum(_counts) - _counts, _counts)
+
+        _cell = (_first[_owner, 0] + _offset // _width[_owner, 1]) * shape[1] \
+            + _first[_owner, 1] + _offset % _width[_owner, 1]
+
+        return _owner, _cell
+
+    def build_projection_index(self):
+        """
+        Build a uniform grid over the geometry bounding boxes.  Points
+        are tested only against the geometry registered in the rings of
+        cells around them, nearest first.
+        """
+
+        lower, upper = self.get_geometry_bounds()
+
+        origin = lower.min(axis=0)
+        size = max(float(numpy.mean(upper - lower)), 1e-6)
+        shape = (numpy.floor((upper.max(axis=0) - origin) / size) + 1)\
+            .astype(numpy.int64)
+
+        _owner, _cell = self.get_cell_ranges(
+            numpy.floor((lower - origin) / size).astype(numpy.int64),
+            numpy.floor((upper - origin) / size).astype(numpy.int64),
+            shape
+        )
+
+        _order = numpy.argsort(_cell, kind='stable')
+        _start = numpy.searchsorted(
+            _cell[_order], numpy.arange(shape[0] * shape[1] + 1))
+
+        #ring distance from each cell to the nearest occupied cell,
+        #dilating the occupied cells one ring at a time
+        _reached = (numpy.diff(_start) > 0).reshape(shape)
+        _empty = numpy.zeros(tuple(shape), dtype=numpy.int64)
+        _ring = 0
+
+        while not _reached.all():
+
+            _ring += 1
+            _grow = _reached.copy()
+            _grow[1:] |= _reached[:-1]
+            _grow[:-1] |= _reached[1:]
+
+            _rows = _grow.copy()
+            _grow[:, 1:] |= _rows[:, :-1]
+            _grow[:, :-1] |= _rows[:, 1:]
+
+            _empty[_grow & ~_reached] = _ring
+            _reached = _grow
+
+        self.projection_index = {
+            'Origin': origin,
+            'Size': size,
+            'Shape': shape,
+            'Lower': lower,
+            'Upper': upper,
+            'Elements': _owner[_order],
+            'Start': _start,
+            'Empty': _empty.ravel(),
+        }
+
+    def project_points(self, points, max_offset=None, chunk=20000):
+        """
+        Project (n, 2) or (n, 3) points on the alignment.  Return arrays
+        of internal stations, offsets to the left of the alignment and
+        geometry indices.  Where a point projects on several elements,
+        the closest one is used.  Points which do not project on the
+        alignment within max_offset are NaN, with index -1.
+        """
+
+        _points = numpy.asarray(points, dtype=float)
+        _points = _points.reshape(len(_points), -1)[:, :2]
+
+        int_stas = numpy.full(len(_points), numpy.nan)
+        offsets = numpy.full(len(_points), numpy.nan)
+        indices = numpy.full(len(_points), -1, dtype=numpy.int64)
+
+        geometry = self.data.get('geometry')
+
+        if not geometry or not len(_points):
+            return int_stas, offsets, indices
+
+        if not self.station_index:
+            self.build_station_index()
+
+        if not self.projection_index:
+            self.build_projection_index()
+
+        #search in chunks of points to bound memory use
+        for _begin in range(0, len(_points), chunk):
+
+            _part = slice(_begin, _begin + chunk)
 
-        #get the distances
-        _dists = [_v[1] for _v in _matches]
+            int_stas[_part], offsets[_part], indices[_part] = \
+                self.project_nearest(_points[_part], max_offset)
 
-        #return the closest match
-        return _matches[_dists.index(min(_dists))]
+        return int_stas, offsets, indices
+
+    def project_nearest(self, points, max_offset=None):
+        """
+        Project (n, 2) points on the alignment, searching rings of grid
+        cells outward from each point until no unsearched cell can hold
+        a closer projection
+        """
+
+        _index = self.projection_index
+        geometry = self.data.get('geometry')
+
+        shape = _index['Shape']
+        size = _index['Size']
+
+        _fn = {
+            'Line': line,
+            'Curve': arc,
+            'Spiral': spiral,
+        }
+
+        best = numpy.full(len(points), numpy.inf)
+        distances = numpy.full(len(points), numpy.nan)
+        offsets = numpy.full(len(points), numpy.nan)
+        indices = numpy.full(len(points), -1, dtype=numpy.int64)
+
+        if max_offset is not None:
+            best[:] = max_offset
+
+        #cell of each point, which may lie outside the grid
+        _center = numpy.floor((points - _index['Origin']) / size)\
+            .astype(numpy.int64)
+
+        #first ring holding geometry and last ring needed to cover the grid
+        _ring = numpy.maximum(
+            numpy.maximum(-_center, _center - shape + 1), 0).max(axis=1)
+
+        _clip = numpy.clip(_center, 0, shape - 1)
+        _ring = numpy.maximum(
+            _ring, _index['Empty'][_clip[:, 0] * shape[1] + _clip[:, 1]])
+
+        _last = numpy.maximum(_center, shape - 1 - _center).max(axis=1)
+
+        _active = numpy.arange(len(points))
+
+        while len(_active):
+
+            _k = _ring[_active]
+            _best = best[_active]
+
+            #once a projection is found, search every ring within reach
+            _hit = numpy.isfinite(_best)
+            _out = _k.copy()
+            _out[_hit] = numpy.maximum(
+                _k[_hit], numpy.ceil(_best[_hit] / size).astype(numpy.int64))
+
+            _out = numpy.minimum(_out, _last[_active])
+
+            #test all geometry where the rings hold more cells than that
+            _full = (2 * _out + 1) ** 2 > len(geometry)
+
+            _ringed = _active[~_full]
+            _x, _y = _center[_ringed, :1], _center[_ringed, 1:]
+            _k, _o = _k[~_full, None], _out[~_full, None]
+
+            #ring cells as top and bottom rows and left and right columns
+            _first = numpy.concatenate([
+                numpy.hstack([_x - _o, _y + _k]),
+                numpy.hstack([_x - _o, _y - _o]),
+                numpy.hstack([_x - _o, _y - _k + 1]),
+                numpy.hstack([_x + _k, _y - _k + 1])])
+
+            _lastc = numpy.concatenate([
+                numpy.hstack([_x + _o, _y + _o]),
+                numpy.hstack([_x + _o, _y - _k]),
+                numpy.hstack([_x - _k, _y + _k - 1]),
+                numpy.hstack([_x + _o, _y + _k - 1])])
+
+            _owner, _cell = self.get_cell_ranges(_first, _lastc, shape)
+            _owner = _ringed[_owner % max(len(_ringed), 1)]
+
+            _counts = _index['Start'][_cell + 1] - _index['Start'][_cell]
+            _pair = numpy.repeat(numpy.arange(len(_cell)), _counts)
+            _offset = numpy.arange(_counts.sum()) \
+                - numpy.repeat(numpy.cumsum(_counts) - _counts, _counts)
+
+            _point = _owner[_pair]
+            _element = _index['Elements'][
+                _index['Start'][_cell][_pair] + _offset]
+
+            #ring pairs once each, then every element for the rest
+            _key = numpy.unique(_point * len(geometry) + _element)
+
+            _point = numpy.concatenate([
+                _key // len(geometry),
+                numpy.repeat(_active[_full], len(geometry))])
+
+            _element = numpy.concatenate([
+                _key % len(geometry),
+                numpy.tile(numpy.arange(len(geometry)), _full.sum())])
+
+            #skip boxes farther than the best so far
+            _gap = numpy.maximum(
+                numpy.maximum(_index['Lower'][_element] - points[_point],
+                    points[_point] - _index['Upper'][_element]), 0.0)
+
+            _near = numpy.hypot(_gap[:, 0], _gap[:, 1]) <= best[_point]
+            _point, _element = _point[_near], _element[_near]
+
+            _dist = numpy.full(len(_point), numpy.nan)
+            _off = numpy.full(len(_point), numpy.nan)
+
+            _order = numpy.argsort(_element, kind='stable')
+            _ids, _groups = numpy.unique(_element[_order], return_index=True)
+            _groups = numpy.append(_groups, len(_order))
+
+            for _j, _i in enumerate(_ids):
+
+                _rows = _order[_groups[_j]:_groups[_j + 1]]
+                curve = geometry[_i]
+
+                _dist[_rows], _off[_rows] = \
+                    _fn[curve.get('Type')].get_position_offsets(
+                        curve, points[_point[_rows]])
+
+            #closest projection of each point, kept if nearer than before
+            _valid = ~numpy.isnan(_dist)
+            _valid[_valid] = numpy.abs(_off[_valid]) <= best[_point[_valid]]
+
+            _point, _element = _point[_valid], _element[_valid]
+            _dist, _off = _dist[_valid], _off[_valid]
+
+            _order = numpy.lexsort((numpy.abs(_off), _point))
+            _keep = numpy.ones(len(_order), dtype=bool)
+            _keep[1:] = _point[_order][1:] != _point[_order][:-1]
+            _order = _order[_keep]
+
+            _point = _point[_order]
+            best[_point] = numpy.abs(_off[_order])
+            indices[_point] = _element[_order]
+            offsets[_point] = _off[_order]
+            distances[_point] = _dist[_order]
+
+            #unsearched cells lie at least one ring width away
+            _done = _full | (best[_active] <= _out * size) \
+                | (_out >= _last[_active])
+
+            _ring[_active] = _out + 1
+            _active = _active[~_done]
+
+        _found = indices >= 0
+
+        int_stas = numpy.full(len(points), numpy.nan)
+        int_stas[_found] = distances[_found] \
+            + self.station_index['Geometry'][indices[_found]]
+
+        return int_stas, offsets, indices
+
+    def get_station_offsets(self, points, max_offset=None):
+        """
+        Return arrays of alignment stations, offsets to the left of the
+        alignment and geometry indices of (n, 2) or (n, 3) points
+        """
+
+        int_stas, offsets, indices = self.project_points(points, max_offset)
+
+        return self.get_alignment_stations(int_stas), offsets, indices
 
     def locate_curve(self, station):
         """
         Retrieve the curve at the specified station
         """
 
+        if self.station_index:
+
+            _index = self.locate_curves([station])[0][0]
+
+            if _index < 0:
+                return None
+
+            return self.data.get('geometry')[_index]
+
         int_station = self.get_internal_station(station)
 
         if int_station is None:
@@ -729,12 +1151,77 @@ class AlignmentModel:
 
         return None
 
+    def get_tangents(self, stations):
+        """
+        Return coordinates and unit tangent vectors at stations along the
+        alignment as (n, 3) arrays.  Stations are grouped by geometry and
+        each group is evaluated at once.  Rows of stations which can not
+        be located are NaN.
+        """
+
+        _stations = numpy.asarray(stations, dtype=float).reshape(-1)
+
+        coords = numpy.full((len(_stations), 3), numpy.nan)
+        tangents = numpy.full((len(_stations), 3), numpy.nan)
+
+        geometry = self.data.get('geometry')
+
+        if not geometry:
+            return coords, tangents
+
+        #index of the last geometry starting at or before each station
+        _index, int_stas = self.locate_curves(_stations)
+        _starts = self.station_index['Geometry']
+
+        _fn = {
+            'Line': line,
+            'Curve': arc,
+            'Spiral': spiral,
+        }
+
+        _order = numpy.argsort(_index, kind='stable')
+        _groups = numpy.searchsorted(
+            _index[_order], numpy.arange(len(geometry) + 1))
+
+        for _i, curve in enumerate(geometry):
+
+            _rows = _order[_groups[_i]:_groups[_i + 1]]
+
+            if not len(_rows) or curve.get('Type') not in _fn:
+                continue
+
+            coords[_rows], tangents[_rows] = \
+                _fn[curve.get('Type')].get_tangent_vectors(
+                    curve, int_stas[_rows] - _starts[_i])
+
+        return coords, tangents
+
+    def get_orthogonals(self, stations, side):
+        """
+        Return coordinates and unit vectors orthogonal to the alignment
+        at stations as (n, 3) arrays, directed to the indicated side
+        """
+
+        _dir = 1.0
+
+        if side.lower() in ['r', 'rt', 'right']:
+            _dir = -1.0
+
+        coords, tangents = self.get_tangents(stations)
+
+        orthos = numpy.column_stack([
+            -tangents[:, 1], tangents[:, 0], tangents[:, 2]]) * _dir
+
+        return coords, orthos
+
     def discretize_geometry(self, interval=None, method='Segment', delta=10.0, types=False):
         """
-        Discretizes the alignment geometry to a series of vector points
+        Discretizes the alignment geometry to a (n, 3) array of points
         interval - the starting internal station and length of curve
         method - method of discretization
         delta - discretization interval parameter
+        types - also return lists of point arrays of curves, spirals
+                and lines
         """
 
         geometry = self.data.get('geometry')
@@ -791,55 +1278,46 @@ class AlignmentModel:
 
             if curve.get('Type') == 'Curve':
 
-                _pts = arc.get_points(
+                _pts = arc.get_point_array(
                     curve, size=delta, method=method, interval=_arc_int)
 
-                if _pts:
+                if _pts is not None:
                     points.append(_pts)
-                    curves.append([(i.x, i.y, i.z) for i in _pts])
+                    curves.append(_pts)
 
             elif curve.get('Type') == 'Spiral':
 
-                _pts = spiral.get_points(curve, size=delta, method=method)
+                _pts = spiral.get_point_array(curve, size=delta, method=method)
 
-                if _pts:
+                if _pts is not None:
                     points.append(_pts)
-                    spirals.append([(i.x, i.y, i.z) for i in _pts])
+                    spirals.append(_pts)
 
             else:
 
-                _start_coord = line.get_coordinate(
-                    curve.get('Start'), curve.get('BearingIn'), _arc_int[0])
+                _pts = line.get_tangent_vectors(
+                    curve, [_arc_int[0], _arc_int[0] + _arc_int[1]])[0]
 
-                _end_coord = line.get_coordinate(
-                    _start_coord, curve.get('BearingIn'), _arc_int[1])
-
-                points.append([_start_coord, _end_coord])
-                lines.append([_start_coord, _end_coord])
+                points.append(_pts)
+                lines.append(_pts)
 
             last_curve = curve
 
-        #store the last point of the first geometry for the next iteration
-        _prev = points[0][-1]
-        result = points[0]
-
-        if not (_prev and result):
+        if not points:
             return None
 
-        #iterate the point sets, adding them to the result set
-        #and eliminating any duplicate points
-        for item in points[1:]:
+        result = numpy.vstack(points)
 
-            _v = item
+        #eliminate duplicate points where the point sets meet,
+        #which are within a hundredth of a foot of each other
+        _sizes = numpy.array([len(_v) for _v in points])
+        _keep = numpy.ones(len(result), dtype=bool)
+        _first = numpy.cumsum(_sizes)[:-1]
 
-            #duplicate points are within a hundredth of a foot of each other
-            if TupleMath.length(
-                TupleMath.subtract(tuple(_prev), tuple(item[0]))) < 0.01:
+        _keep[_first] = numpy.linalg.norm(
+            result[_first] - result[_first - 1], axis=1) >= 0.01
 
-                _v = item[1:]
-
-            result.extend(_v)
-            _prev = item[-1]
+        result = result[_keep]
 
         #add a line segment for the last tangent if it exists
         last_tangent = abs(
@@ -848,19 +1326,15 @@ class AlignmentModel:
         )
 
         if not support.within_tolerance(last_tangent):
-            _vec = TupleMath.bearing_vector(
-                last_curve.get('BearingOut') * last_tangent)
-
-#            _vec = support.vector_from_angle(last_curve.get('BearingOut'))\
-#                .multiply(last_tangent)
 
-            last_point = tuple(result[-1])
+            _bearing = last_curve.get('BearingOut')
+            _vec = numpy.array([math.sin(_bearing), math.cos(_bearing), 0.0])
 
-            result.append(TupleMath.add(last_point, _vec))
+            result = numpy.vstack([result, result[-1] + _vec * last_tangent])
 
         #set the end point
         if not self.data.get('meta').get('End'):
-            self.data.get('meta')['End'] = result[-1]
+            self.data.get('meta')['End'] = tuple(result[-1].tolist())
 
         if types: return curves, spirals, lines, result
         return result
@@ -231,7 +231,7 @@ class HorizontalAlignment(DataFunctions):
             curves, spirals, lines, points = obj.Proxy.model.discretize_geometry(
                 [0.0], obj.Method, obj.Seg_Value, types=True)
 
-            origin = geo_origin.get(points[0])
+            origin = geo_origin.get(tuple(points[0].tolist()))
 
             obj.Shape = self.get_shape(lines, curves, spirals, origin.Origin)
 
@@ -839,36 +839,110 @@ def get_tangent_vector(arc_dict, distance):
 
     return coord, ortho
 
-def get_segments(bearing, deltas, direction, start, radius, _dtype=Vector):
+def get_tangent_vectors(arc_dict, distances):
     """
-    Calculate the coordinates of the curve segments
+    Return (n, 3) arrays of coordinates and unit tangent vectors at
+    distances along the arc from its start
+    """
+
+    direction = arc_dict.get('Direction')
+    bearing = arc_dict.get('BearingIn')
+    radius = arc_dict.get('Radius')
+    start = numpy.array(tuple(arc_dict.get('Start')), dtype=float)
+
+    _deltas = numpy.asarray(distances, dtype=float) / radius
+
+    _forward = numpy.array([math.sin(bearing), math.cos(bearing), 0.0])
+    _right = numpy.array([_forward[1], -_forward[0], 0.0])
+
+    _coords = start + radius * (
+        numpy.sin(_deltas)[:, None] * _forward
+        + (direction * (1.0 - numpy.cos(_deltas)))[:, None] * _right)
+
+    #bearings turn clockwise for positive directions
+    _bearings = bearing + direction * _deltas
+
+    _tangents = numpy.column_stack([
+        numpy.sin(_bearings), numpy.cos(_bearings), numpy.zeros(len(_deltas))])
+
+    return _coords, _tangents
+
+def get_position_offsets(arc_dict, points):
+    """
+    Return arrays of distances along the arc and offsets to the left of
+    it for (n, 2) points.  Both are NaN for points beyond the arc ends.
+    """
+
+    direction = arc_dict.get('Direction')
+    bearing = arc_dict.get('BearingIn')
+    radius = arc_dict.get('Radius')
+    start = numpy.array(tuple(arc_dict.get('Start'))[:2], dtype=float)
+
+    _points = numpy.asarray(points, dtype=float)[:, :2]
+
+    #the center is to the right of clockwise arcs
+    _center = start + direction * radius \
+        * numpy.array([math.cos(bearing), -math.sin(bearing)])
+
+    _v0 = start - _center
+    _v = _points - _center
+
+    #central angle from the start, measured in the arc direction
+    _angle = numpy.arctan2(
+        _v0[0] * _v[:, 1] - _v0[1] * _v[:, 0], _v @ _v0) * -direction
+    _angle = numpy.mod(_angle, C.TWO_PI)
+
+    _dist = _angle * radius
+    _offset = (numpy.hypot(_v[:, 0], _v[:, 1]) - radius) * direction
+
+    #angles just short of a full turn are before the start
+    _dist[_dist > radius * C.TWO_PI - C.TOLERANCE] = 0.0
+
+    _outside = _dist > arc_dict.get('Length') + C.TOLERANCE
+
+    _dist[_outside] = numpy.nan
+    _offset[_outside] = numpy.nan
+
+    return _dist, _offset
+
+def get_segment_array(bearing, deltas, direction, start, radius):
+    """
+    Calculate the coordinates of the curve segments as a (n + 1, 3) array,
+    beginning with the start coordinate
 
     bearing - beginning bearing
-    deltas - list of angles to calculate
+    deltas - array of angles to calculate
     direction - curve direction: -1.0 = ccw, 1.0 = cw
     start - starting coordinate
     radius - arc radius
     """
 
-    _forward = Vector(math.sin(bearing), math.cos(bearing), 0.0)
-    _right = Vector(_forward.y, -_forward.x, 0.0)
+    _deltas = numpy.asarray(deltas, dtype=float).reshape(-1, 1)
 
-    _points = [_dtype(start)]
-    _start = Vector(start)
+    _forward = numpy.array([math.sin(bearing), math.cos(bearing), 0.0])
+    _right = numpy.array([_forward[1], -_forward[0], 0.0])
 
-    for delta in deltas:
+    _start = numpy.array(tuple(start), dtype=float)
 
-        _dfw = Vector(_forward).multiply(math.sin(delta))
-        _drt = Vector(_right).multiply(direction * (1.0 - math.cos(delta)))
+    _points = _start + radius * (numpy.sin(_deltas) * _forward
+        + direction * (1.0 - numpy.cos(_deltas)) * _right)
 
-        _vec = _start.add(_dfw.add(_drt).multiply(radius))
+    return numpy.vstack([_start, _points])
 
-        if _dtype is not Vector:
-            _vec = _dtype(_vec)
+def get_segments(bearing, deltas, direction, start, radius, _dtype=Vector):
+    """
+    Calculate the coordinates of the curve segments
+
+    bearing - beginning bearing
+    deltas - list of angles to calculate
+    direction - curve direction: -1.0 = ccw, 1.0 = cw
+    start - starting coordinate
+    radius - arc radius
+    """
 
-        _points.append(_vec)
+    _points = get_segment_array(bearing, deltas, direction, start, radius)
 
-    return _points
+    return [_dtype(start)] + [_dtype(tuple(_v)) for _v in _points[1:].tolist()]
 
 def get_position_offset(arc, coord):
     """
@@ -947,6 +1021,32 @@ def get_points(
 
     _arc = arc
 
+    if isinstance(arc, dict):
+        _arc = Arc(arc)
+
+    if not _arc.radius:
+        return [_arc.pi]
+
+    _points = get_point_array(_arc, size, method, interval)
+
+    if _points is None:
+        return None, None
+
+    _arc.points = [_dtype(tuple(_v)) for _v in _points[:-1].tolist()]
+
+    _arc.points.append(Vector(_arc.end))
+
+    return _arc.points
+
+def get_point_array(arc, size=10.0, method='Segment', interval=None):
+    """
+    Discretize an arc into a (n, 3) array of points from the start
+    of the interval to the arc end.  Methods and parameters are the same
+    as get_points().  Returns None if the arc can not be discretized.
+    """
+
+    _arc = arc
+
     if isinstance(arc, dict):
         _arc = Arc(arc)
 
@@ -958,7 +1058,7 @@ def get_points(
     end = _arc.end
 
     if not radius:
-        return [_arc.pi]
+        return numpy.array([tuple(_arc.pi)], dtype=float)
 
     if not interval:
         interval = [0.0, 0.0]
@@ -969,7 +1069,7 @@ def get_points(
     #get the start coordinate at the actual starting point on the curve
     if interval[0] > 0.0:
 
-        start = get_segments(
+        start = get_segment_array(
             bearing_in, [_delta_angle], direction, start, radius
         )[1]
 
@@ -995,16 +1095,11 @@ def get_points(
     #pre-calculate the segment deltas,
     #increasing from zero to the central angle
     if _delta == 0.0:
-        return None, None
-
-    segment_deltas = [
-        float(_i + 1) * _delta for _i in range(0, int(angle / _delta))
-    ]
+        return None
 
-    _arc.points = get_segments(
-        _start_angle, segment_deltas, direction, start, radius, _dtype
-    )
+    segment_deltas = (numpy.arange(int(angle / _delta)) + 1.0) * _delta
 
-    _arc.points.append(Vector(end))
+    _points = get_segment_array(
+        _start_angle, segment_deltas, direction, start, radius)
 
-    return _arc.points
+    return numpy.vstack([_points, numpy.array(tuple(end), dtype=float)])
@@ -26,9 +26,11 @@ Line generation tools
 """
 
 import math
+import numpy
 
 from FreeCAD import Vector, Console
 from . import support
+from ..project.support.utils import Constants as C
 
 from freecad_python_support.tuple_math import TupleMath
 
@@ -252,6 +254,54 @@ def get_ortho_vector(line, distance, side=''):
 
     return _coord, TupleMath.multiply(_left, _dir)
 
+def get_tangent_vectors(line, distances):
+    """
+    Return (n, 3) arrays of coordinates and unit tangent vectors at
+    distances along the line from its start
+    """
+
+    _distances = numpy.asarray(distances, dtype=float).reshape(-1, 1)
+
+    start = numpy.array(tuple(line.get('Start')), dtype=float)
+    _delta = numpy.array(tuple(line.get('End')), dtype=float) - start
+    _delta[2] = 0.0
+
+    _length = numpy.hypot(_delta[0], _delta[1])
+
+    if _length > 0.0:
+        _tangent = _delta / _length
+
+    else:
+        bearing = line.get('BearingIn')
+        _tangent = numpy.array([math.sin(bearing), math.cos(bearing), 0.0])
+
+    _tangents = numpy.tile(_tangent, (len(_distances), 1))
+
+    return start + _distances * _tangent, _tangents
+
+def get_position_offsets(line, points):
+    """
+    Return arrays of distances along the line and offsets to the left of
+    it for (n, 2) points.  Both are NaN for points beyond the line ends.
+    """
+
+    _points = numpy.asarray(points, dtype=float)[:, :2]
+    _coords, _tangents = get_tangent_vectors(line, [0.0])
+
+    _delta = _points - _coords[0, :2]
+    _tangent = _tangents[0, :2]
+
+    _dist = _delta @ _tangent
+    _offset = _tangent[0] * _delta[:, 1] - _tangent[1] * _delta[:, 0]
+
+    _outside = (_dist < -C.TOLERANCE) \
+        | (_dist > line.get('Length') + C.TOLERANCE)
+
+    _dist[_outside] = numpy.nan
+    _offset[_outside] = numpy.nan
+
+    return _dist, _offset
+
 def get_orthogonal_point(start_pt, end_pt, coord):
     """
     Return the point on the line specified by
@@ -27,6 +27,11 @@ Spiral generation tools
 import math
 import numpy
 
+try:
+    from scipy import special
+except ImportError:
+    special = None
+
 from FreeCAD import Vector
 
 from ..project.support import units
@@ -373,17 +378,13 @@ def get_parameters(spiral_dict):
     print('Unable to solve spiral')
     return None
 
-def get_segments(spiral, deltas, _dtype=Vector):
+def get_segment_array(spiral, deltas):
     """
-    Calculate the coordinates of the curve segments
-    bearing - beginning bearing
-    deltas - list of angles to calculate
-    direction - curve direction: -1.0 = ccw, 1.0 = cw
-    start - starting coordinate
-    radius - arc radius
+    Calculate the coordinates of the curve segments as a (n, 3) array
+    spiral - spiral dictionary
+    deltas - array of tangent deflection angles to calculate
     """
 
-    _vec = None
     _draw_start = spiral['Start']
     _draw_end = spiral['End']
     _length = spiral['Length']
@@ -402,40 +403,35 @@ def get_segments(spiral, deltas, _dtype=Vector):
         _draw_start, _draw_end = _draw_end, _draw_start
         _direction *= -1
 
-    _vec = spiral['PI'].sub(_draw_start).normalize()
-
-    _points = []
-
-    _six_rad_len = 6.0 * _radius * _length
-    _two_rad_len_root = math.sqrt(2.0 * _radius * _length)
-    _forty_rad2_len2 = 40.0 * _radius**2 * _length**2
-    _root_deltas = [math.sqrt(_v) for _v in deltas]
+    _start = numpy.array(tuple(_draw_start), dtype=float)
 
-    for _i, _delta in enumerate(deltas):
+    _vec = numpy.array(tuple(spiral['PI']), dtype=float) - _start
+    _vec /= numpy.linalg.norm(_vec)
+    _right = numpy.array([_vec[1], -_vec[0], 0.0])
 
-        #calculate length of curve at the current delta
-        _seg_len = _two_rad_len_root * _root_deltas[_i]
+    #length of curve at the deltas and positions along it
+    _seg_len = numpy.sqrt(
+        2.0 * _radius * _length * numpy.asarray(deltas, dtype=float))
 
-        #calculate positions along curve at delta offset
-        _x = _seg_len**3 / _six_rad_len
+    _along, _across, _theta = get_local_coordinates(_seg_len, _radius, _length)
 
-        _y = _seg_len - ((_seg_len**5) / _forty_rad2_len2)
-
-        #calculate vector coordinates
-        _dy = Vector(_vec).multiply(_y)
-        _dx = Vector(_vec.y, -_vec.x, 0.0).multiply(_direction).multiply(_x)
-
-        _points.append(_dtype(_dy.add(_dx)))
-
-    _delta = _draw_end.sub(_points[-1])
+    _points = _start + _along[:, None] * _vec \
+        + (_direction * _across)[:, None] * _right
 
     if _reverse:
         _points = _points[::-1]
 
-    _points = [_v.add(_draw_start) for _v in _points]
-
     return _points
 
+def get_segments(spiral, deltas, _dtype=Vector):
+    """
+    Calculate the coordinates of the curve segments
+    spiral - spiral dictionary
+    deltas - list of tangent deflection angles to calculate
+    """
+
+    return [_dtype(tuple(_v)) for _v in get_segment_array(spiral, deltas).tolist()]
+
 def get_points(
         spiral, size=10.0, method='Segment', interval=None, _dtype=Vector):
     """
@@ -462,6 +458,20 @@ def get_points(
     Points are returned references to start_coord
     """
 
+    _points = get_point_array(spiral, size, method, interval)
+
+    if _points is None:
+        return None, None
+
+    return [_dtype(tuple(_v)) for _v in _points.tolist()]
+
+def get_point_array(spiral, size=10.0, method='Segment', interval=None):
+    """
+    Discretize a spiral into a (n, 3) array of points.  Methods and
+    parameters are the same as get_points().  Returns None if the spiral
+    can not be discretized.
+    """
+
     angle = spiral['Theta']
     radius = spiral['Radius']
 
@@ -498,16 +508,14 @@ def get_points(
     #pre-calculate the segment deltas,
     #increasing from zero to the central angle
     if _delta == 0.0:
-        return None, None
+        return None
 
-    segment_deltas = [float(_i) * _delta\
-        for _i in range(0, int(angle / _delta) + 1)
-    ]
+    segment_deltas = numpy.arange(int(angle / _delta) + 1) * _delta
 
     if segment_deltas[-1] < angle:
-        segment_deltas.append(angle)
+        segment_deltas = numpy.append(segment_deltas, angle)
 
-    return get_segments(spiral, segment_deltas, _dtype)
+    return get_segment_array(spiral, segment_deltas)
 
 def get_ordered_tangents(curve):
     """
@@ -573,6 +581,136 @@ def get_tangent_vector(spiral, distance):
 
     return _coords[_is_forward-1], _tangent
 
+def get_local_coordinates(distances, radius, length, terms=16):
+    """
+    Return coordinates along and across the tangent at the zero curvature
+    end of a clothoid at distances from that end, from the Fresnel
+    integrals, or their series expansion without scipy
+    """
+
+    _distances = numpy.asarray(distances, dtype=float)
+
+    #tangent deflection angles
+    _theta = _distances**2 / (2.0 * radius * length)
+
+    if special is not None:
+
+        #Fresnel integrals are scaled to the clothoid parameter
+        _scale = math.sqrt(math.pi * radius * length)
+        _sin, _cos = special.fresnel(_distances / _scale)
+
+        return _scale * _cos, _scale * _sin, _theta
+
+    _along = numpy.zeros(_distances.shape)
+    _across = numpy.zeros(_distances.shape)
+    _term = numpy.ones(_distances.shape)
+
+    for _k in range(terms):
+
+        _v = _term / (2 * _k + 1) * (-1.0)**(_k // 2)
+
+        if _k % 2:
+            _across += _v
+
+        else:
+            _along += _v
+
+        _term = _term * _theta / (_k + 1)
+
+    return _distances * _along, _distances * _across, _theta
+
+def get_tangent_vectors(spiral, distances):
+    """
+    Return (n, 3) arrays of coordinates and unit tangent vectors at
+    distances along the spiral from its start
+    """
+
+    _distances = numpy.asarray(distances, dtype=float)
+    _length = spiral['Length']
+    _direction = spiral['Direction']
+
+    _start = spiral['Start']
+    _bearing = spiral['BearingIn']
+    _sign = 1.0
+
+    #measure from the end if the spiral leaves the curve on a tangent
+    _reverse = spiral.get('EndRadius') is None
+
+    if not _reverse:
+        _reverse = spiral['EndRadius'] == math.inf
+
+    if _reverse:
+        _distances = _length - _distances
+        _start = spiral['End']
+        _bearing = spiral['BearingOut']
+        _sign = -1.0
+
+    _along, _across, _theta = get_local_coordinates(
+        _distances, spiral['Radius'], _length)
+
+    _forward = numpy.array([math.sin(_bearing), math.cos(_bearing), 0.0])
+    _right = numpy.array([_forward[1], -_forward[0], 0.0])
+
+    _coords = numpy.array(tuple(_start), dtype=float) \
+        + (_sign * _along)[:, None] * _forward \
+        + (_direction * _across)[:, None] * _right
+
+    _bearings = _bearing + _sign * _direction * _theta
+
+    _tangents = numpy.column_stack([
+        numpy.sin(_bearings), numpy.cos(_bearings),
+        numpy.zeros(len(_bearings))])
+
+    return _coords, _tangents
+
+def get_position_offsets(spiral, points, iterations=12):
+    """
+    Return arrays of distances along the spiral and offsets to the left
+    of it for (n, 2) points, solved with Newton iterations on the point
+    projection.  Both are NaN for points beyond the spiral ends.
+    """
+
+    _points = numpy.asarray(points, dtype=float)[:, :2]
+    _length = spiral['Length']
+
+    _start = numpy.array(tuple(spiral['Start'])[:2], dtype=float)
+    _chord = numpy.array(tuple(spiral['End'])[:2], dtype=float) - _start
+
+    #signed curvature to the left at the start and the end
+    _curvatures = [
+        -spiral['Direction'] / spiral.get(_k, math.inf)
+        if spiral.get(_k) else 0.0 for _k in ('StartRadius', 'EndRadius')]
+
+    #start from the projection on the chord
+    _dist = numpy.clip(
+        (_points - _start) @ _chord / (_chord @ _chord), 0.0, 1.0) * _length
+
+    for _i in range(iterations):
+
+        _coords, _tangents = get_tangent_vectors(spiral, _dist)
+        _delta = _points - _coords[:, :2]
+
+        _along = _delta[:, 0] * _tangents[:, 0] + _delta[:, 1] * _tangents[:, 1]
+        _across = _tangents[:, 0] * _delta[:, 1] - _tangents[:, 1] * _delta[:, 0]
+
+        _k = _curvatures[0] + (_curvatures[1] - _curvatures[0]) * _dist / _length
+
+        _dist = numpy.clip(_dist + _along / (1.0 - _k * _across),
+            -_length, 2.0 * _length)
+
+    _coords, _tangents = get_tangent_vectors(spiral, _dist)
+    _delta = _points - _coords[:, :2]
+
+    _offset = _tangents[:, 0] * _delta[:, 1] - _tangents[:, 1] * _delta[:, 0]
+
+    _outside = (_dist < -C.TOLERANCE) \
+        | (_dist > _length + C.TOLERANCE)
+
+    _dist[_outside] = numpy.nan
+    _offset[_outside] = numpy.nan
+
+    return _dist, _offset
+
 def get_position_offset(line_dict, coord):
     """
     Return the position and offset of the coordinate along the spiral
@@ -82,6 +82,7 @@ class CreatePad:
 
         self.pg.Vectors = self.points + fill_points + cut_points
         self.surf.PointGroups = [self.pg]
+        FreeCAD.ActiveDocument.recompute()
 
     def get_secpts(self,slope, z):
         shape = self.copy_shape.copy()
@@ -92,6 +93,7 @@ class CreatePad:
 
         self.pg.Vectors = offpoints + self.points
         self.surf.PointGroups = [self.pg]
+        self.surf.recompute()
 
         intersec = self.surf.Mesh.section(
             self.target.Mesh, MinDist=0.01)
@@ -71,6 +71,7 @@ class PointGroup:
         '''
 
         self.Type = 'Trails::PointGroup'
+        self.revision = 0
 
         obj.addProperty(
             "App::PropertyStringList", "PointNames", "Base",
@@ -99,6 +100,10 @@ class PointGroup:
         Do something when a data property has changed.
         '''
         if prop == "Vectors":
+            # Linked surfaces compare revisions to find changed groups
+            if 'Restore' not in obj.State:
+                self.revision += 1
+
             vectors = obj.getPropertyByName(prop)
             if vectors:
                 origin = geo_origin.get(vectors[0])
@@ -116,6 +121,23 @@ class PointGroup:
         '''
         return
 
+    def __getstate__(self):
+        """
+        Save variables to file.
+        """
+        return self.Type
+
+    def __setstate__(self, state):
+        """
+        Set variables from file.
+        """
+        if isinstance(state, dict):
+            state = state.get('Type')
+        if state:
+            self.Type = state
+
+        self.revision = 0
+
 
 class ViewProviderPointGroup:
     """
@@ -177,14 +177,17 @@ class Region(RegionFunc):
 
         horiz_pnts = obj.getPropertyByName("AtHorizontalAlignmentPoints")
 
-        obj.StationList = self.generate(alignment,increments, region, horiz_pnts)
+        stations = self.generate(alignment, increments, region, horiz_pnts)
 
         left_offset = obj.getPropertyByName("LeftOffset")
         right_offset = obj.getPropertyByName("RightOffset")
         offsets = [left_offset, right_offset]
         origin = geo_origin.get()
 
-        obj.Shape = self.get_lines(origin.Origin, alignment, offsets, obj.StationList)
+        # Stations are labeled by the index of their guide line
+        lines, stations = self.get_lines(origin.Origin, alignment, offsets, stations)
+        obj.StationList = stations
+        obj.Shape = lines
 
 
 
@@ -27,7 +27,8 @@ Define Region Object functions.
 
 import FreeCAD
 import Part
-import copy
+import numpy as np
+import math
 
 class RegionFunc:
     """
@@ -38,30 +39,37 @@ class RegionFunc:
 
     def get_lines(self, fpoint, alignment, offsets, stations):
         """
-        Create Region guide lines
+        Create Region guide lines. Return their compound and the
+        stations they are created at.
         """
         gls = []
+        kept = []
 
         # Get left and right offsets from centerline
         left_offset = offsets[0]
         right_offset = offsets[1]
 
-        # Computing coordinates and orthoginals for guidelines
-        for sta in stations:
-            tuple_coord, tuple_vec = alignment.Proxy.model.get_orthogonal( sta, "Left")
-            coord = FreeCAD.Vector(tuple_coord).sub(fpoint)
-            vec = FreeCAD.Vector(tuple_vec)
+        # Computing coordinates and orthogonals for all guidelines at once
+        coords, vecs = alignment.Proxy.model.get_orthogonals(stations, "Left")
+        coords = coords - tuple(fpoint)
 
-            left_vec = copy.deepcopy(vec)
-            right_vec = copy.deepcopy(vec)
+        left_sides = coords + vecs * left_offset
+        right_sides = coords - vecs * right_offset
 
-            left_side = coord.add(left_vec.multiply(left_offset))
-            right_side = coord.add(right_vec.negative().multiply(right_offset))
+        for sta, left_side, coord, right_side in zip(list(stations),
+                left_sides.tolist(), coords.tolist(), right_sides.tolist()):
+
+            # Skip stations off the alignment, keep lines and stations paired
+            if any(math.isnan(i) for i in coord): continue
 
             # Generate guide line object and add to cluster
-            gls.append(Part.makePolygon([left_side, coord, right_side]))
+            gls.append(Part.makePolygon([
+                FreeCAD.Vector(left_side),
+                FreeCAD.Vector(coord),
+                FreeCAD.Vector(right_side)]))
+            kept.append(float(sta))
 
-        return Part.makeCompound(gls)
+        return Part.makeCompound(gls), kept
 
     def get_alignment_infos(self, alignment):
         if hasattr(alignment.Proxy, 'model'):
@@ -74,9 +82,27 @@ class RegionFunc:
             end = start + length
         return start, end
 
+    @staticmethod
+    def increment_stations(first, last, increment):
+        """
+        Return stations on multiples of increments in [first, last)
+        ranges, with the index of their range.
+        """
+        step = np.where(increment > 0, increment, np.inf)
+        begin = np.ceil(first / step - 1e-9)
+        counts = np.maximum(np.ceil(last / step - 1e-9) - begin, 0).astype(int)
+        counts[~np.isfinite(step)] = 0
+
+        piece = np.repeat(np.arange(len(first)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        return (begin[piece] + offset) * increment[piece], piece
+
     def generate(self, alignment, increments, region, horiz_pnts = True):
         """
-        get guideline stations along an alignment
+        Get guideline stations along an alignment as an array, ordered
+        along the alignment. Stations on increments are computed for every
+        geometry element part between station equations at once.
         """
         # Guideline intervals
         tangent_increment = increments[0]/1000
@@ -88,61 +114,69 @@ class RegionFunc:
         end_station = round(region[1]/1000, 3)
 
         # Retrieve alignment data get geometry and placement
-        stations = []
         if hasattr(alignment.Proxy, 'model'):
-            start = alignment.Proxy.model.data['meta']['StartStation']
-            length = alignment.Proxy.model.data['meta']['Length']
-            end = start + length/1000
-
-            geometry = alignment.Proxy.model.data['geometry']
-            for element in geometry:
-                # Get starting and ending stations based on alignment
-                elem_start = element.get('StartStation')
-                elem_end = element.get('StartStation')+element.get('Length')/1000
-
-                if elem_start != 0 and horiz_pnts:
-                        stations.append(elem_start)
-
-                # Generate line intervals
-                if element.get('Type') == 'Line':
-
-                    # Iterate the station range
-                    for sta in range(int(elem_start), int(elem_end)):
-
-                        # Add stations which land on increments exactly
-                        if sta % int(tangent_increment) == 0:
-                            stations.append(sta)
-
-                # Generate curve intervals
-                elif element.get('Type') == 'Curve':
-                    for sta in range(int(elem_start), int(elem_end)):
-                        if sta % int(curve_increment) == 0:
-                            stations.append(sta)
-
-                #Generate spiral intervals
-                elif element.get("Type") == 'Spiral':
-                    for sta in range(int(elem_start), int(elem_end)):
-                        if sta % int(spiral_increment) == 0:
-                            stations.append(sta)
-
-            # Add the end station
-            stations.append(round(end,3))
+            model = alignment.Proxy.model
+            length = model.data['meta']['Length']
+            geometry = [i for i in model.data['geometry'] if i]
+
+            # Element limits as internal positions
+            bounds = np.array([i.get('InternalStation') for i in geometry],
+                dtype=float).reshape(-1, 2)
+            increment = np.array([{
+                'Line': tangent_increment,
+                'Curve': curve_increment,
+                'Spiral': spiral_increment}.get(i.get('Type'), 0)
+                for i in geometry], dtype=float)
+
+            # Station equations as begin stations and internal positions
+            aheads, ends, positions = model.get_equation_table(
+                model.data['meta'].get('StartStation') or 0.0,
+                (model.data.get('station') or [])[1:])
+            positions = positions*1000
 
         # Create guide lines from standard line object
         else:
             length = alignment.Length.Value
-            for sta in range(0, int(length/1000)):
-                if sta % int(tangent_increment) == 0:
-                    stations.append(sta)
-
-            # Add the end station
-            stations.append(round(length/1000,3))
-
-        # Iterate the stations, appending what falls in the specified limits
-        region_stations = []
-        for sta in stations:
-            if start_station <= sta <= end_station:
-                region_stations.append(sta)
-
-        region_stations.sort()
-        return region_stations
+            bounds = np.array([[0.0, length]])
+            increment = np.array([tangent_increment])
+            positions, aheads = np.zeros(1), np.zeros(1)
+
+        # Split elements at station equations
+        cuts = np.unique(np.concatenate([bounds.ravel(), positions, [length]]))
+        cuts = cuts[(cuts >= 0) & (cuts <= length)]
+        first, last = cuts[:-1], cuts[1:]
+        middle = (first + last) / 2
+
+        element = np.clip(
+            np.searchsorted(bounds[:, 0], middle, side='right') - 1,
+            0, len(bounds) - 1)
+        equation = np.searchsorted(positions, middle, side='right') - 1
+        station = aheads[equation] + (first - positions[equation])/1000
+
+        # Stations on increments and their internal positions
+        stations, piece = self.increment_stations(
+            station, station + (last - first)/1000, increment[element])
+        internal = first[piece] + (stations - station[piece])*1000
+
+        # Element starts, station equations and the end station
+        extra = [cuts[-1:]]
+        if horiz_pnts:
+            extra.extend([bounds[:, 0], positions[1:]])
+        extra = np.concatenate(extra)
+        extra = extra[(extra >= 0) & (extra <= length)]
+
+        equation = np.searchsorted(positions, extra, side='right') - 1
+        stations = np.concatenate([
+            stations, aheads[equation] + (extra - positions[equation])/1000])
+        internal = np.concatenate([internal, extra])
+
+        # Order along the alignment and drop repeated stations
+        order = np.argsort(internal, kind='stable')
+        stations, internal = np.round(stations[order], 6), internal[order]
+        keep = np.concatenate([[True], np.diff(internal) > 1e-3])
+        stations = stations[keep]
+
+        # Keep stations that fall in the specified limits
+        inside = (start_station <= stations) & (stations <= end_station)
+
+        return stations[inside]
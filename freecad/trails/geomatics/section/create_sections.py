@@ -116,10 +116,20 @@ class CreateSections:
                         cs.Position = position
                         break
 
+                selected = []
                 for item in self.IPFui.SelectSurfacesLW.selectedItems():
                     surface = self.surface_list[item.text()]
                     sec = section.create()
                     cs.addObject(sec)
+                    selected.append((sec, surface))
+
+                # Sample guide lines on all selected surfaces together
+                if selected:
+                    section.Section.sample_sections(
+                        region, [sec.Proxy for sec, surface in selected],
+                        [surface for sec, surface in selected])
+
+                for sec, surface in selected:
                     sec.Surface = surface
 
                 FreeCAD.ActiveDocument.recompute()
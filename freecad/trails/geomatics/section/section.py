@@ -66,11 +66,33 @@ class Section(SectionFunc):
             "Object shape").Shape = Part.Shape()
 
         obj.Proxy = self
+        self.lines = None
+        self.profiles = None
+
+    def __getstate__(self):
+        """
+        Save variables to file.
+        """
+        return self.Type
+
+    def __setstate__(self, state):
+        """
+        Set variables from file.
+        """
+        if isinstance(state, dict):
+            state = state.get('Type')
+        if state:
+            self.Type = state
+
+        self.lines = None
+        self.profiles = None
 
     def onChanged(self, obj, prop):
         '''
         Do something when a data property has changed.
         '''
+        if 'Restore' in obj.State: return
+
         if prop == "Surface":
             surface = obj.getPropertyByName("Surface")
 
@@ -90,6 +112,11 @@ class Section(SectionFunc):
             cs = obj.getParentGroup()
             region = cs.getParentGroup()
 
+            # Keep minimum elevations in step with surface changes
+            minz = self.minimum_elevations(region, surface)
+            if list(obj.MinZ) != minz:
+                obj.MinZ = minz
+
             horizons = cs.Horizons
             if not horizons: return
 
@@ -101,7 +128,11 @@ class Section(SectionFunc):
             geometry = [h, w]
             gaps = [ver, hor]
 
-            obj.Shape = self.draw_2d_sections(pos, region, surface, geometry, gaps, horizons)
+            points, sizes = self.section_lines(
+                pos, region, surface, geometry, gaps, horizons)
+
+            self.lines = (points, sizes)
+            obj.Shape = self.draw_2d_sections(points, sizes)
 
 
 
@@ -183,16 +214,26 @@ class ViewProviderSection:
             geo_system = ["UTM", origin.UtmZone, "FLAT"]
             self.line_coords.geoSystem.setValues(geo_system)
 
-            points = []
-            line_vert = []
-            for wire in copy_shape.Wires:
-                for vertex in wire.Vertexes:
-                    points.append(vertex.Point)
-
-                line_vert.append(len(wire.Vertexes))
-
-            self.line_coords.point.values = points
-            self.lines.numVertices.values = line_vert
+            # Use section arrays of the last recompute if they are present
+            lines = getattr(obj.Proxy, 'lines', None)
+            if lines:
+                points, line_vert = lines
+                points = (points + tuple(origin.Origin)).tolist()
+                line_vert = line_vert.tolist()
+
+            else:
+                points = []
+                line_vert = []
+                for wire in copy_shape.Wires:
+                    for vertex in wire.OrderedVertexes:
+                        points.append(tuple(vertex.Point))
+
+                    line_vert.append(len(wire.OrderedVertexes))
+
+            self.line_coords.point.setValues(0, len(points), points)
+            self.line_coords.point.setNum(len(points))
+            self.lines.numVertices.setValues(0, len(line_vert), line_vert)
+            self.lines.numVertices.setNum(len(line_vert))
 
     def getDisplayModes(self, vobj):
         '''
@@ -25,9 +25,11 @@
 Define Section object functions.
 '''
 
-import FreeCAD
-import Part, MeshPart
-import copy, math
+import Part
+import numpy as np
+import hashlib, math
+
+from .section_sampler import sample_surfaces
 
 class SectionFunc:
     """
@@ -37,105 +39,198 @@ class SectionFunc:
         pass
 
     @staticmethod
-    def section_converter(section_3d, origin):
-        section_2d = []
-        section_2d.append(FreeCAD.Vector(0, 0, 0))
-
-        prev_vector = origin
-        for i in section_3d:
-            reduced_vector = copy.deepcopy(i)
-            reduced_vector.z = prev_vector.z
-
-            vector = prev_vector.sub(i)
-            x_vector = prev_vector.sub(reduced_vector)
-            length = vector.Length
-            angle = x_vector.getAngle(vector)
+    def wire_arrays(wires):
+        """
+        Return vertex coordinates of wires as arrays.
+        """
+        arrays = []
+        for wire in wires:
+            points = [tuple(v.Point) for v in wire.OrderedVertexes]
+            arrays.append(np.array(points, dtype=float).reshape(-1, 3))
 
-            dx = length * math.cos(angle)
-            dy = length * math.sin(angle)
+        return arrays
 
-            if x_vector.z < vector.z: dy = -dy
-            vector_2d = section_2d[-1].add(FreeCAD.Vector(dx, dy, 0))
-            section_2d.append(vector_2d)
-            prev_vector = i
+    @staticmethod
+    def section_converter(profiles, origins):
+        """
+        Convert 3D profiles to 2D sections in one pass. Offsets are cumulative
+        horizontal distances and elevations are relative to profile origins.
+        Return 2D points of all sections and point counts of each.
+        """
+        sizes = np.array([len(i) for i in profiles], dtype=np.int64)
+        points = np.vstack([np.zeros((0, 3))]
+            + [np.reshape(i, (-1, 3)) for i in profiles])
+        origins = np.asarray(origins, dtype=float).reshape(-1, 3)
+        line = np.repeat(np.arange(len(profiles)), sizes)
+        first = np.cumsum(sizes) - sizes
+
+        # Previous point of every point, origin for the first ones
+        previous = np.roll(points, 1, axis=0)
+        previous[first[sizes > 0]] = origins[sizes > 0]
+
+        step = np.hypot(*(points[:, :2] - previous[:, :2]).T)
+        offset = np.cumsum(step)
+        offset -= (offset - step)[np.repeat(first, sizes)]
+
+        section_2d = np.zeros((len(points), 3))
+        section_2d[:, 0] = offset
+        section_2d[:, 1] = points[:, 2] - origins[line, 2]
+
+        return section_2d, sizes
+
+    def cached_profiles(self, gl, surface):
+        """
+        Return guide line arrays, cached profiles of stations that are still
+        valid, None for the others, and the state to store them with.
+        Profiles are sampled again only for new or moved guide lines and
+        guide lines crossing changed areas of the surface.
+        """
+        lines = self.wire_arrays(gl.Shape.Wires)
+        stations = list(getattr(gl, 'StationList', []))
+        if len(stations) != len(lines):
+            stations = list(range(len(lines)))
+
+        proxy = surface.Proxy
+        source = (surface.Name, id(proxy))
+
+        # Changed area of the surface since the last sampling
+        cache = {}
+        changed = None
+        if self.profiles and self.profiles[0] == source:
+            cache = self.profiles[2]
+            changed = proxy.changes_since(self.profiles[1])
+
+        profiles = []
+        digests = []
+        for i, line in enumerate(lines):
+            digest = hashlib.sha1(line.tobytes()).hexdigest()
+            digests.append(digest)
+            profiles.append(None)
+
+            cached = cache.get(stations[i])
+            if cached and cached[0] == digest and changed is not None:
+                lower = line[:, :2].min(axis=0, initial=np.inf)
+                upper = line[:, :2].max(axis=0, initial=-np.inf)
+                if np.any(lower > changed[2:]) or np.any(upper < changed[:2]):
+                    profiles[i] = cached[1]
+
+        state = (source, proxy.mesh_revision, stations, digests)
+
+        return lines, profiles, state
+
+    def store_profiles(self, profiles, state):
+        """
+        Keep sampled profiles for the next recompute.
+        """
+        source, revision, stations, digests = state
+        self.profiles = (source, revision, {
+            station: (digest, profile) for station, digest, profile
+            in zip(stations, digests, profiles)})
 
-        section_2d.pop(0)
-        return section_2d
+    @staticmethod
+    def sample_sections(gl, sections, surfaces, backend='Thread'):
+        """
+        Sample guide lines for Section proxies and their surfaces together,
+        so stale stations of all surfaces share one worker pool.
+        Return guide line arrays and profile lists of sections.
+        """
+        states = [sec.cached_profiles(gl, surface)
+            for sec, surface in zip(sections, surfaces)]
+
+        jobs = []
+        for (lines, profiles, state), surface in zip(states, surfaces):
+            stale = [lines[i] for i, p in enumerate(profiles) if p is None]
+            if stale:
+                jobs.append((surface.Proxy.get_index(), stale))
+
+        sampled = iter(sample_surfaces(jobs, backend))
+
+        result = []
+        for sec, (lines, profiles, state) in zip(sections, states):
+            if any(p is None for p in profiles):
+                new = iter(next(sampled))
+                profiles = [next(new) if p is None else p for p in profiles]
+
+            sec.store_profiles(profiles, state)
+            result.append((lines, profiles))
+
+        return result
+
+    def sample_profiles(self, gl, surface):
+        """
+        Return guide line arrays and their surface profiles.
+        """
+        return self.sample_sections(gl, [self], [surface])[0]
 
     def minimum_elevations(self, gl, surface):
-        minel = []
-        mesh = surface.Mesh.copy()
-        for wire in gl.Shape.Wires:
-
-            points = []
-            for edge in wire.Edges:
-                cs = mesh.crossSections(
-                    [(edge.Vertexes[0].Point, edge.Vertexes[-1].Point)], 0.000001)
+        """
+        Return minimum surface elevation along each guide line.
+        """
+        lines, profiles = self.sample_profiles(gl, surface)
 
-                minz = math.inf
-                for l in cs[0]:
-                    for i in l:
-                        if  i.z < minz:
-                            minz = i.z
+        return [float(i[:, 2].min()) if len(i) else math.inf for i in profiles]
 
-            minel.append(minz)
-
-        return minel
-
-    def draw_2d_sections(self, position, gl, surface, geometry, gaps, horizons):
-        counter = 0
-        buffer = 50000
-        pos = position
-
-        multi_views_nor = math.ceil(len(gl.Shape.Wires)**0.5)
+    @staticmethod
+    def section_layout(count, position, geometry, gaps):
+        """
+        Return sheet positions of sections, filling columns top to bottom.
+        """
+        rows = math.ceil(count**0.5) + 1
+        index = np.arange(count)
+
+        layout = np.tile(np.array(tuple(position), dtype=float), (count, 1))
+        layout[:, 0] += index // rows * (geometry[1] + gaps[1])
+        layout[:, 1] -= index % rows * (geometry[0] + gaps[0])
+
+        return layout
+
+    def section_lines(self, position, gl, surface, geometry, gaps, horizons):
+        """
+        Sample guide lines on the surface and lay sections out on the sheet.
+        Return points of all sections and point counts of each.
+        """
+        wires = gl.Shape.Wires
+        lines, profiles = self.sample_profiles(gl, surface)
+        origins = [i[0] if len(i) else np.zeros(3) for i in lines]
+
+        points, sizes = self.section_converter(profiles, origins)
+        line = np.repeat(np.arange(len(wires)), sizes)
+
+        # Drop repeated points
+        keep = np.ones(len(points), dtype=bool)
+        keep[1:] = np.any(points[1:] != points[:-1], axis=1) \
+            | (line[1:] != line[:-1])
+        points, line = points[keep], line[keep]
+        sizes = np.bincount(line, minlength=len(wires))
+
+        # Sections without a profile get a placeholder line
+        short = np.flatnonzero(sizes < 2)
+        if len(short):
+            keep = ~np.isin(line, short)
+            points = np.vstack([points[keep],
+                np.tile([[0, 0, 0], [0, 1, 0]], (len(short), 1))])
+            line = np.concatenate([line[keep], np.repeat(short, 2)])
+
+            order = np.argsort(line, kind='stable')
+            points, line = points[order], line[order]
+            sizes = np.bincount(line, minlength=len(wires))
+
+        # Move sections to their place on the sheet grid
+        layout = self.section_layout(len(wires), position, geometry, gaps)
+        if horizons:
+            layout[:, 1] -= np.asarray(horizons, dtype=float) - 1000
+
+        return points + layout[line], sizes
 
+    @staticmethod
+    def draw_2d_sections(points, sizes):
+        """
+        Return a compound of section polylines.
+        """
         section_list = []
-        for i, wire in enumerate(gl.Shape.Wires):
-
-            points = []
-            origin = wire.Vertexes[0].Point
-            for edge in wire.Edges:
-                params = MeshPart.findSectionParameters(
-                    edge, surface.Mesh, FreeCAD.Vector(0, 0, 1))
-                params.insert(0, edge.FirstParameter+1)
-                params.append(edge.LastParameter-1)
-
-                values = [edge.valueAt(glp) for glp in params]
-                points.extend(values)
-
-            section_3d = MeshPart.projectPointsOnMesh(
-                points, surface.Mesh, FreeCAD.Vector(0, 0, 1))
-
-            section_2d = self.section_converter(section_3d, origin)
-            if not section_2d:
-                section_2d = [FreeCAD.Vector(0,0,0),FreeCAD.Vector(0,1,0)]
-
-            draw_sec = []
-            for idx in range(0, len(section_2d)-1):
-                if section_2d[idx] == section_2d[idx+1]: continue
-                draw_sec.append(section_2d[idx].add(position))
-
-            if len(draw_sec) > 2:
-                sec = Part.makePolygon(draw_sec)
-            else:
-                sec = Part.makePolygon([position, position.add(FreeCAD.Vector(0, 1, 0))])
-
-            if horizons:
-                reduce_vector = FreeCAD.Vector(0, horizons[i]-1000, 0)
-                sec.Placement.move(reduce_vector.negative())
-
-            section_list.append(sec)
-
-            if counter == multi_views_nor:
-                shifting = position.x - pos.x + gaps[1]
-                reposition = FreeCAD.Vector(geometry[1] + shifting, 0, 0)
-                position = pos.add(reposition)
-                counter = 0
-
-            else:
-                reposition = FreeCAD.Vector(0, -(geometry[0] + gaps[0]), 0)
-                position = position.add(reposition)
-                counter += 1
-
-        section_draws = Part.makeCompound(section_list)
-        return section_draws
+        if len(sizes):
+            for section in np.split(points, np.cumsum(sizes)[:-1]):
+                section_list.append(
+                    Part.makePolygon([tuple(i) for i in section.tolist()]))
+
+        return Part.makeCompound(section_list)
@@ -0,0 +1,196 @@
+# /**********************************************************************
+# *                                                                     *
+# * Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>             *
+# *                                                                     *
+# * This program is free software; you can redistribute it and/or modify*
+# * it under the terms of the GNU Lesser General Public License (LGPL)  *
+# * as published by the Free Software Foundation; either version 2 of   *
+# * the License, or (at your option) any later version.                 *
+# * for detail see the LICENCE text file.                               *
+# *                                                                     *
+# * This program is distributed in the hope that it will be useful,     *
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of      *
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the       *
+# * GNU Library General Public License for more details.                *
+# *                                                                     *
+# * You should have received a copy of the GNU Library General Public   *
+# * License along with this program; if not, write to the Free Software *
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307*
+# * USA                                                                 *
+# *                                                                     *
+# ***********************************************************************
+
+'''
+Sample surface profiles along guide lines in one pass.
+'''
+
+import numpy as np
+import multiprocessing, os
+from concurrent import futures
+
+from ..surface.triangle_index import TriangleIndex
+
+backends = ['Serial', 'Thread', 'Process']
+
+# Triangle index of process pool workers
+_worker_index = {}
+
+
+def sample_lines(index, lines, backend='Thread', workers=None):
+    """
+    Intersect polylines with the triangles of a TriangleIndex.
+    Return a (k, 3) point array for every polyline, holding its vertices
+    and mesh edge crossings inside the triangulation, ordered along it.
+    """
+    return sample_surfaces([(index, lines)], backend, workers)[0]
+
+
+def sample_surfaces(jobs, backend='Thread', workers=None):
+    """
+    Sample (index, lines) jobs of several surfaces together. Guide lines
+    are split into chunks that run on a thread or process pool.
+    Return the profile lists of jobs.
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = [(index, list(lines)) for index, lines in jobs]
+
+    # Chunks of consecutive lines, a few for every worker
+    chunks = []
+    for job, (index, lines) in enumerate(jobs):
+        count = len(lines)
+        if backend != 'Serial' and count >= 64:
+            parts = min(4 * workers, count // 16)
+        else:
+            parts = 1
+        bounds = np.linspace(0, count, parts + 1).astype(int)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end > start: chunks.append((job, start, end))
+
+    if backend == 'Serial' or workers == 1 or len(chunks) < 2:
+        results = [_sample(jobs[job][0], jobs[job][1][start:end])
+            for job, start, end in chunks]
+
+    elif backend == 'Process' and 'fork' in multiprocessing.get_all_start_methods():
+        results = _process_map(jobs, chunks, workers)
+
+    else:
+        with futures.ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(
+                lambda chunk: _sample(
+                    jobs[chunk[0]][0], jobs[chunk[0]][1][chunk[1]:chunk[2]]),
+                chunks))
+
+    profiles = [[] for i in jobs]
+    for (job, start, end), result in zip(chunks, results):
+        profiles[job].extend(result)
+
+    return profiles
+
+
+def _process_map(jobs, chunks, workers):
+    """
+    Run chunks on forked worker processes. Workers get triangulation
+    vertex and index arrays once and build their own triangle index.
+    """
+    context = multiprocessing.get_context('fork')
+    meshes = [(index.points, index.facets) for index, lines in jobs]
+
+    with futures.ProcessPoolExecutor(
+            workers, mp_context=context,
+            initializer=_set_meshes, initargs=(meshes,)) as pool:
+        tasks = [pool.submit(_sample_job, job,
+            [np.asarray(i, dtype=float) for i in jobs[job][1][start:end]])
+            for job, start, end in chunks]
+
+        return [task.result() for task in tasks]
+
+
+def _set_meshes(meshes):
+    """
+    Keep surface meshes of a worker process.
+    """
+    _worker_index.clear()
+    _worker_index['meshes'] = meshes
+
+
+def _sample_job(job, lines):
+    """
+    Sample lines of a job in a worker process.
+    """
+    if job not in _worker_index:
+        _worker_index[job] = TriangleIndex(*_worker_index['meshes'][job])
+
+    return _sample(_worker_index[job], lines)
+
+
+def _sample(index, lines):
+    """
+    Sample polylines against a triangle index in one pass.
+    """
+    lines = [np.asarray(i, dtype=float).reshape(-1, 3) for i in lines]
+    sizes = np.array([len(i) for i in lines], dtype=np.int64)
+    if sizes.sum() == 0:
+        return [np.zeros((0, 3)) for i in lines]
+
+    # Polyline vertices with their line and horizontal chainage
+    vertices = np.vstack(lines)
+    vertex_line = np.repeat(np.arange(len(lines)), sizes)
+    step = np.hypot(*np.diff(vertices[:, :2], axis=0).T)
+    same = vertex_line[1:] == vertex_line[:-1]
+    step = np.where(same, step, 0)
+    chainage = np.concatenate([[0], np.cumsum(step)])
+    chainage -= chainage[np.searchsorted(vertex_line, vertex_line)]
+
+    # Segments between consecutive vertices of the same line
+    first = np.flatnonzero(same)
+    start = vertices[first, :2]
+    end = vertices[first + 1, :2]
+
+    # Crossings of segments with triangle edges
+    segment, facet = index.segment_candidates(start, end)
+    a = start[segment]
+    r = end[segment] - a
+
+    found_line, found_chainage, found_points = [], [], []
+    for edge in range(3):
+        p = index.points[index.facets[facet, edge]]
+        q = index.points[index.facets[facet, (edge + 1) % 3]]
+        s = q[:, :2] - p[:, :2]
+        d = p[:, :2] - a
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denom = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+            t = (d[:, 0] * s[:, 1] - d[:, 1] * s[:, 0]) / denom
+            u = (d[:, 0] * r[:, 1] - d[:, 1] * r[:, 0]) / denom
+
+        hit = (denom != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        t, u = t[hit], u[hit]
+        xy = a[hit] + t[:, None] * r[hit]
+        z = p[hit, 2] + u * (q[hit, 2] - p[hit, 2])
+
+        vertex = first[segment[hit]]
+        found_line.append(vertex_line[vertex])
+        found_chainage.append(chainage[vertex] + t * step[vertex])
+        found_points.append(np.column_stack([xy, z]))
+
+    # Polyline vertices inside the triangulation
+    z = index.elevations_at(vertices[:, 0], vertices[:, 1])
+    inside = ~np.isnan(z)
+    found_line.append(vertex_line[inside])
+    found_chainage.append(chainage[inside])
+    found_points.append(np.column_stack([vertices[inside, :2], z[inside]]))
+
+    line = np.concatenate(found_line)
+    position = np.concatenate(found_chainage)
+    points = np.vstack(found_points)
+
+    # Order along every line and drop repeated points
+    order = np.lexsort((position, line))
+    line, position, points = line[order], position[order], points[order]
+    repeated = (line[1:] == line[:-1]) & (np.diff(position) < 1e-6)
+    keep = np.concatenate([[True], ~repeated])
+    line, points = line[keep], points[keep]
+
+    bounds = np.searchsorted(line, np.arange(len(lines) + 1))
+
+    return [points[bounds[i]:bounds[i + 1]] for i in range(len(lines))]
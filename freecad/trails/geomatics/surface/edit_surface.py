@@ -92,17 +92,13 @@ class AddPoint:
 
                 # Get triangle index at picket point
                 if picked_point:
-                    detail = picked_point.getDetail()
-
-                    if detail.isOfType(coin.SoFaceDetail.getClassTypeId()):
-                        face_detail = coin.cast(
-                            detail, str(detail.getTypeId().getName()))
-                        index = face_detail.getFaceIndex()
+                    surface = FreeCADGui.Selection.getSelection()[-1]
+                    index = surface.ViewObject.Proxy.get_facet_index(picked_point)
 
+                    if index is not None:
                         obj = self.view.getObjectInfo(self.view.getCursorPos())
                         curpos = FreeCAD.Vector(float(obj["x"]),float(obj["y"]),float(obj["z"]))           
 
-                        surface = FreeCADGui.Selection.getSelection()[-1]
                         copy_mesh = surface.Mesh.copy()
                         copy_mesh.insertVertex(index, curpos)
                         surface.Mesh = copy_mesh
@@ -221,12 +217,10 @@ class DeleteTriangle:
 
                 # Get triangle index at picket point
                 if picked_point:
-                    detail = picked_point.getDetail()
+                    surface = FreeCADGui.Selection.getSelection()[-1]
+                    index = surface.ViewObject.Proxy.get_facet_index(picked_point)
 
-                    if detail.isOfType(coin.SoFaceDetail.getClassTypeId()):
-                        face_detail = coin.cast(
-                            detail, str(detail.getTypeId().getName()))
-                        index = face_detail.getFaceIndex()
+                    if index is not None:
                         self.indexes.append(index)
 
         # If mouse left button pressed get picked point
@@ -311,17 +305,14 @@ class SwapEdge:
 
                 # Get triangle index at picket point
                 if picked_point is not None:
-                    detail = picked_point.getDetail()
+                    surface = FreeCADGui.Selection.getSelection()[-1]
+                    index = surface.ViewObject.Proxy.get_facet_index(picked_point)
 
-                    if detail.isOfType(coin.SoFaceDetail.getClassTypeId()):
-                        face_detail = coin.cast(
-                            detail, str(detail.getTypeId().getName()))
-                        index = face_detail.getFaceIndex()
+                    if index is not None:
                         self.face_indexes.append(index)
 
                         # try to swap edge between picked triangle
                         if len(self.face_indexes) == 2:
-                            surface = FreeCADGui.Selection.getSelection()[-1]
                             copy_mesh = surface.Mesh.copy()
 
                             try:
@@ -27,7 +27,9 @@ Create a Surface Object from FPO.
 import FreeCAD
 import Mesh, Part
 from pivy import coin
-from .surface_func import DataFunctions, ViewFunctions
+import numpy as np
+from .surface_func import DataFunctions, ViewFunctions, mesh_arrays
+from .triangle_index import TriangleIndex
 from freecad.trails import ICONPATH, line_patterns, geo_origin
 from . import surfaces
 import random
@@ -64,6 +66,15 @@ class Surface(DataFunctions):
         Set data properties.
         '''
         self.Type = 'Trails::Surface'
+        self.Object = obj
+        self.index = None
+        self.mesh_revision = 0
+        self.mesh_changes = []
+        self.changed_area = None
+        self.points = None
+        self.group_revisions = {}
+        self.dirty = set()
+        self.reset_triangulation()
 
         obj.addProperty(
             'App::PropertyPlacement', "Placement", "Base",
@@ -86,6 +97,10 @@ class Surface(DataFunctions):
             "Mesh::PropertyMeshKernel", "Mesh", "Triangulation",
             "Mesh object of triangulation").Mesh = Mesh.Mesh()
 
+        obj.addProperty(
+            "App::PropertyString", "CacheKey", "Triangulation",
+            "Hash of the inputs of stored results", 4).CacheKey = ""
+
         obj.addProperty(
             "App::PropertyLength", "MaxLength", "Triangulation",
             "Maximum length of triangle edge").MaxLength = 500000
@@ -97,6 +112,9 @@ class Surface(DataFunctions):
         obj.addProperty("Part::PropertyPartShape", "BoundaryShapes", "Triangulation",
             "Boundary Shapes").BoundaryShapes = Part.Shape()
 
+        # Thinning properties.
+        self.add_thinning_properties(obj)
+
         # Analysis properties.
         obj.addProperty(
             "App::PropertyEnumeration", "AnalysisType", "Analysis",
@@ -120,52 +138,173 @@ class Surface(DataFunctions):
 
         obj.Proxy = self
 
+    def add_thinning_properties(self, obj):
+        '''
+        Add point thinning properties.
+        '''
+        obj.addProperty(
+            "App::PropertyEnumeration", "ThinningMode", "Thinning",
+            "Keep one point per grid cell before triangulation").ThinningMode = [
+                "None", "Grid Minimum", "Grid Mean", "Grid Maximum"]
+
+        obj.addProperty(
+            "App::PropertyLength", "CellSize", "Thinning",
+            "Size of thinning grid cells").CellSize = 1000
+
+        obj.addProperty(
+            "App::PropertyLength", "ZTolerance", "Thinning",
+            "Also keep points farther than this from the cell elevation").ZTolerance = 0
+
+        obj.addProperty(
+            "App::PropertyInteger", "KeptPoints", "Thinning",
+            "Number of points used for triangulation", 1).KeptPoints = 0
+
+    def __getstate__(self):
+        """
+        Save variables to file.
+        """
+        return self.Type
+
+    def __setstate__(self, state):
+        """
+        Set variables from file.
+        """
+        if isinstance(state, dict):
+            state = state.get('Type')
+        if state:
+            self.Type = state
+
+        self.index = None
+        self.mesh_revision = 0
+        self.mesh_changes = []
+        self.changed_area = None
+        self.points = None
+        self.group_revisions = {}
+        self.dirty = set()
+        self.reset_triangulation()
+
+    def onDocumentRestored(self, obj):
+        """
+        Restore Object references on reload.
+        """
+        self.Object = obj
+
+        if not hasattr(obj, "CacheKey"):
+            obj.addProperty(
+                "App::PropertyString", "CacheKey", "Triangulation",
+                "Hash of the inputs of stored results", 4).CacheKey = ""
+
+        if not hasattr(obj, "ThinningMode"):
+            self.add_thinning_properties(obj)
+
+        # Stored results are up to date, keep triangulation for later edits
+        if obj.CacheKey == self.get_cache_key(obj):
+            if obj.Delaunay:
+                self.tri_points = self.get_points(obj)
+                self.tri_simplices = np.array(obj.Delaunay, dtype=np.int64).reshape(-1, 3)
+            return
+
+        self.dirty.add("triangulation")
+        obj.touch()
+
+    def get_points(self, obj):
+        """
+        Return the thinned surface points that triangulation indexes refer to.
+        """
+        if self.points is None:
+            points = np.array(obj.Vectors, dtype=float).reshape(-1, 3)
+            self.points = self.thin_points(
+                points, obj.ThinningMode, obj.CellSize.Value, obj.ZTolerance.Value)
+
+        return self.points
+
+    def get_cache_key(self, obj):
+        """
+        Return the hash of inputs the surface results are computed from.
+        """
+        modes = obj.getEnumerationsOfProperty("ThinningMode")
+
+        return self.cache_key(
+            self.get_points(obj),
+            obj.MaxLength.Value, obj.MaxAngle.Value,
+            obj.MajorInterval.Value, obj.MinorInterval.Value,
+            modes.index(obj.ThinningMode), obj.CellSize.Value, obj.ZTolerance.Value)
+
+    def get_index(self):
+        """
+        Return the triangle index of the surface mesh, build it if needed.
+        """
+        if self.index is None:
+            points, facets = mesh_arrays(self.Object.Mesh)
+            self.index = TriangleIndex(points, facets)
+
+        return self.index
+
+    def changes_since(self, revision):
+        """
+        Return [xmin, ymin, xmax, ymax] of mesh changes after a revision.
+        None means the whole mesh may have changed.
+        """
+        changes = [i for i in self.mesh_changes if i[0] > revision]
+        if revision > self.mesh_revision \
+                or len(changes) < self.mesh_revision - revision:
+            return None
+
+        bounds = np.array([np.inf, np.inf, -np.inf, -np.inf])
+        for i, area in changes:
+            if area is None: return None
+            bounds[:2] = np.minimum(bounds[:2], area[:2])
+            bounds[2:] = np.maximum(bounds[2:], area[2:])
+
+        return bounds
+
+    def elevations_at(self, xs, ys):
+        """
+        Return surface elevations at x, y coordinates of the mesh.
+        Points outside the surface get NaN.
+        """
+        return self.get_index().elevations_at(xs, ys)
+
     def onChanged(self, obj, prop):
         '''
         Do something when a data property has changed.
         '''
-        if prop == "Placement":
-            placement = obj.getPropertyByName(prop)
-            copy_mesh = obj.Mesh.copy()
-            copy_mesh.Placement = placement
-            obj.Mesh = copy_mesh
+        # Stored results are checked after the document is restored
+        if 'Restore' in obj.State:
+            return
 
-        if prop =="PointGroups":
-            pgs = obj.getPropertyByName(prop)
-            points = []
-            for pg in pgs:
-                points.extend(pg.Vectors)
+        # Mark the stages to run on the next recompute
+        if prop == "PointGroups":
+            self.dirty.add("points")
 
-            obj.Vectors = points
+        if prop in ["Vectors", "ThinningMode", "CellSize", "ZTolerance"]:
+            self.points = None
+            self.dirty.add("triangulation")
 
-        if prop =="Vectors":
-            vectors = obj.getPropertyByName(prop)
-            if vectors:
-                base = geo_origin.get(vectors[0]).Origin
+        if prop == "Delaunay" or prop == "MaxLength" or prop == "MaxAngle":
+            self.dirty.add("mesh")
 
-                if len(vectors) > 2:
-                    pts = []
-                    for i in vectors:
-                        pts.append(i.sub(base))
+        # Triangles assigned from outside, as by LandXML imports, replace
+        # the pending triangulation. The triangulation stage clears it first.
+        if prop == "Delaunay" and "triangulation" in self.dirty:
+            self.dirty.discard("triangulation")
+            self.reset_triangulation()
 
-                    obj.Delaunay = self.triangulate(vectors)
-                else:
-                    obj.Mesh = Mesh.Mesh()
+        if prop == "Placement":
+            self.dirty.add("placement")
 
-        if prop == "Delaunay" or prop == "MaxLength" or prop == "MaxAngle":
-            delaunay = obj.getPropertyByName("Delaunay")
-            vectors = obj.getPropertyByName("Vectors")
-            lmax = obj.getPropertyByName("MaxLength")
-            amax = obj.getPropertyByName("MaxAngle")
-            base = geo_origin.get().Origin
+        if prop == "Mesh":
+            self.index = None
+            self.mesh_revision += 1
 
-            pts = []
-            for i in vectors:
-                pts.append(i.sub(base))
+            # Keep a short log of changed areas for dependent objects
+            self.mesh_changes.append((self.mesh_revision, self.changed_area))
+            del self.mesh_changes[:-32]
+            self.changed_area = None
+            self.dirty.update(["contours", "boundary"])
 
-            if delaunay:
-                obj.Mesh = self.test_delaunay(
-                    pts, delaunay, lmax, amax)
+        if prop == "MajorInterval":
+            self.dirty.add("contours")
 
         if prop == "MinorInterval":
             min_int = obj.getPropertyByName(prop)
@@ -175,13 +314,72 @@ class Surface(DataFunctions):
         '''
         Do something when doing a recomputation. 
         '''
-        major = obj.MajorInterval
-        minor = obj.MinorInterval
+        # Edits of linked point groups do not notify the surface
+        revisions = {pg.Name: pg.Proxy.revision for pg in obj.PointGroups}
+        for name, revision in revisions.items():
+            if self.group_revisions.get(name, 0) != revision:
+                self.dirty.add("points")
+
+        # Stages set properties that mark the next stages dirty
+        if not self.dirty:
+            return
+
+        if "points" in self.dirty:
+            self.dirty.discard("points")
+            self.group_revisions = revisions
+            vectors = []
+            for pg in obj.PointGroups:
+                vectors.extend(pg.Vectors)
+
+            obj.Vectors = vectors
+
+        if "triangulation" in self.dirty:
+            self.dirty.discard("triangulation")
+            points = self.get_points(obj)
+            obj.KeptPoints = len(points)
+
+            if len(points) > 2:
+                geo_origin.get(FreeCAD.Vector(*points[0].tolist()))
+                obj.Delaunay = self.triangulate(points)
+            else:
+                self.reset_triangulation()
+                obj.Delaunay = []
+
+        if "mesh" in self.dirty:
+            self.dirty.difference_update(["mesh", "placement"])
+            mesh = Mesh.Mesh()
+
+            if obj.Delaunay:
+                base = geo_origin.get().Origin
+                mesh = self.test_delaunay(
+                    self.get_points(obj) - np.array(base),
+                    obj.Delaunay, obj.MaxLength, obj.MaxAngle)
+
+                if obj.Placement.isIdentity():
+                    self.changed_area = self.tri_changed
+
+            mesh.Placement = obj.Placement
+            obj.Mesh = mesh
+
+        if "placement" in self.dirty:
+            self.dirty.discard("placement")
+            copy_mesh = obj.Mesh.copy()
+            copy_mesh.Placement = obj.Placement
+            obj.Mesh = copy_mesh
+
+        if "contours" in self.dirty:
+            self.dirty.discard("contours")
+            major = obj.MajorInterval
+            minor = obj.MinorInterval
 
-        obj.ContourShapes = self.get_contours(
-            obj.Mesh, major.Value/1000, minor.Value/1000)
+            obj.ContourShapes = self.get_contours(
+                obj.Mesh, major.Value/1000, minor.Value/1000)
 
-        obj.BoundaryShapes = self.get_boundary(obj.Mesh)
+        if "boundary" in self.dirty:
+            self.dirty.discard("boundary")
+            obj.BoundaryShapes = self.get_boundary(obj.Mesh)
+
+        obj.CacheKey = self.get_cache_key(obj)
 
 
 class ViewProviderSurface(ViewFunctions):
@@ -224,6 +422,9 @@ class ViewProviderSurface(ViewFunctions):
             "App::PropertyFloatConstraint", "LineWidth", "Surface Style",
             "Set triangle edge line width").LineWidth = (0.0, 1.0, 20.0, 1.0)
 
+        # Level of detail properties.
+        self.add_lod_properties(vobj)
+
         # Boundary properties.
         vobj.addProperty(
             "App::PropertyColor", "BoundaryColor", "Boundary Style",
@@ -261,15 +462,35 @@ class ViewProviderSurface(ViewFunctions):
         vobj.Proxy = self
         vobj.ShapeMaterial.DiffuseColor = vobj.ShapeColor
 
+    def add_lod_properties(self, vobj):
+        '''
+        Add level of detail properties.
+        '''
+        vobj.addProperty(
+            "App::PropertyBool", "LevelOfDetail", "Level of Detail",
+            "Show large surfaces as tiles with decimated levels").LevelOfDetail = True
+
+        vobj.addProperty(
+            "App::PropertyIntegerConstraint", "LodThreshold", "Level of Detail",
+            "Triangle count above which level of detail is used"
+            ).LodThreshold = (500000, 1, 2147483647, 10000)
+
     def attach(self, vobj):
         '''
         Create Object visuals in 3D view.
         '''
+        if not hasattr(vobj, "LevelOfDetail"):
+            self.add_lod_properties(vobj)
+
         # GeoCoords Node.
         self.geo_coords = coin.SoGeoCoordinate()
 
         # Surface features.
         self.triangles = coin.SoIndexedFaceSet()
+        self.surface_group = coin.SoGroup()
+        self.surface_group.addChild(self.geo_coords)
+        self.surface_group.addChild(self.triangles)
+        self.lod_faces = [(self.triangles, None, True)]
         self.face_material = coin.SoMaterial()
         self.edge_material = coin.SoMaterial()
         self.edge_color = coin.SoBaseColor()
@@ -278,8 +499,10 @@ class ViewProviderSurface(ViewFunctions):
 
         shape_hints = coin.SoShapeHints()
         shape_hints.vertex_ordering = coin.SoShapeHints.COUNTERCLOCKWISE
-        mat_binding = coin.SoMaterialBinding()
-        mat_binding.value = coin.SoMaterialBinding.PER_FACE
+        self.mat_binding = coin.SoMaterialBinding()
+        self.mat_binding.value = coin.SoMaterialBinding.OVERALL
+        edge_binding = coin.SoMaterialBinding()
+        edge_binding.value = coin.SoMaterialBinding.OVERALL
         offset = coin.SoPolygonOffset()
         offset.styles = coin.SoPolygonOffset.LINES
         offset.factor = -2.0
@@ -331,20 +554,20 @@ class ViewProviderSurface(ViewFunctions):
         highlight = coin.SoType.fromName('SoFCSelection').createInstance()
         highlight.style = 'EMISSIVE_DIFFUSE'
         highlight.addChild(shape_hints)
-        highlight.addChild(mat_binding)
-        highlight.addChild(self.geo_coords)
-        highlight.addChild(self.triangles)
+        highlight.addChild(self.surface_group)
         highlight.addChild(boundaries)
 
         # Face root.
         face = coin.SoSeparator()
         face.addChild(self.face_material)
+        face.addChild(self.mat_binding)
         face.addChild(highlight)
 
         # Edge root.
         edge = coin.SoSeparator()
         edge.addChild(self.edge_material)
         edge.addChild(self.edge_style)
+        edge.addChild(edge_binding)
         edge.addChild(highlight)
 
         # Surface root.
@@ -462,6 +685,10 @@ class ViewProviderSurface(ViewFunctions):
             width = vobj.getPropertyByName(prop)
             self.minor_style.lineWidth = width
 
+        if prop == "LevelOfDetail" or prop == "LodThreshold":
+            if hasattr(self, "surface_group") and hasattr(vobj, "LodThreshold"):
+                self.updateData(vobj.Object, "Mesh")
+
     def updateData(self, obj, prop):
         '''
         Update Object visuals when a data property changed.
@@ -478,14 +705,9 @@ class ViewProviderSurface(ViewFunctions):
             mesh = obj.getPropertyByName("Mesh")
             copy_mesh = mesh.copy()
             copy_mesh.Placement.move(origin.Origin)
+            points, facets = mesh_arrays(copy_mesh)
 
-            triangles = []
-            for i in copy_mesh.Topology[1]:
-                triangles.extend(list(i))
-                triangles.append(-1)
-
-            self.geo_coords.point.values = copy_mesh.Topology[0]
-            self.triangles.coordIndex.values = triangles
+            self.set_geometry(obj.ViewObject, points, facets, geo_system)
 
             del copy_mesh
 
@@ -512,22 +734,116 @@ class ViewProviderSurface(ViewFunctions):
             self.boundary_coords.point.values = points
             self.boundary_lines.numVertices.values = vertices
 
-        if prop == "AnalysisType" or prop == "Ranges":
+        if prop == "Mesh" or prop == "AnalysisType" or prop == "Ranges":
             analysis_type = obj.getPropertyByName("AnalysisType")
             ranges = obj.getPropertyByName("Ranges")
 
             if analysis_type == "Default":
+                self.mat_binding.value = coin.SoMaterialBinding.OVERALL
                 if hasattr(obj.ViewObject, "ShapeMaterial"):
                     material = obj.ViewObject.ShapeMaterial
                     self.face_material.diffuseColor = material.DiffuseColor[:3]
 
-            if analysis_type == "Elevation":
-                colorlist = self.elevation_analysis(obj.Mesh, ranges)
-                self.face_material.diffuseColor.setValues(0,len(colorlist),colorlist)
+            else:
+                index, palette = self.analysis_ranges(obj.Mesh, analysis_type, ranges)
+                self.face_material.diffuseColor.setValues(0, len(palette), palette.tolist())
+                self.face_material.diffuseColor.setNum(len(palette))
+
+                # Every level takes the range of its source facets
+                for faces, source, full in self.lod_faces:
+                    level_index = index if source is None else index[source]
+                    faces.materialIndex.setValues(0, len(level_index), level_index.tolist())
+                    faces.materialIndex.setNum(len(level_index))
 
-            elif analysis_type == "Slope":
-                colorlist = self.slope_analysis(obj.Mesh, ranges)
-                self.face_material.diffuseColor.setValues(0,len(colorlist),colorlist)
+                self.mat_binding.value = coin.SoMaterialBinding.PER_FACE_INDEXED
+
+    def set_geometry(self, vobj, points, facets, geo_system):
+        '''
+        Fill surface nodes from point and facet arrays. Large surfaces
+        are split into tiles, each switching between decimated levels.
+        '''
+        self.surface_group.removeAllChildren()
+        self.lod_faces = []
+
+        lod = getattr(vobj, "LevelOfDetail", False)
+        threshold = max(getattr(vobj, "LodThreshold", 1), 1)
+
+        if not lod or len(facets) <= threshold:
+            self.fill_faces(self.geo_coords, self.triangles, points, facets)
+            self.surface_group.addChild(self.geo_coords)
+            self.surface_group.addChild(self.triangles)
+            self.lod_faces.append((self.triangles, None, True))
+            return
+
+        # Full mesh and two levels clustered from average point spacing
+        lower = points[:, :2].min(axis=0)
+        extent = np.maximum(points[:, :2].max(axis=0) - lower, 1e-9)
+        spacing = np.sqrt(extent[0] * extent[1] / len(points))
+
+        levels = [(points, facets, np.arange(len(facets)))]
+        for factor in [4, 16]:
+            levels.append(self.cluster_mesh(points, facets, spacing * factor))
+
+        # Tiles of about a quarter of the threshold triangles
+        count = int(np.ceil(np.sqrt(4 * len(facets) / threshold)))
+        tile_levels = []
+        for level_points, level_facets, source in levels:
+            centers = level_points[:, :2][level_facets].mean(axis=1)
+            cell = np.floor((centers - lower) / extent * count).astype(np.int64)
+            cell = np.clip(cell, 0, count - 1)
+            tile = cell[:, 0] * count + cell[:, 1]
+            order = np.argsort(tile, kind='stable')
+            bounds = np.searchsorted(tile[order], np.arange(count * count + 1))
+            tile_levels.append((level_points, level_facets, source, order, bounds))
+
+        for tile in range(count * count):
+            if all(i[4][tile] == i[4][tile + 1] for i in tile_levels):
+                continue
+
+            lod_node = coin.SoLevelOfDetail()
+            lod_node.screenArea.setValues(0, 2, [160000, 10000])
+
+            for level, (level_points, level_facets, source, order, bounds) \
+                    in enumerate(tile_levels):
+                selected = order[bounds[tile]:bounds[tile + 1]]
+                used, inverse = np.unique(level_facets[selected], return_inverse=True)
+
+                coords = coin.SoGeoCoordinate()
+                coords.geoSystem.setValues(geo_system)
+                faces = coin.SoIndexedFaceSet()
+                self.fill_faces(coords, faces, level_points[used], inverse.reshape(-1, 3))
+                self.lod_faces.append((faces, source[selected], level == 0))
+
+                level = coin.SoSeparator()
+                level.addChild(coords)
+                level.addChild(faces)
+                lod_node.addChild(level)
+
+            separator = coin.SoSeparator()
+            separator.renderCulling = coin.SoSeparator.ON
+            separator.addChild(lod_node)
+            self.surface_group.addChild(separator)
+
+    def get_facet_index(self, picked_point):
+        '''
+        Return the mesh facet index of a picked triangle, or None. Tiles
+        number their own triangles and decimated levels have no single
+        facet, so picks are mapped with the sources of lod_faces.
+        '''
+        detail = picked_point.getDetail()
+        if not detail.isOfType(coin.SoFaceDetail.getClassTypeId()):
+            return None
+
+        face_detail = coin.cast(detail, str(detail.getTypeId().getName()))
+        index = face_detail.getFaceIndex()
+        node = picked_point.getPath().getTail()
+
+        for faces, source, full in self.lod_faces:
+            if faces == node:
+                if not full: return None
+                return index if source is None else int(source[index])
+
+        return None
 
     def getDisplayModes(self,vobj):
         '''
@@ -27,12 +27,33 @@ Define Surface Object functions.
 import FreeCAD
 import Mesh, Part
 import numpy as np
-import copy, math
+import hashlib
 import scipy.spatial
+import scipy.sparse
+import scipy.sparse.csgraph
+
+
+def mesh_arrays(mesh):
+    """
+    Return mesh points and facet indexes as arrays.
+    """
+    points, facets = mesh.Topology
+    points = np.array(points, dtype=float).reshape(-1, 3)
+    facets = np.array(facets, dtype=np.int64).reshape(-1, 3)
+
+    return points, facets
+
+
+def orient_ccw(points, facets):
+    """
+    Return a copy of facets with clockwise triangles reversed.
+    """
+    facets = np.array(facets, dtype=np.int64).reshape(-1, 3)
+    flip = DataFunctions.signed_areas(points[:, :2], facets) < 0
+    facets[flip] = facets[flip][:, ::-1]
+
+    return facets
 
-import itertools as itools
-from collections import Counter
-from ast import literal_eval
 
 class DataFunctions:
     """
@@ -42,156 +63,604 @@ class DataFunctions:
         pass
 
     @staticmethod
-    def triangulate(points):
+    def thin_points(points, mode, cell_size, tolerance=0):
+        """
+        Keep the lowest, mean or highest point of every grid cell. Points
+        farther than tolerance from their cell elevation are also kept.
+        """
+        if mode == "None" or cell_size <= 0 or len(points) == 0:
+            return points
+
+        # Grid cell of every point
+        cell = np.floor((points[:, :2] - points[:, :2].min(axis=0)) / cell_size)
+        cell = cell.astype(np.int64)
+        key = cell[:, 0] * (cell[:, 1].max() + 1) + cell[:, 1]
+        ids, counts = np.unique(key, return_inverse=True, return_counts=True)[1:]
+        ids = ids.ravel()
+
+        if mode == "Grid Mean":
+            kept = np.column_stack([
+                np.bincount(ids, points[:, i]) / counts for i in range(3)])
+            chosen = np.zeros(len(points), dtype=bool)
+        else:
+            # Sort by cell, then elevation
+            order = np.lexsort((points[:, 2], ids))
+            last = np.cumsum(counts) - 1
+            first = last - counts + 1
+            index = order[first] if mode == "Grid Minimum" else order[last]
+            kept = points[index]
+            chosen = np.zeros(len(points), dtype=bool)
+            chosen[index] = True
+
+        if tolerance > 0:
+            significant = np.abs(points[:, 2] - kept[ids, 2]) > tolerance
+            kept = np.vstack([kept, points[significant & ~chosen]])
+
+        return kept
+
+    def reset_triangulation(self):
+        """
+        Forget the triangulation kept between edits.
+        """
+        self.tri_points = None
+        self.tri_simplices = None
+        self.tri_source = None
+        self.tri_keep = None
+        self.tri_limits = None
+        self.tri_changed = None
+
+    def triangulate(self, points):
         """
-        Create 2D Delaunay triangulation.
+        Create 2D Delaunay triangulation. When the previous triangulation
+        is known, only the area around added and removed points is
+        triangulated again.
+        """
+        data = np.array(points, dtype=float).reshape(-1, 3)
+
+        result = None
+        if self.tri_points is not None:
+            result = self.update_delaunay(
+                self.tri_points, self.tri_simplices, data)
+
+        if result is None:
+            simplices = self.full_delaunay(data)
+            source = np.full(len(simplices), -1)
+        else:
+            simplices, source = result
+
+        self.tri_points = data
+        self.tri_simplices = simplices
+        self.tri_source = source
+
+        return simplices.ravel().tolist()
+
+    @staticmethod
+    def full_delaunay(data):
+        """
+        Create 2D Delaunay triangulation of all points.
         """
         # Normalize points
-        base = points[0]
-        nor_points = []
-        for point in points:
-            nor_points.append(point.sub(base))
+        base = data[0, :2]
+        tri = scipy.spatial.Delaunay(data[:, :2] - base)
 
-        data = np.array(nor_points) 
+        return tri.simplices.astype(np.int64)
 
-        # Create delaunay triangulation
-        tri = scipy.spatial.Delaunay(data[:, :2])
-        delaunay = []
+    def update_delaunay(self, old_points, old_simplices, data):
+        """
+        Update a Delaunay triangulation for added and removed points by
+        triangulating again only the triangles in conflict with them.
+        Return None when a full triangulation is needed.
+        """
+        if old_simplices is None or len(old_simplices) == 0:
+            return None
+
+        # Match points by their coordinates
+        n_old = len(old_points)
+        if len(data) >= n_old and np.array_equal(data[:n_old], old_points):
+            # Points appended to the end
+            old_to_new = np.arange(n_old)
+            added = np.arange(n_old, len(data))
+        else:
+            keys = np.concatenate([
+                self.row_keys(old_points), self.row_keys(data)])
+            ids = np.unique(keys, return_inverse=True)[1].ravel()
+            old_ids, new_ids = ids[:n_old], ids[n_old:]
+
+            first = np.full(ids.max() + 1, -1)
+            first[new_ids[::-1]] = np.arange(len(data))[::-1]
+            old_to_new = first[old_ids]
+
+            present = np.zeros(len(first), dtype=bool)
+            present[old_ids] = True
+            added = np.flatnonzero(
+                ~present[new_ids] & (first[new_ids] == np.arange(len(data))))
+
+        is_removed = old_to_new < 0
+
+        if len(added) == 0 and not is_removed.any():
+            return old_to_new[old_simplices], np.arange(len(old_simplices))
+
+        # Triangles around removed points
+        conflict = is_removed[old_simplices].any(axis=1)
+
+        # Removing a convex hull vertex changes the hull
+        if self.open_star(old_simplices[conflict], is_removed):
+            return None
+
+        # Triangles whose circumcircle contains an added point
+        if len(added):
+            conflict |= self.circumcircle_conflicts(
+                old_points, old_simplices, data[added])
+
+        cavity = old_simplices[conflict]
+        if len(cavity) == 0 and len(added) == 0:
+            # Only unused points were removed
+            return old_to_new[old_simplices], np.arange(len(old_simplices))
+
+        if len(cavity) == 0 or len(cavity) > len(old_simplices) / 2:
+            return None
+
+        # Triangulate cavity vertices and added points again
+        vertices = np.unique(cavity)
+        vertices = vertices[~is_removed[vertices]]
+        local_to_new = np.concatenate([old_to_new[vertices], added])
+        xy = np.vstack([old_points[vertices, :2], data[added, :2]])
+
+        try:
+            local = scipy.spatial.Delaunay(xy - xy.mean(axis=0)).simplices
+        except (RuntimeError, ValueError):
+            return None
+
+        # Every point must be used, duplicates are left to a full run
+        if len(np.unique(local)) != len(xy):
+            return None
+
+        old_to_local = np.full(n_old, -1)
+        old_to_local[vertices] = np.arange(len(vertices))
+        local = self.cavity_triangles(
+            old_points[:, :2], cavity, xy, local, old_to_local)
+        if local is None:
+            return None
+
+        # New triangles have to cover the cavity exactly
+        cavity_area = np.abs(self.signed_areas(old_points[:, :2], cavity)).sum()
+        local_area = np.abs(self.signed_areas(xy, local)).sum()
+        if not np.isclose(local_area, cavity_area, rtol=1e-6):
+            return None
+
+        survivors = np.flatnonzero(~conflict)
+        simplices = np.vstack([
+            old_to_new[old_simplices[survivors]], local_to_new[local]])
+        source = np.concatenate([survivors, np.full(len(local), -1)])
+
+        return simplices, source
 
-        for i in tri.vertices.tolist():
-            delaunay.extend(i)
+    @staticmethod
+    def cache_key(points, *values):
+        """
+        Return a content hash of a point list and parameter values.
+        """
+        data = np.ascontiguousarray(np.array(points, dtype=float).reshape(-1, 3))
+        digest = hashlib.sha1(data.tobytes())
+        digest.update(np.array(values, dtype=float).tobytes())
 
-        return delaunay
+        return digest.hexdigest()
 
     def test_delaunay(self, points, delaunay, lmax, amax):
         """
         Test delaunay for max length and max angle.
         """
-        index = []
-        mesh_index = []
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        facets = np.asarray(delaunay, dtype=np.int64).reshape(-1, 3)
 
-        for i in range(0, len(delaunay), 3):
-            first, second,third = delaunay[i:i+3]
+        limits = (float(lmax), float(amax))
+        current = self.tri_simplices is not None \
+            and np.array_equal(facets, self.tri_simplices)
 
-            p1 = copy.deepcopy(points[first])
-            p2 = copy.deepcopy(points[second])
-            p3 = copy.deepcopy(points[third])
-            p1.z = p2.z = p3.z = 0
+        # Triangles kept from the previous triangulation are not tested again
+        keep = np.zeros(len(facets), dtype=bool)
+        test = np.ones(len(facets), dtype=bool)
+        if current and self.tri_keep is not None and self.tri_limits == limits:
+            known = self.tri_source >= 0
+            keep[known] = self.tri_keep[self.tri_source[known]]
+            test = ~known
 
-            #Test triangle
-            if self.max_length(lmax, p1, p2, p3)\
-                and self.max_angle(amax,  p1, p2, p3):
-                index.extend([first, second, third])
+        keep[test] = self.filter_triangles(points, facets[test], lmax, amax)
 
-        for i in index:
-            mesh_index.append(points[i])
+        # Area of triangles that were tested, None if all of them were
+        self.tri_changed = None
+        if not test.all():
+            self.tri_changed = self.facet_bounds(points, facets[test])
 
-        return Mesh.Mesh(mesh_index)
+        if current:
+            self.tri_keep = keep
+            self.tri_limits = limits
+            self.tri_source = np.arange(len(facets))
 
+        return self.build_mesh(points, facets[keep])
+
+    @staticmethod
+    def facet_bounds(points, facets):
+        """
+        Return [xmin, ymin, xmax, ymax] of facets, inverted if there are none.
+        """
+        if len(facets) == 0:
+            return np.array([np.inf, np.inf, -np.inf, -np.inf])
+
+        xy = points[np.unique(facets), :2]
+
+        return np.concatenate([xy.min(axis=0), xy.max(axis=0)])
+
+    @staticmethod
+    def row_keys(points):
+        """
+        Return a hashable key for every row of a point array.
+        """
+        data = np.ascontiguousarray(points, dtype=float)
+
+        return data.view(np.dtype((np.void, data.dtype.itemsize * data.shape[1]))).ravel()
+
+    @staticmethod
+    def signed_areas(xy, facets):
+        """
+        Return doubled signed areas of triangles, positive if counterclockwise.
+        """
+        p1, p2, p3 = xy[facets[:, 0]], xy[facets[:, 1]], xy[facets[:, 2]]
+
+        return (p2[:, 0] - p1[:, 0]) * (p3[:, 1] - p1[:, 1]) \
+            - (p3[:, 0] - p1[:, 0]) * (p2[:, 1] - p1[:, 1])
+
+    @staticmethod
+    def open_star(facets, is_removed):
+        """
+        Check if any removed point is on the boundary of the given
+        triangles, which means it is a convex hull vertex.
+        """
+        if len(facets) == 0:
+            return False
+
+        edges = np.concatenate([facets[:, [0, 1]], facets[:, [1, 2]], facets[:, [2, 0]]])
+        edges = edges[is_removed[edges].any(axis=1)]
+        edges.sort(axis=1)
+        counts = np.unique(edges, axis=0, return_counts=True)[1]
+
+        return bool((counts == 1).any())
+
+    @staticmethod
+    def circumcircle_conflicts(points, simplices, added):
+        """
+        Return a mask of the triangles whose circumcircle contains
+        any of the added points.
+        """
+        xy = points[:, :2]
+        a = xy[simplices[:, 0]]
+        b = xy[simplices[:, 1]] - a
+        c = xy[simplices[:, 2]] - a
+
+        # Circumcenters relative to the first vertex
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d = 2 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+            bb = np.einsum('ij,ij->i', b, b)
+            cc = np.einsum('ij,ij->i', c, c)
+            ux = (c[:, 1] * bb - b[:, 1] * cc) / d
+            uy = (b[:, 0] * cc - c[:, 0] * bb) / d
+
+        radius = np.hypot(ux, uy)
+        center = a + np.column_stack([ux, uy])
+
+        # Only circles near the added points need an exact test
+        lower = added[:, :2].min(axis=0)
+        upper = added[:, :2].max(axis=0)
+        with np.errstate(invalid='ignore'):
+            near = np.all(center + radius[:, None] >= lower, axis=1) \
+                & np.all(center - radius[:, None] <= upper, axis=1)
+
+        conflict = np.zeros(len(simplices), dtype=bool)
+        index = np.flatnonzero(near)
+        if len(index):
+            tree = scipy.spatial.cKDTree(added[:, :2])
+            distance = tree.query(center[index])[0]
+            conflict[index] = distance < radius[index]
+
+        return conflict
+
+    def cavity_triangles(self, old_xy, cavity, xy, local, old_to_local):
+        """
+        Return the triangles of a local triangulation that lie inside
+        the cavity. Return None if the cavity boundary is not kept.
+        """
+        # Counterclockwise cavity and local triangles
+        cavity = orient_ccw(old_xy, cavity)
+        local = orient_ccw(xy, local)
+
+        # Directed boundary edges of the cavity in local indices
+        edges = np.concatenate([cavity[:, [0, 1]], cavity[:, [1, 2]], cavity[:, [2, 0]]])
+        sorted_edges = np.sort(edges, axis=1)
+        _, inverse, counts = np.unique(
+            sorted_edges, axis=0, return_inverse=True, return_counts=True)
+        boundary = old_to_local[edges[counts[inverse.ravel()] == 1]]
+        if (boundary < 0).any():
+            return None
+
+        n = len(xy)
+        local_edges = np.concatenate([local[:, [0, 1]], local[:, [1, 2]], local[:, [2, 0]]])
+        owner = np.tile(np.arange(len(local)), 3)
+        directed = local_edges[:, 0] * n + local_edges[:, 1]
+        undirected = np.minimum(local_edges[:, 0], local_edges[:, 1]) * n \
+            + np.maximum(local_edges[:, 0], local_edges[:, 1])
+
+        # Cavity boundary edges must be in the local triangulation
+        inner = boundary[:, 0] * n + boundary[:, 1]
+        if not np.isin(inner, directed).all():
+            return None
+
+        # Connect triangles across edges that are not on the cavity boundary
+        wall = np.isin(undirected, np.minimum(boundary[:, 0], boundary[:, 1]) * n
+            + np.maximum(boundary[:, 0], boundary[:, 1]))
+        order = np.argsort(undirected, kind='stable')
+        keys = undirected[order]
+        pair = np.flatnonzero((keys[1:] == keys[:-1]) & ~wall[order][1:])
+        graph = scipy.sparse.coo_matrix(
+            (np.ones(len(pair)), (owner[order][pair], owner[order][pair + 1])),
+            shape=(len(local), len(local)))
+        labels = scipy.sparse.csgraph.connected_components(graph, directed=False)[1]
+
+        # Triangles on the inner side of the boundary are inside
+        inside = np.zeros(labels.max() + 1, dtype=bool)
+        inside[labels[owner[np.isin(directed, inner)]]] = True
+        outer = boundary[:, 1] * n + boundary[:, 0]
+        if inside[labels[owner[np.isin(directed, outer)]]].any():
+            return None
+
+        return local[inside[labels]]
 
     @staticmethod
-    def max_length(lmax, p1, p2, p3):
+    def filter_triangles(points, facets, lmax, amax):
         """
-        Calculation of the 2D length between triangle edges
+        Return a mask of the triangles whose 2D edge lengths and
+        interior angles are within max length and max angle.
         """
+        xy = points[:, :2]
+        p1 = xy[facets[:, 0]]
+        p2 = xy[facets[:, 1]]
+        p3 = xy[facets[:, 2]]
+
+        # Edge vectors of every triangle
+        edges = np.stack([p2 - p1, p3 - p2, p1 - p3], axis=1)
+
         # Calculate length between triangle vertices
-        tri = [[p1, p2], [p2, p3], [p3, p1]]
-        for i, j in tri:
-            vec = i.sub(j)
+        lengths = np.hypot(edges[:, :, 0], edges[:, :, 1])
+        keep = np.all(lengths <= float(lmax), axis=1)
+
+        if float(amax) >= 180:
+            return keep
 
-            # Compare with input
-            if vec.Length > lmax:
-                return False
-        return True
+        # Calculate interior angles from the edges meeting at each vertex
+        first = -np.roll(edges, 1, axis=1)
+        second = edges
+        cross = first[:, :, 0] * second[:, :, 1] - first[:, :, 1] * second[:, :, 0]
+        dot = np.einsum('ijk,ijk->ij', first, second)
+        degrees = np.degrees(np.arctan2(np.abs(cross), dot))
+
+        return keep & np.all(degrees <= float(amax), axis=1)
 
     @staticmethod
-    def max_angle(amax, p1, p2, p3):
+    def build_mesh(points, facets):
         """
-        Calculation of the 2D angle between triangle edges
+        Create a mesh from a point array and a facet index array.
+        Unused points are dropped and facets are ordered counterclockwise.
         """
-        # Calculate angle between triangle vertices
-        tri = [[p1, p2, p3], [p2, p3, p1], [p3, p1, p2]]
-        for j, k, l in tri:
-            vec1 = j.sub(k)
-            vec2 = l.sub(k)
-            radian = vec1.getAngle(vec2)
-            degree = math.degrees(radian)
+        mesh = Mesh.Mesh()
+        if len(facets) == 0:
+            return mesh
+
+        used, inverse = np.unique(facets, return_inverse=True)
+        facets = inverse.reshape(-1, 3)
+        vertices = points[used]
+
+        # Flip clockwise triangles so that facet normals point up
+        facets = orient_ccw(vertices, facets)
 
-            # Compare with input
-            if degree > amax:
-                return False
-        return True
+        mesh.addFacets((
+            [FreeCAD.Vector(*i) for i in vertices.tolist()],
+            [tuple(i) for i in facets.tolist()]))
+
+        return mesh
 
     def get_contours(self, mesh, major, minor):
         """
         Create triangulation contour lines
         """
-        # Find max and min elevation of mesh
-        zmax = mesh.BoundBox.ZMax/1000
-        zmin = mesh.BoundBox.ZMin/1000
+        points, facets = mesh_arrays(mesh)
 
         # Get point list and create contour points
         minor_contours = []
         major_contours = []
 
-        delta = minor
-        while delta < zmax:
-            if minor == 0: break
-            cross_sections = mesh.crossSections([((0, 0, delta*1000), (0, 0, 1))], 0.000001)
-
-            for point_list in cross_sections[0]:
-                if len(point_list) > 3:
-                    wire = Part.makePolygon(point_list)
+        if minor > 0 and len(facets):
+            lines = self.contour_lines(points, facets, minor*1000)
 
-                    if delta % major == 0:
-                        major_contours.append(wire)
-                    else:
-                        minor_contours.append(wire)
+            for index, point_list in lines:
+                wire = Part.makePolygon(
+                    [FreeCAD.Vector(*i) for i in point_list.tolist()])
 
-                    del point_list
-
-            del cross_sections
-            delta += minor
+                # Decide major contours by level count, not float modulo
+                ratio = index * minor / major if major > 0 else 0.5
+                if abs(ratio - round(ratio)) < 1e-6:
+                    major_contours.append(wire)
+                else:
+                    minor_contours.append(wire)
 
         majors = Part.makeCompound(major_contours)
         minors = Part.makeCompound(minor_contours)
 
-        del major_contours, minor_contours
-
         return Part.makeCompound([majors, minors])
 
+    @staticmethod
+    def contour_lines(points, facets, interval):
+        """
+        Create contour polylines for every multiple of the interval in one
+        pass over the triangles. Return a list of (level index, points).
+        """
+        # Counterclockwise facets keep the higher side on the right
+        facets = orient_ccw(points, facets)
+
+        # Levels every triangle spans
+        z = points[:, 2][facets]
+        first = np.floor(z.min(axis=1) / interval).astype(np.int64) + 1
+        last = np.floor(z.max(axis=1) / interval).astype(np.int64)
+        counts = np.maximum(last - first + 1, 0)
+        if counts.sum() == 0:
+            return []
+
+        tri = np.repeat(np.arange(len(facets)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        index = np.repeat(first, counts) + offset
+        level = index * interval
+
+        # Every crossed triangle has one rising and one falling edge
+        above = z[tri] >= level[:, None]
+        rising = ~above & np.roll(above, -1, axis=1)
+        falling = above & ~np.roll(above, -1, axis=1)
+        valid = (rising.sum(axis=1) == 1) & (falling.sum(axis=1) == 1)
+        tri, index, level = tri[valid], index[valid], level[valid]
+        rising, falling = rising[valid], falling[valid]
+
+        def crossing(edge):
+            a = facets[tri, edge]
+            b = facets[tri, (edge + 1) % 3]
+            t = (level - points[a, 2]) / (points[b, 2] - points[a, 2])
+            xyz = points[a] + t[:, None] * (points[b] - points[a])
+            return np.minimum(a, b) * len(points) + np.maximum(a, b), xyz
+
+        start_edge, start = crossing(rising.argmax(axis=1))
+        end_edge, end = crossing(falling.argmax(axis=1))
+
+        # Join segments on (level, mesh edge) nodes
+        edge_ids = np.unique(
+            np.concatenate([start_edge, end_edge]), return_inverse=True)[1].ravel()
+        n_edges = edge_ids.max() + 1
+        level_ids = index - index.min()
+        node_keys = np.concatenate([
+            level_ids * n_edges + edge_ids[:len(tri)],
+            level_ids * n_edges + edge_ids[len(tri):]])
+        node_ids = np.unique(node_keys, return_inverse=True)[1].ravel()
+        tail, head = node_ids[:len(tri)], node_ids[len(tri):]
+
+        n_nodes = node_ids.max() + 1
+        node_xyz = np.empty((n_nodes, 3))
+        node_xyz[tail] = start
+        node_xyz[head] = end
+        node_index = np.empty(n_nodes, dtype=np.int64)
+        node_index[tail] = index
+
+        successor = np.full(n_nodes, -1)
+        successor[tail] = head
+        has_previous = np.zeros(n_nodes, dtype=bool)
+        has_previous[head] = True
+
+        # Walk open lines from their first node, then closed loops
+        successor = successor.tolist()
+        visited = np.zeros(n_nodes, dtype=bool)
+        starts = np.concatenate([np.flatnonzero(~has_previous), np.arange(n_nodes)])
+
+        lines = []
+        for node in starts.tolist():
+            if visited[node]:
+                continue
+
+            chain = []
+            current = node
+            while current >= 0 and not visited[current]:
+                visited[current] = True
+                chain.append(current)
+                current = successor[current]
+
+            if current == node:
+                chain.append(node)
+
+            line = node_xyz[chain]
+            line = line[np.r_[True, np.any(np.diff(line, axis=0) != 0, axis=1)]]
+            if len(line) > 3:
+                lines.append((int(node_index[node]), line))
+
+        return lines
+
     def get_boundary(self, mesh):
         """
         Create triangulation boundary
         """
-        facet_pidx = mesh.Topology[1]
-
-        edges = itools.chain(*(itools.permutations(pidx, 2) for pidx in facet_pidx))
-        count = Counter((str(edge) for edge in edges))
-
-        double_boundary = list((literal_eval(k) for k, v in count.items() if v == 1))
-
-        boundary = double_boundary[:1]
-        for candidate in double_boundary[1:]:
-            if candidate in boundary or candidate[::-1] in boundary:
-                pass
-            else:
-                boundary.append(candidate)
-
-        def mkEdge(p1, p2):
-            return Part.makeLine((p1.x, p1.y, p1.z), (p2.x, p2.y, p2.z))
-
-        points = mesh.Points
-        edges = []
-        for p1, p2 in boundary:
-            edges.append(mkEdge(points[p1], points[p2]))
+        points, facets = mesh_arrays(mesh)
 
         wires = []
-        for opening in Part.sortEdges(edges):
-            wires.append(Part.Wire(opening))
+        for loop in self.boundary_loops(points, facets):
+            wires.append(Part.makePolygon(
+                [FreeCAD.Vector(*i) for i in points[loop].tolist()]))
 
         return Part.makeCompound(wires)
 
+    @staticmethod
+    def boundary_loops(points, facets):
+        """
+        Trace boundary loops of a triangulation. Return closed point index
+        arrays, outer loops counterclockwise first, then holes clockwise.
+        """
+        if len(facets) == 0:
+            return []
+
+        # Counterclockwise facets give the boundary with the inside on the left
+        facets = orient_ccw(points, facets)
+
+        # Edges used by only one facet
+        edges = np.concatenate([facets[:, [0, 1]], facets[:, [1, 2]], facets[:, [2, 0]]])
+        keys = np.minimum(edges[:, 0], edges[:, 1]) * len(points) \
+            + np.maximum(edges[:, 0], edges[:, 1])
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        boundary = edges[counts[inverse.ravel()] == 1]
+
+        # Outgoing boundary edges of every vertex
+        order = np.argsort(boundary[:, 0], kind='stable')
+        boundary = boundary[order]
+        first = np.searchsorted(boundary[:, 0], np.arange(len(points)))
+        starts = boundary[:, 0].tolist()
+        ends = boundary[:, 1].tolist()
+        pointer = first.tolist()
+        used = [False] * len(boundary)
+
+        loops = []
+        for edge in range(len(boundary)):
+            if used[edge]:
+                continue
+
+            loop = [starts[edge]]
+            current = edge
+            while current is not None and not used[current]:
+                used[current] = True
+                vertex = ends[current]
+                loop.append(vertex)
+
+                # Take the next unused edge leaving the vertex
+                current = None
+                while pointer[vertex] < len(starts) \
+                        and starts[pointer[vertex]] == vertex:
+                    candidate = pointer[vertex]
+                    pointer[vertex] += 1
+                    if not used[candidate]:
+                        current = candidate
+                        break
+
+            if len(loop) > 3 and loop[0] == loop[-1]:
+                loops.append(np.array(loop))
+
+        # Outer loops first
+        def loop_area(loop):
+            x, y = points[loop, 0], points[loop, 1]
+            return np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])
+
+        loops.sort(key=lambda loop: loop_area(loop) < 0)
+
+        return loops
+
 
 class ViewFunctions:
     """
@@ -220,41 +689,111 @@ class ViewFunctions:
 
         return points, vertices
 
-    def elevation_analysis(self, mesh, ranges):
-        scale = (mesh.BoundBox.ZMax - mesh.BoundBox.ZMin) / 100
-        colorlist = []
-
-        for facet in mesh.Facets:
-            z = facet.Points[0][2] + facet.Points[1][2] + facet.Points[2][2]
-            zz = (z/3 - mesh.BoundBox.ZMin) / scale
-
-            if zz < 20:
-                colorlist.append((0.0, 1.0, 0.0))
-            elif zz < 40:
-                colorlist.append((0.0, 1.0, 1.0))
-            elif zz < 60:
-                colorlist.append((0.0, 0.0, 1.0))
-            elif zz < 80:
-                colorlist.append((1.0, 0.0, 1.0))
-            else:
-                colorlist.append((1.0, 0.0, 0.0))
-
-        return colorlist
-
-    def slope_analysis(self, mesh, ranges):
-        colorlist = []
-        for facet in mesh.Facets:
-            normal = facet.Normal
-            radian = normal.getAngle(FreeCAD.Vector(1, 1, 0))
-            angle = math.degrees(radian)
-
-            if angle < 45:
-                colorlist.append((0.0, 1.0, 0.0))
-            if angle < 90:
-                colorlist.append((0.0, 1.0, 1.0))
-            if angle < 135:
-                colorlist.append((0.0, 0.0, 1.0))
-            else:
-                colorlist.append((1.0, 0.0, 1.0))
-
-        return colorlist
+    def analysis_ranges(self, mesh, analysis_type, ranges):
+        """
+        Bin elevation, slope or orientation of mesh facets into equal
+        ranges. Return the range index of every facet and range colors.
+        """
+        points, facets = mesh_arrays(mesh)
+        ranges = max(int(ranges), 1)
+        palette = self.range_palette(ranges)
+        if len(facets) == 0:
+            return np.zeros(0, dtype=np.int64), palette
+
+        values = self.facet_values(points, facets, analysis_type)
+
+        if analysis_type == "Orientation":
+            lower, upper = 0.0, 360.0
+        else:
+            lower, upper = values.min(), values.max()
+
+        # Equal ranges between lower and upper values
+        span = upper - lower if upper > lower else 1.0
+        index = np.floor((values - lower) / span * ranges).astype(np.int64)
+        index = np.clip(index, 0, ranges - 1)
+
+        return index, palette
+
+    @staticmethod
+    def facet_values(points, facets, analysis_type):
+        """
+        Calculate centroid elevation, slope or orientation of facets.
+        """
+        p1, p2, p3 = points[facets[:, 0]], points[facets[:, 1]], points[facets[:, 2]]
+
+        if analysis_type == "Elevation":
+            return (p1[:, 2] + p2[:, 2] + p3[:, 2]) / 3
+
+        # Upward facet normals
+        normal = np.cross(p2 - p1, p3 - p1)
+        normal[normal[:, 2] < 0] *= -1
+
+        if analysis_type == "Slope":
+            # Angle between facet and horizontal plane in degrees
+            return np.degrees(np.arctan2(
+                np.hypot(normal[:, 0], normal[:, 1]), normal[:, 2]))
+
+        # Downhill direction clockwise from north in degrees
+        return np.degrees(np.arctan2(normal[:, 0], normal[:, 1])) % 360
+
+    @staticmethod
+    def range_palette(ranges):
+        """
+        Return a color for every range, interpolated from green to red.
+        """
+        colors = np.array([
+            (0.0, 1.0, 0.0),
+            (0.0, 1.0, 1.0),
+            (0.0, 0.0, 1.0),
+            (1.0, 0.0, 1.0),
+            (1.0, 0.0, 0.0)])
+
+        if ranges == 1:
+            return colors[:1]
+
+        steps = np.linspace(0, len(colors) - 1, ranges)
+        stops = np.arange(len(colors))
+
+        return np.column_stack([np.interp(steps, stops, colors[:, i]) for i in range(3)])
+
+    @staticmethod
+    def cluster_mesh(points, facets, cell_size):
+        """
+        Decimate a mesh by merging the points of every grid cell. Return
+        new points, facets and the original facet of every new facet.
+        """
+        cell = np.floor((points[:, :2] - points[:, :2].min(axis=0)) / cell_size)
+        cell = cell.astype(np.int64)
+        key = cell[:, 0] * (cell[:, 1].max() + 1) + cell[:, 1]
+        cluster, counts = np.unique(key, return_inverse=True, return_counts=True)[1:]
+        cluster = cluster.ravel()
+
+        vertices = np.column_stack([
+            np.bincount(cluster, points[:, i]) / counts for i in range(3)])
+
+        # Drop collapsed and repeated facets
+        merged = cluster[facets]
+        valid = (merged[:, 0] != merged[:, 1]) & (merged[:, 1] != merged[:, 2]) \
+            & (merged[:, 2] != merged[:, 0])
+        source = np.flatnonzero(valid)
+        merged = merged[valid]
+        first = np.unique(np.sort(merged, axis=1), axis=0, return_index=True)[1]
+        source = source[np.sort(first)]
+        merged = cluster[facets[source]]
+
+        # Keep facets counterclockwise
+        merged = orient_ccw(vertices, merged)
+
+        return vertices, merged, source
+
+    @staticmethod
+    def fill_faces(coords, faces, points, facets):
+        """
+        Fill coordinate and face set nodes from point and facet arrays.
+        """
+        index = np.column_stack([facets, np.full(len(facets), -1)]).ravel()
+
+        coords.point.setValues(0, len(points), points.tolist())
+        coords.point.setNum(len(points))
+        faces.coordIndex.setValues(0, len(index), index.tolist())
+        faces.coordIndex.setNum(len(index))
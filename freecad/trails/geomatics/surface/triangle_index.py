@@ -0,0 +1,254 @@
+# /**********************************************************************
+# *                                                                     *
+# * Copyright (c) 2020 Hakan Seven <hakanseven12@gmail.com>             *
+# *                                                                     *
+# * This program is free software; you can redistribute it and/or modify*
+# * it under the terms of the GNU Lesser General Public License (LGPL)  *
+# * as published by the Free Software Foundation; either version 2 of   *
+# * the License, or (at your option) any later version.                 *
+# * for detail see the LICENCE text file.                               *
+# *                                                                     *
+# * This program is distributed in the hope that it will be useful,     *
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of      *
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the       *
+# * GNU Library General Public License for more details.                *
+# *                                                                     *
+# * You should have received a copy of the GNU Library General Public   *
+# * License along with this program; if not, write to the Free Software *
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307*
+# * USA                                                                 *
+# *                                                                     *
+# ***********************************************************************
+
+'''
+Define a spatial index for batched point queries on triangulations.
+'''
+
+import numpy as np
+
+
+class TriangleIndex:
+    """
+    Uniform grid over triangle bounding boxes. Points are located
+    with vectorized barycentric tests against the triangles of their cell.
+    """
+    def __init__(self, points, facets, cell_size=None):
+        '''
+        Build the grid from a point array and a facet index array.
+        '''
+        self.points = np.asarray(points, dtype=float).reshape(-1, 3)
+        self.facets = np.asarray(facets, dtype=np.int64).reshape(-1, 3)
+
+        xy = self.points[:, :2][self.facets]
+        lower = xy.min(axis=1)
+        upper = xy.max(axis=1)
+        self.lower, self.upper = lower, upper
+
+        if len(self.facets) == 0:
+            self.origin = np.zeros(2)
+            self.cell_size = 1.0
+            self.shape = (0, 0)
+            self.cell_start = np.zeros(1, dtype=np.int64)
+            self.cell_facets = np.zeros(0, dtype=np.int64)
+            return
+
+        # Cells smaller than an average triangle keep candidate lists short
+        self.origin = lower.min(axis=0)
+        extent = upper.max(axis=0) - self.origin
+        if cell_size is None:
+            cell_size = np.mean(upper - lower) / 2
+        cell_size = max(float(cell_size), 1e-9)
+
+        # Keep the number of cells in proportion to the triangles
+        cells = np.prod(np.floor(extent / cell_size) + 1)
+        if cells > 4 * len(self.facets):
+            cell_size *= np.sqrt(cells / (4 * len(self.facets)))
+
+        self.cell_size = cell_size
+        self.shape = tuple((np.floor(extent / cell_size) + 1).astype(np.int64))
+
+        # Register every triangle in the cells its bounding box covers
+        owner, column, row = self.cell_ranges(self.cells(lower), self.cells(upper))
+        cell = column * self.shape[1] + row
+
+        order = np.argsort(cell, kind='stable')
+        self.cell_facets = owner[order]
+        self.cell_start = np.searchsorted(
+            cell[order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+        # Barycentric transforms of triangles
+        a = xy[:, 0]
+        b = xy[:, 1] - a
+        c = xy[:, 2] - a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            det = b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0]
+            self.transform = np.column_stack([
+                a, c[:, 1] / det, -c[:, 0] / det, -b[:, 1] / det, b[:, 0] / det])
+
+    def cells(self, xy):
+        '''
+        Return grid column and row of coordinates, clipped to the grid.
+        '''
+        cell = np.floor((xy - self.origin) / self.cell_size).astype(np.int64)
+
+        return np.clip(cell, 0, np.array(self.shape) - 1)
+
+    @staticmethod
+    def cell_ranges(first, last):
+        '''
+        Expand inclusive column and row ranges to owner, column, row arrays.
+        '''
+        width = last - first + 1
+        counts = width[:, 0] * width[:, 1]
+
+        owner = np.repeat(np.arange(len(first)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        column = first[owner, 0] + offset // width[owner, 1]
+        row = first[owner, 1] + offset % width[owner, 1]
+
+        return owner, column, row
+
+    def expand_cells(self, cell):
+        '''
+        Return (pair, facet) arrays of triangles registered in cells,
+        pair indexing the given cells.
+        '''
+        counts = self.cell_start[cell + 1] - self.cell_start[cell]
+        pair = np.repeat(np.arange(len(cell)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        return pair, self.cell_facets[self.cell_start[cell][pair] + offset]
+
+    def cell_facets_of(self, owner, cell):
+        '''
+        Expand (owner, cell) pairs to unique (owner, facet) pairs.
+        '''
+        pair, facet = self.expand_cells(cell)
+        key = np.unique(owner[pair] * len(self.facets) + facet)
+
+        return key // len(self.facets), key % len(self.facets)
+
+    def box_candidates(self, lower, upper):
+        '''
+        Return (box, facet) index pairs of triangles whose bounding boxes
+        overlap 2D boxes given by lower and upper corners.
+        '''
+        lower = np.asarray(lower, dtype=float).reshape(-1, 2)
+        upper = np.asarray(upper, dtype=float).reshape(-1, 2)
+        if len(lower) == 0 or len(self.facets) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Boxes outside the grid have no candidates
+        outside = np.any((upper < self.origin) | (
+            lower > self.origin + np.array(self.shape) * self.cell_size), axis=1)
+        box = np.flatnonzero(~outside)
+
+        owner, column, row = self.cell_ranges(
+            self.cells(lower[box]), self.cells(upper[box]))
+        cell = column * self.shape[1] + row
+        pair, facet = self.expand_cells(cell)
+        owner, cell = box[owner[pair]], cell[pair]
+
+        # Keep pairs whose bounding boxes overlap
+        overlap = np.all((self.lower[facet] <= upper[owner])
+            & (self.upper[facet] >= lower[owner]), axis=1)
+        owner, facet, cell = owner[overlap], facet[overlap], cell[overlap]
+
+        # Count every pair once, in the cell of the lower overlap corner
+        corner = self.cells(np.maximum(lower[owner], self.lower[facet]))
+        first = corner[:, 0] * self.shape[1] + corner[:, 1] == cell
+
+        return owner[first], facet[first]
+
+    def locate(self, xs, ys, chunk=1000000):
+        '''
+        Return the triangle index and barycentric coordinates of points.
+        Triangle index is -1 for points outside the triangulation.
+        '''
+        xy = np.column_stack([
+            np.ravel(np.asarray(xs, dtype=float)),
+            np.ravel(np.asarray(ys, dtype=float))])
+
+        found = np.full(len(xy), -1, dtype=np.int64)
+        weights = np.full((len(xy), 3), np.nan)
+        if len(xy) == 0 or len(self.facets) == 0:
+            return found, weights
+
+        # Points inside the grid
+        column_row = np.floor((xy - self.origin) / self.cell_size)
+        inside = np.all((column_row >= 0) & (column_row < self.shape), axis=1)
+        query = np.flatnonzero(inside)
+        cell = column_row[query, 0].astype(np.int64) * self.shape[1] \
+            + column_row[query, 1].astype(np.int64)
+        counts = self.cell_start[cell + 1] - self.cell_start[cell]
+
+        # Test candidate pairs in chunks to bound memory use
+        ends = np.cumsum(counts)
+        begin = 0
+        while begin < len(query):
+            limit = (ends[begin - 1] if begin else 0) + chunk
+            end = max(np.searchsorted(ends, limit, side='right'), begin + 1)
+
+            part, part_counts = query[begin:end], counts[begin:end]
+            pair = np.repeat(np.arange(len(part)), part_counts)
+            offset = np.arange(part_counts.sum()) \
+                - np.repeat(np.cumsum(part_counts) - part_counts, part_counts)
+            facet = self.cell_facets[self.cell_start[cell[begin:end]][pair] + offset]
+
+            point = part[pair]
+            transform = self.transform[facet]
+            dx = xy[point, 0] - transform[:, 0]
+            dy = xy[point, 1] - transform[:, 1]
+            u = transform[:, 2] * dx + transform[:, 3] * dy
+            v = transform[:, 4] * dx + transform[:, 5] * dy
+            hit = (u >= -1e-9) & (v >= -1e-9) & (u + v <= 1 + 1e-9)
+
+            found[point[hit]] = facet[hit]
+            weights[point[hit]] = np.column_stack([1 - u[hit] - v[hit], u[hit], v[hit]])
+            begin = end
+
+        return found, weights
+
+    def segment_candidates(self, start, end):
+        '''
+        Return (segment, facet) index pairs of triangles registered in
+        the cells each 2D segment passes through.
+        '''
+        start = np.asarray(start, dtype=float).reshape(-1, 2)
+        end = np.asarray(end, dtype=float).reshape(-1, 2)
+        if len(start) == 0 or len(self.facets) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Cells of segment bounding boxes
+        segment, column, row = self.cell_ranges(
+            self.cells(np.minimum(start, end)), self.cells(np.maximum(start, end)))
+
+        # Keep cells close enough to the segment to touch it
+        center = self.origin + (np.column_stack([column, row]) + 0.5) * self.cell_size
+        a = start[segment]
+        direction = end[segment] - a
+        length = np.einsum('ij,ij->i', direction, direction)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.einsum('ij,ij->i', center - a, direction) / length
+        t = np.clip(np.nan_to_num(t), 0, 1)
+        distance = np.hypot(*(a + t[:, None] * direction - center).T)
+        near = distance <= self.cell_size * 0.7072
+        segment, cell = segment[near], column[near] * self.shape[1] + row[near]
+
+        # Triangles of the cells
+        return self.cell_facets_of(segment, cell)
+
+    def elevations_at(self, xs, ys):
+        '''
+        Return interpolated elevations at points, NaN outside the triangulation.
+        '''
+        xs, ys = np.broadcast_arrays(
+            np.asarray(xs, dtype=float), np.asarray(ys, dtype=float))
+        found, weights = self.locate(xs, ys)
+
+        z = np.full(len(found), np.nan)
+        hit = found >= 0
+        corner_z = self.points[:, 2][self.facets[found[hit]]]
+        z[hit] = np.einsum('ij,ij->i', weights[hit], corner_z)
+
+        return z.reshape(xs.shape)
@@ -26,7 +26,9 @@ Create a Table Object from FPO.
 
 import FreeCAD
 from pivy import coin
-from freecad.trails import ICONPATH, geo_origin
+from freecad.trails import ICONPATH
+from .table_func import TableFunc
+import numpy as np
 
 
 
@@ -45,7 +47,7 @@ def create(pos, volume, name='Table'):
     return obj
 
 
-class Table:
+class Table(TableFunc):
     """
     This class is about Table Object data features.
     """
@@ -69,7 +71,104 @@ class Table:
             'App::PropertyLink', "VolumeAreas", "Base",
             "Volume Areas").VolumeAreas = None
 
+        self.add_volume_properties(obj)
+        self.add_haul_properties(obj)
+
         obj.Proxy = self
+        self.volume_cache = None
+        self.haul_cache = None
+
+    @staticmethod
+    def add_volume_properties(obj):
+        '''
+        Add volume computation settings and results.
+        '''
+        obj.addProperty(
+            'App::PropertyEnumeration', "Method", "Volume",
+            "Volume computation method").Method = ["Average End Area", "Prismoidal"]
+
+        obj.addProperty(
+            'App::PropertyBool', "CurvatureCorrection", "Volume",
+            "Correct volumes for area centroids off the alignment on curves"
+            ).CurvatureCorrection = False
+
+        obj.addProperty(
+            'App::PropertyFloatList', "CutVolumes", "Volume",
+            "Cut volumes up to stations in cubic metres", 1).CutVolumes = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "FillVolumes", "Volume",
+            "Fill volumes up to stations in cubic metres", 1).FillVolumes = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "CumulativeCut", "Volume",
+            "Cumulative cut volumes in cubic metres", 1).CumulativeCut = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "CumulativeFill", "Volume",
+            "Cumulative fill volumes in cubic metres", 1).CumulativeFill = []
+
+    @staticmethod
+    def add_haul_properties(obj):
+        '''
+        Add mass haul settings and results.
+        '''
+        obj.addProperty(
+            'App::PropertyFloat', "CutFactor", "Mass Haul",
+            "Shrink or swell factor of cut material").CutFactor = 1.0
+
+        obj.addProperty(
+            'App::PropertyFloat', "FillFactor", "Mass Haul",
+            "Factor of fill volumes").FillFactor = 1.0
+
+        obj.addProperty(
+            'App::PropertyLength', "FreeHaul", "Mass Haul",
+            "Free haul distance").FreeHaul = 150000
+
+        obj.addProperty(
+            'App::PropertyFloatList', "MassOrdinates", "Mass Haul",
+            "Mass curve ordinates at stations in cubic metres", 1).MassOrdinates = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "BalanceStations", "Mass Haul",
+            "Stations where the mass curve is balanced", 1).BalanceStations = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "OverhaulVolumes", "Mass Haul",
+            "Volumes hauled beyond free haul for each loop in cubic metres",
+            1).OverhaulVolumes = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "Overhauls", "Mass Haul",
+            "Overhaul of each loop in cubic metre metres", 1).Overhauls = []
+
+    def __getstate__(self):
+        """
+        Save variables to file.
+        """
+        return self.Type
+
+    def __setstate__(self, state):
+        """
+        Set variables from file.
+        """
+        if isinstance(state, dict):
+            state = state.get('Type')
+        if state:
+            self.Type = state
+
+        self.volume_cache = None
+        self.haul_cache = None
+
+    def onDocumentRestored(self, obj):
+        '''
+        Add properties missing in older files.
+        '''
+        if not hasattr(obj, "Method"):
+            self.add_volume_properties(obj)
+
+        if not hasattr(obj, "MassOrdinates"):
+            self.add_haul_properties(obj)
 
     def onChanged(self, obj, prop):
         '''
@@ -81,7 +180,41 @@ class Table:
         '''
         Do something when doing a recomputation. 
         '''
-        return
+        volume_areas = obj.getPropertyByName("VolumeAreas")
+        if not volume_areas or not hasattr(volume_areas, "CutAreas"):
+            return
+
+        region = volume_areas.getParentGroup().getParentGroup()
+        stations = np.array(region.StationList, dtype=float)
+
+        # Inputs of stations, missing values are zero
+        inputs = np.zeros((len(stations), len(self.columns)))
+        inputs[:, 0] = stations
+        for i, name in enumerate(["CutAreas", "FillAreas", "CutWidths",
+                "CutOffsets", "FillWidths", "FillOffsets"]):
+            values = getattr(volume_areas, name, [])[:len(stations)]
+            inputs[:len(values), i + 1] = values
+
+        if obj.CurvatureCorrection:
+            alignment = region.InList[0].InList[0]
+            inputs[:, 7] = self.station_curvatures(alignment, stations)
+
+        volumes, cumulative = self.volume_table(inputs, obj.Method)
+
+        obj.CutVolumes = volumes[:, 0].tolist()
+        obj.FillVolumes = volumes[:, 1].tolist()
+        obj.CumulativeCut = cumulative[:, 0].tolist()
+        obj.CumulativeFill = cumulative[:, 1].tolist()
+
+        # Mass haul, stations are in metres
+        ordinates, balance, loops = self.mass_haul(
+            stations, volumes, (obj.CutFactor, obj.FillFactor),
+            obj.FreeHaul.Value / 1000)
+
+        obj.MassOrdinates = ordinates.tolist()
+        obj.BalanceStations = balance.tolist()
+        obj.OverhaulVolumes = loops[2].tolist()
+        obj.Overhauls = loops[3].tolist()
 
 
 class ViewProviderTable:
@@ -131,9 +264,8 @@ class ViewProviderTable:
 
         if volume_areas:
             pos = obj.getPropertyByName("Position")
-            if prop == "VolumeAreas" or prop == "TableTitle":
+            if prop in ["VolumeAreas", "TableTitle", "CumulativeCut"]:
                 self.table_columns.removeAllChildren()
-                origin = geo_origin.get()
 
                 column_titles = ["KM", "Area", "Volume", "Cumulative Volume"]
 
@@ -170,9 +302,9 @@ class ViewProviderTable:
                 sta_column.addChild(text)
 
                 # Area column
-                face_areas = []
-                for sub in obj.VolumeAreas.Shape.SubShapes:
-                    face_areas.append(sub.Area)
+                face_areas = getattr(volume_areas, "CutAreas", [])
+                if not face_areas:
+                    face_areas = [i.Area for i in volume_areas.Shape.SubShapes]
 
                 area_list = [str(round(i/1000000,3)) for i in face_areas]
                 area_list.insert(0,column_titles[1])
@@ -189,19 +321,9 @@ class ViewProviderTable:
                 area_column.addChild(text)
 
                 # Volume column
-                volumes = []
-                volumes.append(0)
-                for count in range(1,len(face_areas)):
-                    prev_area = float(face_areas[count-1])
-                    next_area = float(face_areas[count])
-
-                    prev_km = float(sta_list[count])
-                    next_km = float(sta_list[count+1])
+                volumes = getattr(obj, "CutVolumes", [])
 
-                    volume = ((next_area + prev_area)/2)*(next_km-prev_km)
-                    volumes.append(volume)
-
-                volume_list = [str(round(i/1000000,3)) for i in volumes]
+                volume_list = [str(round(i,3)) for i in volumes]
                 volume_list.insert(0,column_titles[2])
 
                 volume_column = coin.SoSeparator()
@@ -216,17 +338,9 @@ class ViewProviderTable:
                 volume_column.addChild(text)
 
                 # Cumulative volume column
-                cum_vols = []
-                cum_vols.append(0)
-
-                for count in range(1,len(volumes)):
-                    prev_cumvol = float(cum_vols[-1])
-                    next_vol = float(volumes[count])
-
-                    cum_vol = prev_cumvol + next_vol
-                    cum_vols.append(cum_vol)
+                cum_vols = getattr(obj, "CumulativeCut", [])
 
-                cumvol_list = [str(round(i/1000000,3)) for i in cum_vols]
+                cumvol_list = [str(round(i,3)) for i in cum_vols]
                 cumvol_list.insert(0,column_titles[3])
 
                 cumvol_column = coin.SoSeparator()
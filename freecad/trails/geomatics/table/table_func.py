@@ -0,0 +1,267 @@
+
+# /**********************************************************************
+# *                                                                     *
+# * Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>             *
+# *                                                                     *
+# * This program is free software; you can redistribute it and/or modify*
+# * it under the terms of the GNU Lesser General Public License (LGPL)  *
+# * as published by the Free Software Foundation; either version 2 of   *
+# * the License, or (at your option) any later version.                 *
+# * for detail see the LICENCE text file.                               *
+# *                                                                     *
+# * This program is distributed in the hope that it will be useful,     *
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of      *
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the       *
+# * GNU Library General Public License for more details.                *
+# *                                                                     *
+# * You should have received a copy of the GNU Library General Public   *
+# * License along with this program; if not, write to the Free Software *
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307*
+# * USA                                                                 *
+# *                                                                     *
+# ***********************************************************************
+
+'''
+Define Table Object functions.
+'''
+
+import numpy as np
+import math
+
+
+class TableFunc:
+    """
+    This class is contain Table Object functions.
+    """
+    # Columns of volume inputs for every station
+    columns = ["Station", "CutArea", "FillArea", "CutWidth", "CutOffset",
+        "FillWidth", "FillOffset", "Curvature"]
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def curvature(curve, distance):
+        """
+        Return signed curvature of an alignment element at a distance
+        from its start, positive when the alignment turns left.
+        """
+        if curve.get('Type') == 'Curve':
+            value = 1 / curve.get('Radius')
+
+        elif curve.get('Type') == 'Spiral':
+            start = 1 / curve.get('StartRadius', math.inf)
+            end = 1 / curve.get('EndRadius', math.inf)
+            value = start + (end - start) * distance / curve.get('Length')
+
+        else:
+            return 0.0
+
+        return -math.copysign(value, curve.get('Direction', 1))
+
+    def station_curvatures(self, alignment, stations):
+        """
+        Return signed curvatures of an alignment at stations.
+        """
+        curvatures = np.zeros(len(stations))
+        model = getattr(alignment.Proxy, 'model', None)
+        if model is None:
+            return curvatures
+
+        # Elements and internal stations of all stations at once
+        index, internal = model.locate_curves(stations)
+        geometry = model.data.get('geometry')
+
+        for i in np.flatnonzero(index >= 0):
+            curve = geometry[index[i]]
+            distance = internal[i] - curve.get('InternalStation')[0]
+            curvatures[i] = self.curvature(curve, distance)
+
+        return curvatures
+
+    @staticmethod
+    def interval_volumes(first, second, method="Average End Area"):
+        """
+        Return cut and fill volumes between pairs of input rows in cubic
+        metres. Stations are in metres, areas in square millimetres, widths
+        and offsets in millimetres and curvatures per millimetre.
+        """
+        length = second[:, 0] - first[:, 0]
+
+        volumes = []
+        for area, width, offset in ((1, 3, 4), (2, 5, 6)):
+            a0, a1 = first[:, area], second[:, area]
+            volume = (a0 + a1) / 2 * length
+
+            # Prismoidal correction with mean depths of equal width sections
+            if method == "Prismoidal":
+                w0, w1 = first[:, width], second[:, width]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    h0 = np.where(w0 > 0, a0 / w0, 0)
+                    h1 = np.where(w1 > 0, a1 / w1, 0)
+                volume -= length / 6 * (w0 - w1) * (h0 - h1)
+
+            # Pappus correction for centroids off the alignment on curves
+            e0 = first[:, offset] * first[:, 7]
+            e1 = second[:, offset] * second[:, 7]
+            volume -= length / 2 * (a0 * e0 + a1 * e1)
+
+            volumes.append(np.maximum(volume, 0) / 1e6)
+
+        return np.column_stack(volumes)
+
+    def volume_table(self, inputs, method="Average End Area"):
+        """
+        Return cut and fill volumes of every station and their cumulative
+        sums. Only intervals next to stations whose inputs changed since
+        the last call are computed again.
+        """
+        inputs = np.asarray(inputs, dtype=float).reshape(-1, len(self.columns))
+        cache = getattr(self, 'volume_cache', None)
+
+        if cache and cache[0] == method and cache[1].shape == inputs.shape:
+            changed = np.any(cache[1] != inputs, axis=1)
+            intervals = np.flatnonzero(changed[:-1] | changed[1:])
+            volumes = cache[2].copy()
+        else:
+            intervals = np.arange(max(len(inputs) - 1, 0))
+            volumes = np.zeros((len(intervals), 2))
+
+        if len(intervals):
+            volumes[intervals] = self.interval_volumes(
+                inputs[intervals], inputs[intervals + 1], method)
+
+        self.volume_cache = (method, inputs.copy(), volumes)
+
+        # Volumes are reported at the end station of intervals
+        table = np.zeros((len(inputs), 2))
+        table[1:] = volumes
+
+        return table, np.cumsum(table, axis=0)
+
+    @staticmethod
+    def balance_points(stations, ordinates):
+        """
+        Return stations where the mass curve meets the balance line.
+        """
+        m0, m1 = ordinates[:-1], ordinates[1:]
+        cross = (m0 * m1 < 0) | ((m1 == 0) & (m0 != 0))
+        t = m0[cross] / (m0[cross] - m1[cross])
+
+        return stations[:-1][cross] + t * np.diff(stations)[cross]
+
+    @staticmethod
+    def clipped_integral(x0, x1, a0, a1, level):
+        """
+        Return integrals of min(a, level) over intervals of linear a.
+        """
+        dx = x1 - x0
+        low = np.minimum(a0, a1)
+        high = np.maximum(a0, a1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Part of the interval below the level
+            t = np.clip(np.where(high > low, (level - low) / (high - low), 1), 0, 1)
+        below = t * dx * (low + np.minimum(high, level)) / 2
+
+        return below + (1 - t) * dx * level
+
+    def haul_loops(self, stations, ordinates, distance, start):
+        """
+        Split the mass curve after a start station into loops between
+        balance points. For each loop, find the free haul line with a
+        bisection over its level, so the part of the loop above it is as
+        wide as the free haul distance. Return loop starts, ends, free
+        haul levels and overhauls.
+        """
+        balance = self.balance_points(stations, ordinates)
+        balance = balance[balance > start]
+        x = np.unique(np.concatenate([[start], stations[stations > start], balance]))
+        a = np.abs(np.interp(x, stations, ordinates))
+
+        bounds = np.concatenate([[start], balance[balance < x[-1]], [x[-1]]])
+        count = len(bounds) - 1
+        if count < 1 or len(x) < 2:
+            return [np.zeros(0)] * 4
+
+        x0, x1, a0, a1 = x[:-1], x[1:], a[:-1], a[1:]
+        loop = np.clip(np.searchsorted(bounds, (x0 + x1) / 2) - 1, 0, count - 1)
+        dx = x1 - x0
+
+        # Width of loop parts above levels shrinks as the level rises
+        def widths(level):
+            level = level[loop]
+            low = np.minimum(a0, a1)
+            high = np.maximum(a0, a1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                part = np.where(high > low, (high - level) / (high - low), 1)
+            part = np.where(low >= level, 1, np.clip(part, 0, 1))
+            part = np.where(high < level, 0, part)
+            return np.bincount(loop, part * dx, minlength=count)
+
+        lower = np.zeros(count)
+        upper = np.zeros(count)
+        np.maximum.at(upper, loop, np.maximum(a0, a1))
+        for i in range(60):
+            level = (lower + upper) / 2
+            wide = widths(level) > distance
+            lower = np.where(wide, level, lower)
+            upper = np.where(wide, upper, level)
+
+        level = upper
+        overhaul = np.bincount(loop,
+            self.clipped_integral(x0, x1, a0, a1, level[loop]), minlength=count)
+        overhaul = np.maximum(overhaul - level * distance, 0)
+
+        return bounds[:-1], bounds[1:], level, overhaul
+
+    def mass_haul(self, stations, volumes, factors=(1.0, 1.0), distance=0.0):
+        """
+        Return mass curve ordinates, balance stations, free haul levels
+        and overhauls of loops. Cut volumes are scaled by the shrink or
+        swell factor of cut material and fill volumes by the fill factor.
+        Only the mass curve after the first changed station and the
+        loops there are computed again.
+        """
+        stations = np.asarray(stations, dtype=float)
+        volumes = np.asarray(volumes, dtype=float).reshape(-1, 2)
+        change = volumes[:, 0] * factors[0] - volumes[:, 1] * factors[1]
+
+        if len(stations) == 0:
+            return np.zeros(0), np.zeros(0), [np.zeros(0)] * 4
+
+        # First station with different inputs than the last call
+        cache = getattr(self, 'haul_cache', None)
+        first = 0
+        if cache and cache[0] == (tuple(factors), distance) \
+                and len(cache[1]) == len(stations):
+            changed = (cache[1] != stations) | (cache[2] != change)
+            first = np.argmax(changed) if changed.any() else len(stations)
+
+        if cache and first == len(stations):
+            return cache[3]
+
+        if first:
+            ordinates = cache[3][0].copy()
+            ordinates[first:] = ordinates[first - 1] + np.cumsum(change[first:])
+        else:
+            ordinates = np.cumsum(change)
+
+        # Loops ending before the first changed interval are kept
+        loops = [np.zeros(0)] * 4
+        start = stations[0] if len(stations) else 0
+        if first > 1:
+            kept = cache[3][2][1] <= stations[first - 1]
+            loops = [i[kept] for i in cache[3][2]]
+            if kept.any():
+                start = loops[1][-1]
+
+        if len(stations) > 1:
+            new = self.haul_loops(stations, ordinates, distance, start)
+            loops = [np.concatenate([i, j]) for i, j in zip(loops, new)]
+
+        balance = loops[1][:-1]
+        result = (ordinates, balance, loops)
+        self.haul_cache = ((tuple(factors), distance), stations.copy(), change, result)
+
+        return result
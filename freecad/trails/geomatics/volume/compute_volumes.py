@@ -0,0 +1,77 @@
+# /**********************************************************************
+# *                                                                     *
+# * Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>             *
+# *                                                                     *
+# * This program is free software; you can redistribute it and/or modify*
+# * it under the terms of the GNU Lesser General Public License (LGPL)  *
+# * as published by the Free Software Foundation; either version 2 of   *
+# * the License, or (at your option) any later version.                 *
+# * for detail see the LICENCE text file.                               *
+# *                                                                     *
+# * This program is distributed in the hope that it will be useful,     *
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of      *
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the       *
+# * GNU Library General Public License for more details.                *
+# *                                                                     *
+# * You should have received a copy of the GNU Library General Public   *
+# * License along with this program; if not, write to the Free Software *
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307*
+# * USA                                                                 *
+# *                                                                     *
+# ***********************************************************************
+
+import FreeCAD
+import FreeCADGui
+from freecad.trails import ICONPATH
+from .tin_volume import surface_volumes
+
+
+class ComputeVolumes:
+    """
+    Command to compute volumes between two surfaces
+    """
+
+    def __init__(self):
+        """
+        Command to compute volumes between two selected surfaces.
+        """
+        pass
+
+    def GetResources(self):
+        """
+        Return the command resources dictionary
+        """
+        return {
+            'Pixmap': ICONPATH + '/icons/volume.svg',
+            'MenuText': "Compute volumes",
+            'ToolTip': "Compute cut and fill volumes between two surfaces"
+            }
+
+    def IsActive(self):
+        """
+        Define tool button activation situation
+        """
+        # Check for two selected surfaces
+        selection = FreeCADGui.Selection.getSelection()
+        if len(selection) == 2:
+            for item in selection:
+                if not hasattr(item, "Proxy") \
+                        or getattr(item.Proxy, "Type", None) != 'Trails::Surface':
+                    return False
+            return True
+        return False
+
+    def Activated(self):
+        """
+        Command activation method
+        """
+        # Cut is where the first selected surface is above the second
+        top, bottom = FreeCADGui.Selection.getSelection()
+        cut, fill, net = surface_volumes(top, bottom)
+
+        FreeCAD.Console.PrintMessage(
+            "{} - {}: cut {:.3f} m3, fill {:.3f} m3, net {:.3f} m3\n".format(
+                top.Label, bottom.Label, cut, fill, net))
+
+
+FreeCADGui.addCommand('Compute Volumes', ComputeVolumes())
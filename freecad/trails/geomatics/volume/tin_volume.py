@@ -0,0 +1,186 @@
+# /**********************************************************************
+# *                                                                     *
+# * Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>             *
+# *                                                                     *
+# * This program is free software; you can redistribute it and/or modify*
+# * it under the terms of the GNU Lesser General Public License (LGPL)  *
+# * as published by the Free Software Foundation; either version 2 of   *
+# * the License, or (at your option) any later version.                 *
+# * for detail see the LICENCE text file.                               *
+# *                                                                     *
+# * This program is distributed in the hope that it will be useful,     *
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of      *
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the       *
+# * GNU Library General Public License for more details.                *
+# *                                                                     *
+# * You should have received a copy of the GNU Library General Public   *
+# * License along with this program; if not, write to the Free Software *
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307*
+# * USA                                                                 *
+# *                                                                     *
+# ***********************************************************************
+
+
+'''
+Compute volumes between two triangulated surfaces.
+'''
+
+import numpy as np
+
+
+def planes(points, facets):
+    """
+    Return (m, 3) coefficients of z = c0 + c1 * x + c2 * y for triangles.
+    """
+    p = points[facets]
+    u = p[:, 1] - p[:, 0]
+    v = p[:, 2] - p[:, 0]
+    normal = np.cross(u, v)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c1 = -normal[:, 0] / normal[:, 2]
+        c2 = -normal[:, 1] / normal[:, 2]
+    c0 = p[:, 0, 2] - c1 * p[:, 0, 0] - c2 * p[:, 0, 1]
+
+    return np.column_stack([c0, c1, c2])
+
+
+def clip_polygons(polygons, counts, a, b, c):
+    """
+    Clip convex polygons with half planes a * x + b * y + c >= 0.
+    polygons is a (p, k, 2) array holding counts vertices of each polygon.
+    """
+    rows, size = polygons.shape[:2]
+    index = np.arange(size)
+    valid = index < counts[:, None]
+    following = (index + 1) % np.maximum(counts, 1)[:, None]
+    ahead = np.take_along_axis(polygons, following[:, :, None], 1)
+
+    s0 = a[:, None] * polygons[:, :, 0] + b[:, None] * polygons[:, :, 1] + c[:, None]
+    s1 = a[:, None] * ahead[:, :, 0] + b[:, None] * ahead[:, :, 1] + c[:, None]
+    inside0, inside1 = s0 >= 0, s1 >= 0
+
+    # Every edge emits its start inside the plane and its crossing
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(inside0 != inside1, s0 / (s0 - s1), 0)
+    crossing = polygons + t[:, :, None] * (ahead - polygons)
+
+    result = np.empty((rows, 2 * size, 2))
+    result[:, 0::2], result[:, 1::2] = polygons, crossing
+    keep = np.empty((rows, 2 * size), dtype=bool)
+    keep[:, 0::2] = valid & inside0
+    keep[:, 1::2] = valid & (inside0 != inside1)
+
+    # Move kept vertices to the front, a half plane adds one vertex at most
+    counts = keep.sum(axis=1)
+    row, slot = np.nonzero(keep)
+    position = np.arange(len(row)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    compact = np.zeros((rows, min(size + 1, 2 * size), 2))
+    compact[row, position] = result[row, slot]
+
+    return compact, counts
+
+
+def polygon_moments(polygons, counts):
+    """
+    Return signed areas and centroids of polygons.
+    """
+    size = polygons.shape[1]
+    index = np.arange(size)
+    valid = index < counts[:, None]
+    following = (index + 1) % np.maximum(counts, 1)[:, None]
+
+    # Relative to the first vertex to keep precision
+    local = polygons - polygons[:, :1]
+    ahead = np.take_along_axis(local, following[:, :, None], 1)
+    cross = (local[:, :, 0] * ahead[:, :, 1] - ahead[:, :, 0] * local[:, :, 1]) * valid
+
+    area = cross.sum(axis=1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centroid = np.einsum('ij,ijk->ik', cross, local + ahead) / (6 * area[:, None])
+    centroid = np.where(area[:, None] != 0, centroid, 0) + polygons[:, 0]
+
+    return area, centroid
+
+
+def triangle_planes(points, facets):
+    """
+    Return half plane coefficients bounding the inside of triangles.
+    """
+    xy = points[facets][:, :, :2]
+    u, v = xy[:, 1] - xy[:, 0], xy[:, 2] - xy[:, 0]
+    orientation = np.sign(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0])
+
+    result = []
+    for i in range(3):
+        p, q = xy[:, i], xy[:, (i + 1) % 3]
+        a = -(q[:, 1] - p[:, 1]) * orientation
+        b = (q[:, 0] - p[:, 0]) * orientation
+        result.append((a, b, -(a * p[:, 0] + b * p[:, 1])))
+
+    return result
+
+
+def composite_volume(top, bottom, chunk=20000):
+    """
+    Return cut, fill and net volumes between two TriangleIndex surfaces.
+    Cut is where top is above bottom. Triangles of top are overlaid on
+    the triangles of bottom they overlap, and the difference of the two
+    planes is integrated exactly on every overlap polygon. Top triangles
+    are processed in chunks to bound memory use.
+    """
+    cut = fill = 0.0
+    if len(top.facets) == 0 or len(bottom.facets) == 0:
+        return cut, fill, cut - fill
+
+    top_planes = planes(top.points, top.facets)
+    bottom_planes = planes(bottom.points, bottom.facets)
+
+    for begin in range(0, len(top.facets), chunk):
+        facets = top.facets[begin:begin + chunk]
+        xy = top.points[:, :2][facets]
+        owner, facet = bottom.box_candidates(xy.min(axis=1), xy.max(axis=1))
+        if len(owner) == 0: continue
+
+        # Clip top triangles with the sides of bottom triangles
+        polygons = xy[owner]
+        counts = np.full(len(owner), 3)
+        sides = np.array(triangle_planes(bottom.points, bottom.facets[facet]))
+        for i in range(3):
+            polygons, counts = clip_polygons(polygons, counts, *sides[i])
+
+            # Pairs without overlap are dropped as soon as they are found
+            ok = counts > 2
+            polygons = polygons[ok][:, :max(counts.max(initial=0), 1)]
+            counts, owner, facet = counts[ok], owner[ok], facet[ok]
+            sides = sides[:, :, ok]
+
+        # Difference of planes is linear on overlap polygons
+        d = top_planes[begin + owner] - bottom_planes[facet]
+        ok = np.isfinite(d).all(axis=1)
+        polygons, counts, d = polygons[ok], counts[ok], d[ok]
+
+        area, centroid = polygon_moments(polygons, counts)
+        net = np.abs(area) * (d[:, 0] + d[:, 1] * centroid[:, 0] + d[:, 2] * centroid[:, 1])
+
+        # Part where top is above bottom
+        above, above_counts = clip_polygons(polygons, counts, d[:, 1], d[:, 2], d[:, 0])
+        area, centroid = polygon_moments(above, above_counts)
+        positive = np.abs(area) * (d[:, 0] + d[:, 1] * centroid[:, 0] + d[:, 2] * centroid[:, 1])
+        positive = np.where(above_counts > 2, np.maximum(positive, 0), 0)
+
+        cut += positive.sum()
+        fill += (positive - net).sum()
+
+    return cut, fill, cut - fill
+
+
+def surface_volumes(top, bottom):
+    """
+    Return cut, fill and net volumes in cubic meters between two
+    Surface objects. Cut is where top is above bottom.
+    """
+    volumes = composite_volume(top.Proxy.get_index(), bottom.Proxy.get_index())
+
+    return tuple(i / 1e9 for i in volumes)
@@ -26,6 +26,7 @@ Create a Volume Areas Object from FPO.
 
 import FreeCAD
 import Part
+import numpy as np
 from pivy import coin
 from .volume_func import VolumeFunc
 from freecad.trails import ICONPATH, geo_origin
@@ -70,7 +71,63 @@ class VolumeAreas(VolumeFunc):
             "Part::PropertyPartShape", "Shape", "Base",
             "Volume areas shape").Shape = Part.Shape()
 
+        self.add_area_properties(obj)
+
         obj.Proxy = self
+        self.mesh = None
+
+    def __getstate__(self):
+        """
+        Save variables to file.
+        """
+        return self.Type
+
+    def __setstate__(self, state):
+        """
+        Set variables from file.
+        """
+        if isinstance(state, dict):
+            state = state.get('Type')
+        if state:
+            self.Type = state
+
+        self.mesh = None
+
+    @staticmethod
+    def add_area_properties(obj):
+        '''
+        Add cut and fill area results.
+        '''
+        obj.addProperty(
+            'App::PropertyFloatList', "CutAreas", "Areas",
+            "Cut areas of stations", 1).CutAreas = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "FillAreas", "Areas",
+            "Fill areas of stations", 1).FillAreas = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "CutWidths", "Areas",
+            "Widths of cut regions", 1).CutWidths = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "CutOffsets", "Areas",
+            "Cut centroid offsets to the left of the alignment", 1).CutOffsets = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "FillWidths", "Areas",
+            "Widths of fill regions", 1).FillWidths = []
+
+        obj.addProperty(
+            'App::PropertyFloatList', "FillOffsets", "Areas",
+            "Fill centroid offsets to the left of the alignment", 1).FillOffsets = []
+
+    def onDocumentRestored(self, obj):
+        '''
+        Add properties missing in older files.
+        '''
+        if not hasattr(obj, "CutAreas"):
+            self.add_area_properties(obj)
 
     def onChanged(self, obj, prop):
         '''
@@ -88,7 +145,17 @@ class VolumeAreas(VolumeFunc):
         bottoms = obj.getPropertyByName("BottomSections")
 
         if tops and bottoms:
-            obj.Shape = self.get_areas(region, tops, bottoms)
+            cut, fill, statistics, shape, mesh = self.get_areas(
+                region, tops, bottoms)
+            obj.CutAreas = cut.tolist()
+            obj.FillAreas = fill.tolist()
+            obj.CutWidths = statistics[0].tolist()
+            obj.CutOffsets = statistics[1].tolist()
+            obj.FillWidths = statistics[2].tolist()
+            obj.FillOffsets = statistics[3].tolist()
+
+            self.mesh = mesh
+            obj.Shape = shape
 
 class ViewProviderVolumeAreas:
     """
@@ -151,20 +218,31 @@ class ViewProviderVolumeAreas:
             geo_system = ["UTM", origin.UtmZone, "FLAT"]
             self.face_coords.geoSystem.setValues(geo_system)
 
-            idx = 0
-            points = []
-            face_vert = []
-            for face in shape.Faces:
-                tri = face.tessellate(1)
-                for v in tri[0]:
-                    points.append(v.add(origin.Origin))
-                for f in tri[1]:
-                    face_vert.extend([f[0]+idx,f[1]+idx,f[2]+idx,-1])
-                idx += len(tri[0])
+            # Use area arrays of the last recompute if they are present
+            mesh = getattr(obj.Proxy, 'mesh', None)
+            if mesh:
+                vertices, triangles = mesh
+                points = (vertices + tuple(origin.Origin)).tolist()
+                face_vert = np.column_stack([
+                    triangles, np.full(len(triangles), -1)]).ravel().tolist()
+
+            else:
+                idx = 0
+                points = []
+                face_vert = []
+                for face in shape.Faces:
+                    tri = face.tessellate(1)
+                    for v in tri[0]:
+                        points.append(v.add(origin.Origin))
+                    for f in tri[1]:
+                        face_vert.extend([f[0]+idx,f[1]+idx,f[2]+idx,-1])
+                    idx += len(tri[0])
 
             #Set contour system.
-            self.face_coords.point.values = points
-            self.faces.coordIndex.values = face_vert
+            self.face_coords.point.setValues(0, len(points), points)
+            self.face_coords.point.setNum(len(points))
+            self.faces.coordIndex.setValues(0, len(face_vert), face_vert)
+            self.faces.coordIndex.setNum(len(face_vert))
 
     def getDisplayModes(self,vobj):
         '''
@@ -25,6 +25,9 @@ Define Volume Object functions.
 '''
 import FreeCAD
 import Part
+import numpy as np
+
+from ..section.section_func import SectionFunc
 
 
 
@@ -35,79 +38,259 @@ class VolumeFunc:
     def __init__(self):
         pass
 
-    def area_between(self, tops, bottoms, i):
+    @staticmethod
+    def section_profiles(section):
         """
-        Calculate the areas above lower and below upper
+        Return 2D point arrays of a Section object, one for each station.
         """
-        bb_ymins = []
-        bb_ymaxs = []
-        bb_xmins = []
-        bb_xmaxs = []
-        for sec in tops + bottoms:
-            sec_wire = sec.Shape.Wires[i]
-            bb_ymins.append(sec_wire.BoundBox.YMin)
-            bb_ymaxs.append(sec_wire.BoundBox.YMax)
-            bb_xmins.append(sec_wire.BoundBox.XMin)
-            bb_xmaxs.append(sec_wire.BoundBox.XMax)
-
-        # Find the coords for the 'limits' box:
-        area_minY = min(bb_ymins) - 1.0
-        area_maxY = max(bb_ymaxs) + 1.0
-        area_minX = min(bb_xmins) - 1.0
-        area_maxX = max(bb_xmaxs) + 1.0
-
-        ## Determine 4 edges for the 'limits' box:
-        limit = [Part.makeLine((area_minX, area_minY, 0.0), (area_maxX, area_minY, 0.0)),
-                Part.makeLine((area_maxX, area_minY, 0.0), (area_maxX, area_maxY, 0.0)),
-                Part.makeLine((area_maxX, area_maxY, 0.0), (area_minX, area_maxY, 0.0)),
-                Part.makeLine((area_minX, area_maxY, 0.0), (area_minX, area_minY, 0.0))]
-
-        dellim = [Part.makeLine((area_minX, area_minY, 0.0), (area_minX+1, area_minY, 0.0)),
-                Part.makeLine((area_minX+1, area_minY, 0.0), (area_minX+1, area_minY+1, 0.0)),
-                Part.makeLine((area_minX+1, area_minY+1, 0.0), (area_minX, area_minY+1, 0.0)),
-                Part.makeLine((area_minX, area_minY+1, 0.0), (area_minX, area_minY, 0.0))]
-
-        face_area = Part.Face(Part.Wire(limit))
-        del_area = Part.Face(Part.Wire(dellim))
-
-        for top in tops:
-            top_wire = top.Shape.Wires[i]
-            fp_upper = top_wire.Vertexes[0].Point
-            lp_upper = top_wire.Vertexes[-1].Point
-
-            if fp_upper.x == lp_upper.x:
-                return face_area.common(del_area)
-
-            ## Add 3 edges to B to get a closed boundary:
-            edges_top = top_wire.Edges + [Part.makeLine(fp_upper, (fp_upper[0], area_minY, 0.0)),
-                                        Part.makeLine((fp_upper[0], area_minY, 0.0), (lp_upper[0], area_minY, 0.0)),
-                                        Part.makeLine((lp_upper[0], area_minY, 0.0), lp_upper)]
-
-            face_upper = Part.Face(Part.Wire(edges_top))
-            face_area  = face_area.common(face_upper)
-
-        for bottom in bottoms:
-            bottom_wire = bottom.Shape.Wires[i]
-            fp_lower = bottom_wire.Vertexes[0].Point
-            lp_lower = bottom_wire.Vertexes[-1].Point
-
-            if fp_lower.x == lp_lower.x:
-                return face_area.common(del_area)
-
-            ## Add 3 edges to A to get a closed boundary:
-            edges_bottom = bottom_wire.Edges + [Part.makeLine(fp_lower, (fp_lower[0], area_maxY, 0.0)),
-                                        Part.makeLine((fp_lower[0], area_maxY, 0.0), (lp_lower[0], area_maxY, 0.0)),
-                                        Part.makeLine((lp_lower[0], area_maxY, 0.0), lp_lower)]
-
-            face_lower = Part.Face(Part.Wire(edges_bottom))
-            face_area  = face_area.common(face_lower)
-
-        return face_area
+        lines = getattr(section.Proxy, 'lines', None)
+        if lines:
+            points, sizes = lines
+            return np.split(points[:, :2], np.cumsum(sizes)[:-1])
+
+        profiles = []
+        for wire in section.Shape.Wires:
+            points = [tuple(v.Point)[:2] for v in wire.OrderedVertexes]
+            profiles.append(np.array(points, dtype=float).reshape(-1, 2))
+
+        return profiles
+
+    @staticmethod
+    def between_profiles(tops, bottoms, count=None):
+        """
+        Compare top and bottom section profiles of all stations at once.
+        tops and bottoms hold a list of (k, 2) offset, elevation arrays per
+        station for every section. Return cut (top above bottom) and fill
+        areas per station, and the merged profile grid as station, offset,
+        lowest top and highest bottom arrays.
+        count is the number of stations, the longest section by default.
+        Stations missing at the end of a section have zero areas.
+        """
+        profiles = list(tops) + list(bottoms)
+        if count is None:
+            count = max(len(i) for i in profiles)
+
+        for profile in profiles:
+            if len(profile) > count:
+                raise ValueError(
+                    "Section has {} stations, expected at most {}".format(
+                        len(profile), count))
+
+        # Stack profiles of every section with their stations
+        curves = []
+        start = np.full(count, -np.inf)
+        end = np.full(count, np.inf)
+        reference = np.full(count, np.inf)
+        for profile in profiles:
+            arrays = [np.reshape(i, (len(i), -1))[:, :2] for i in profile]
+            arrays += [np.zeros((0, 2))] * (count - len(arrays))
+            sizes = np.array([len(i) for i in arrays], dtype=np.int64)
+            xy = np.vstack([np.zeros((0, 2))] + arrays)
+            station = np.repeat(np.arange(count), sizes)
+
+            first = np.full(count, np.inf)
+            last = np.full(count, -np.inf)
+            np.minimum.at(first, station, xy[:, 0])
+            np.maximum.at(last, station, xy[:, 0])
+            last[sizes < 2] = -np.inf
+
+            start = np.maximum(start, first)
+            end = np.minimum(end, last)
+            reference = np.minimum(reference, first)
+            curves.append((station, xy))
+
+        # Stations in a shared offset key, so one interpolation covers all
+        valid = end > start
+        reference[np.isinf(reference)] = 0
+        width = max([np.max(xy[:, 0] - reference[station], initial=0)
+            for station, xy in curves]) + 1
+        shift = np.arange(count) * width - reference
+
+        keys = []
+        for station, xy in curves:
+            key = xy[:, 0] + shift[station]
+            keys.append((key, xy[:, 1]))
+
+        # Merged offsets of all profile vertices inside the common range
+        grid = [start[valid] + shift[valid], end[valid] + shift[valid]]
+        for station, xy in curves:
+            inside = valid[station] & (xy[:, 0] >= start[station]) \
+                & (xy[:, 0] <= end[station])
+            grid.append(xy[inside, 0] + shift[station[inside]])
+
+        grid = np.unique(np.concatenate(grid))
+        station = np.floor(grid / width).astype(np.int64)
+
+        def evaluate(grid):
+            return np.array([np.interp(grid, key, y) for key, y in keys])
+
+        # Add crossings of every pair of profiles so envelopes are linear
+        values = evaluate(grid)
+        same = station[1:] == station[:-1]
+        crossings = []
+        for p in range(len(profiles)):
+            for q in range(p + 1, len(profiles)):
+                d = values[p] - values[q]
+                cross = same & (d[:-1] * d[1:] < 0)
+                d0, d1 = d[:-1][cross], d[1:][cross]
+                k0, k1 = grid[:-1][cross], grid[1:][cross]
+                crossings.append(k0 + d0 / (d0 - d1) * (k1 - k0))
+
+        if crossings:
+            grid = np.unique(np.concatenate([grid] + crossings))
+            station = np.floor(grid / width).astype(np.int64)
+            values = evaluate(grid)
+
+        top = values[:len(tops)].min(axis=0)
+        bottom = values[len(tops):].max(axis=0)
+
+        # Integrate positive and negative parts, no sign change in intervals
+        d = top - bottom
+        same = station[1:] == station[:-1]
+        dx = np.diff(grid) * same
+        cut_parts = (np.maximum(d[:-1], 0) + np.maximum(d[1:], 0)) / 2 * dx
+        fill_parts = (np.maximum(-d[:-1], 0) + np.maximum(-d[1:], 0)) / 2 * dx
+
+        cut = np.bincount(station[:-1], cut_parts, minlength=count)
+        fill = np.bincount(station[:-1], fill_parts, minlength=count)
+        offset = grid - shift[station]
+
+        return cut, fill, (station, offset, top, bottom)
+
+    @staticmethod
+    def area_statistics(station, offset, top, bottom, count):
+        """
+        Return widths and centroid offsets of cut and fill regions per
+        station from the merged profile grid.
+        """
+        same = station[1:] == station[:-1]
+        x0, x1 = offset[:-1], offset[1:]
+        dx = (x1 - x0) * same
+
+        result = []
+        for d in (top - bottom, bottom - top):
+            d0 = np.maximum(d[:-1], 0)
+            d1 = np.maximum(d[1:], 0)
+
+            # Intervals do not change sign, so parts are whole trapezoids
+            area = np.bincount(station[:-1], (d0 + d1) / 2 * dx, minlength=count)
+            moment = np.bincount(station[:-1],
+                (x0 * (2 * d0 + d1) + x1 * (d0 + 2 * d1)) / 6 * dx, minlength=count)
+            width = np.bincount(station[:-1],
+                dx * ((d0 + d1) > 0), minlength=count)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                centroid = np.where(area > 0, moment / area, 0)
+            result.extend([width, centroid])
+
+        return result
+
+    @staticmethod
+    def area_regions(station, offset, top, bottom, fill=False):
+        """
+        Return (station, polygon) pairs of regions between profiles,
+        where top is above bottom, or below it for fill regions.
+        """
+        d = bottom - top if fill else top - bottom
+
+        # Profile crossings are zero up to rounding
+        tolerance = 1e-9 * (np.max(np.abs(top), initial=0) + 1)
+        d = np.where(np.abs(d) < tolerance, 0, d)
+        same = station[1:] == station[:-1]
+        positive = same & (np.maximum(d[:-1], d[1:]) > 0) \
+            & (np.minimum(d[:-1], d[1:]) >= 0)
+
+        # Runs of positive intervals, split where profiles touch
+        begins = positive & ~np.concatenate([[False], positive[:-1] & (d[1:-1] > 0)])
+        ends = positive & ~np.concatenate([positive[1:] & (d[1:-1] > 0), [False]])
+
+        regions = []
+        for first, last in zip(np.flatnonzero(begins), np.flatnonzero(ends) + 1):
+            upper = np.column_stack([offset[first:last + 1], top[first:last + 1]])
+            lower = np.column_stack([offset[first:last + 1], bottom[first:last + 1]])
+
+            # Drop lower points that coincide with upper ones at run ends
+            lower = lower[::-1][d[first:last + 1][::-1] > 0]
+            polygon = np.vstack([upper, lower])
+            regions.append((station[first], polygon))
+
+        return regions
+
+    @staticmethod
+    def area_mesh(station, offset, top, bottom, fill=False):
+        """
+        Triangulate regions between profiles in one pass, where top is
+        above bottom, or below it for fill regions. Return (n, 3) vertex
+        and (m, 3) triangle index arrays.
+        """
+        d = bottom - top if fill else top - bottom
+
+        # Profile crossings are zero up to rounding
+        tolerance = 1e-9 * (np.max(np.abs(top), initial=0) + 1)
+        d = np.where(np.abs(d) < tolerance, 0, d)
+        same = station[1:] == station[:-1]
+        positive = same & (np.maximum(d[:-1], d[1:]) > 0) \
+            & (np.minimum(d[:-1], d[1:]) >= 0)
+        i = np.flatnonzero(positive)
+
+        # Grid point k has vertex 2k on top and 2k + 1 on bottom, every
+        # interval is split into two triangles, dropping degenerate ones
+        triangles = np.vstack([
+            np.column_stack([2 * i, 2 * i + 1, 2 * i + 2])[d[i] > 0],
+            np.column_stack([2 * i + 2, 2 * i + 1, 2 * i + 3])[d[i + 1] > 0]])
+        if fill:
+            triangles = triangles[:, ::-1]
+
+        # Keep only vertices of triangles
+        used, triangles = np.unique(triangles, return_inverse=True)
+        k = used // 2
+        vertices = np.zeros((len(used), 3))
+        vertices[:, 0] = offset[k]
+        vertices[:, 1] = np.where(used % 2, bottom[k], top[k])
+
+        return vertices, triangles.reshape(-1, 3)
+
+    @staticmethod
+    def center_offsets(gl, count):
+        """
+        Return section sheet offsets of the alignment at each station.
+        """
+        for item in gl.Group:
+            if item.Proxy.Type == 'Trails::Sections':
+                layout = SectionFunc.section_layout(
+                    count, item.Position,
+                    [item.Height.Value, item.Width.Value],
+                    [item.Vertical.Value, item.Horizontal.Value])
+
+                return layout[:, 0] + gl.LeftOffset.Value
+
+        return np.zeros(count)
 
     def get_areas(self, gl, tops, bottoms):
-        shapes = []
-        for i in range(len(gl.Shape.Wires)):
-            result = self.area_between(tops, bottoms, i)
-            shapes.append(result)
+        """
+        Return cut and fill areas per station, region statistics,
+        a compound of cut region faces for each station and the
+        triangulated cut regions as vertex and triangle index arrays.
+        """
+        count = len(gl.Shape.Wires)
+        cut, fill, grid = self.between_profiles(
+            [self.section_profiles(i) for i in tops],
+            [self.section_profiles(i) for i in bottoms], count)
+
+        # Centroids are measured to the left of the alignment
+        statistics = self.area_statistics(*grid, count)
+        center = self.center_offsets(gl, count)
+        for i in (1, 3):
+            statistics[i] = np.where(
+                statistics[i - 1] > 0, center - statistics[i], 0)
+
+        faces = [[] for i in range(count)]
+        for station, polygon in self.area_regions(*grid):
+            points = [(x, y, 0) for x, y in polygon.tolist()]
+            wire = Part.makePolygon(points + points[:1])
+            faces[station].append(Part.Face(wire))
+
+        shapes = [Part.makeCompound(i) for i in faces]
+        mesh = self.area_mesh(*grid)
 
-        return Part.makeCompound(shapes)
+        return cut, fill, statistics, Part.makeCompound(shapes), mesh
@@ -112,7 +112,8 @@ class TrailsWorkbench(Gui.Workbench):
                 'gui': self.menu + self.toolbar + self.context,
                 'cmd': [
                     'Create Surface',
-                    'Surface Editor'
+                    'Surface Editor',
+                    'Compute Volumes'
                     ]
             },
 
@@ -232,7 +233,7 @@ class TrailsWorkbench(Gui.Workbench):
         from .geomatics.surface import create_surface, edit_surface
         from .geomatics.region import create_region
         from .geomatics.section import create_sections
-        from .geomatics.volume import compute_areas
+        from .geomatics.volume import compute_areas, compute_volumes
         from .geomatics.table import create_table
         from .geomatics.pad import create_pad
         from .geomatics import geoimport_gui
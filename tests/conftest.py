@@ -0,0 +1,52 @@
+'''
+Test configuration. The numpy engines are tested without FreeCAD.
+'''
+
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Vector(tuple):
+    """
+    Stand-in of FreeCAD vectors, from coordinates or a sequence.
+    """
+
+    def __new__(cls, *args):
+        if len(args) == 1:
+            args = tuple(args[0])
+
+        return super().__new__(cls, (tuple(args) + (0.0, 0.0, 0.0))[:3])
+
+
+# Modules imported next to the engines, with the names they must define
+STUBS = {
+    'FreeCAD': {'Vector': Vector, 'Console': None},
+    'FreeCADGui': {},
+    'Mesh': {},
+    'Part': {},
+    'Points': {},
+    'PySide': {'QtGui': None},
+    'Draft': {'_Wire': object, '_ViewProviderWire': object},
+    'DraftGui': {},
+    'freecad_python_support': {},
+    'freecad_python_support.const': {'Const': object},
+    'freecad_python_support.tuple_math': {'TupleMath': object},
+    'pivy': {'coin': None},
+    'pivy_trackers': {},
+    'pivy_trackers.tracker': {},
+    'pivy_trackers.tracker.context_tracker': {'ContextTracker': object},
+    'pivy_trackers.tracker.line_tracker': {'LineTracker': object},
+    'pivy_trackers.tracker.polyline_tracker': {'PolyLineTracker': object},
+    'pivy_trackers.trait': {},
+    'pivy_trackers.trait.drag': {'Drag': object},
+}
+
+for name, attributes in STUBS.items():
+    try:
+        __import__(name)
+    except ImportError:
+        sys.modules[name] = types.ModuleType(name)
+        sys.modules[name].__dict__.update(attributes)
@@ -0,0 +1,390 @@
+'''
+Tests of alignment station, tangent and projection engines.
+'''
+
+import math
+
+import numpy as np
+import pytest
+
+from freecad.trails.design.alignment.alignment_model import AlignmentModel
+from freecad.trails.design.geometry import arc, line, spiral
+from freecad.trails.design.project.support import units
+
+
+@pytest.fixture(autouse=True)
+def metric_document(monkeypatch):
+    """
+    Scale stations in meters to millimeters, without document preferences.
+    """
+    monkeypatch.setattr(units, 'scale_factor', lambda: 1000.0)
+
+
+def integrate(curvature, length, start, bearing, count=20000):
+    """
+    Return distances, (n, 2) coordinates and bearings along a curve of a
+    curvature function, by trapezoidal integration.
+    """
+    distances = np.linspace(0.0, length, count + 1)
+
+    def cumulative(values):
+        steps = (values[1:] + values[:-1]) / 2 * np.diff(distances)
+        return np.concatenate([[0.0], np.cumsum(steps)])
+
+    bearings = bearing + cumulative(curvature(distances))
+    coords = np.column_stack([
+        start[0] + cumulative(np.sin(bearings)),
+        start[1] + cumulative(np.cos(bearings))])
+
+    return distances, coords, bearings
+
+
+def turn(direction):
+    """
+    Return the (type, length, direction) elements of a line, spiral,
+    curve, spiral, line turn.
+    """
+    return [('Line', 100e3, direction), ('Spiral', 80e3, direction),
+        ('Curve', 200e3, direction), ('Spiral', 80e3, direction),
+        ('Line', 100e3, direction)]
+
+
+def meander(count=40):
+    """
+    Return the elements of lines and curves turning to alternate sides.
+    """
+    elements = []
+    for i in range(count):
+        elements += [('Line', 50e3, 1.0), ('Curve', 150e3, (-1.0) ** i)]
+
+    return elements
+
+
+def chain(elements, radius=300e3):
+    """
+    Return the geometry of an alignment of (type, length, direction)
+    elements and its integrated reference curves.
+    """
+    geometry, reference = [], []
+    start, bearing, position = np.array([1e6, 2e6]), 0.7, 0.0
+
+    for kind, length, direction in elements:
+        entering = not geometry or geometry[-1]['Type'] == 'Line'
+
+        def curvature(s):
+            if kind == 'Line':
+                return 0 * s
+            if kind == 'Curve':
+                return 0 * s + direction / radius
+            if entering:
+                return s / length * direction / radius
+            return (1 - s / length) * direction / radius
+
+        distances, coords, bearings = integrate(
+            curvature, length, start, bearing)
+
+        geo = {
+            'Type': kind, 'Length': length, 'Direction': direction,
+            'Start': (*start, 0.0), 'End': (*coords[-1], 0.0),
+            'BearingIn': bearing, 'BearingOut': bearings[-1],
+            'Radius': radius, 'Delta': length / radius,
+            'InternalStation': (position, position + length),
+            'StartStation': position / 1000}
+
+        if kind == 'Spiral':
+            # Intersection of the tangents at the spiral ends
+            ahead = np.array([np.sin(bearing), np.cos(bearing)])
+            back = np.array([np.sin(bearings[-1]), np.cos(bearings[-1])])
+            along = np.linalg.solve(
+                np.column_stack([ahead, -back]), coords[-1] - start)[0]
+
+            geo.update({
+                'PI': (*(start + along * ahead), 0.0),
+                'Theta': length / (2 * radius),
+                'StartRadius': math.inf if entering else radius,
+                'EndRadius': radius if entering else math.inf})
+
+        geometry.append(geo)
+        reference.append((position + distances, coords, bearings))
+
+        start, bearing, position = coords[-1], bearings[-1], position + length
+
+    return geometry, reference
+
+
+def chain_model(elements, start_station=0.0, equations=()):
+    """
+    Return an alignment model of a chain and its reference curves.
+    """
+    geometry, reference = chain(elements)
+
+    model = AlignmentModel()
+    model.data = {
+        'meta': {
+            'StartStation': start_station,
+            'Length': geometry[-1]['InternalStation'][1]},
+        'geometry': geometry,
+        'station': [{
+            'Back': start_station, 'Ahead': start_station,
+            'Description': 'Start', 'Alignment': 'Start'}] + list(equations)}
+    model.build_station_index()
+
+    return model, reference
+
+
+def polyline_distances(points, polyline):
+    """
+    Return the distances of (n, 2) points to a (m, 2) polyline.
+    """
+    start, delta = polyline[:-1], np.diff(polyline, axis=0)
+    lengths = np.maximum(np.einsum('ij,ij->i', delta, delta), 1e-12)
+    result = []
+
+    for point in points:
+        t = np.clip(
+            np.einsum('ij,ij->i', point - start, delta) / lengths, 0.0, 1.0)
+        result.append(np.hypot(*(start + t[:, None] * delta - point).T).min())
+
+    return np.array(result)
+
+
+def equation_model():
+    """
+    Return a chain model with a gap and an overlap in its stationing,
+    its legacy copy without a station index and stations along it.
+    """
+    equations = [
+        {'Back': 250.0, 'Ahead': 300.0, 'Description': 'A', 'Alignment': 'A'},
+        {'Back': 500.0, 'Ahead': 450.0, 'Description': 'A', 'Alignment': 'A'}]
+
+    model, reference = chain_model(turn(1.0), 100.0, equations)
+
+    legacy, reference = chain_model(turn(1.0), 100.0, equations)
+    legacy.station_index = None
+
+    rng = np.random.default_rng(4)
+    stations = np.concatenate([
+        rng.uniform(100.0, 250.0, 100), rng.uniform(300.0, 500.0, 100),
+        rng.uniform(500.0, 860.0, 100)])
+
+    return model, legacy, stations
+
+
+@pytest.mark.parametrize("direction", [1.0, -1.0])
+def test_tangents_match_integrated_curves(direction):
+    model, reference = chain_model(turn(direction), 100.0)
+
+    stations = np.linspace(100.0, 100.0 + 760.0, 3001)
+    coords, tangents = model.get_tangents(stations)
+
+    internal = (stations - 100.0) * 1000
+
+    for distances, points, bearings in reference:
+        rows = (internal >= distances[0]) & (internal < distances[-1])
+
+        def interpolate(values):
+            return np.interp(internal[rows], distances, values)
+
+        assert np.allclose(coords[rows, 0], interpolate(points[:, 0]), rtol=0, atol=0.01)
+        assert np.allclose(coords[rows, 1], interpolate(points[:, 1]), rtol=0, atol=0.01)
+        assert np.allclose(tangents[rows, 0], np.sin(interpolate(bearings)))
+        assert np.allclose(tangents[rows, 1], np.cos(interpolate(bearings)))
+
+
+@pytest.mark.parametrize("direction", [1.0, -1.0])
+def test_spiral_tangents_match_scalar_evaluation(direction):
+    geometry, reference = chain(turn(direction))
+
+    for geo in (geometry[1], geometry[3]):
+        distances = np.linspace(0.0, geo['Length'], 41)
+        coords, tangents = spiral.get_tangent_vectors(geo, distances)
+
+        for distance, coord, tangent in zip(distances, coords, tangents):
+            expected = spiral.get_tangent_vector(geo, distance)
+            assert np.allclose(coord, expected[0], rtol=0, atol=1e-6)
+            assert np.allclose(tangent, expected[1])
+
+
+def test_orthogonals_point_to_the_side():
+    model, reference = chain_model(turn(1.0))
+
+    stations = np.linspace(0.0, 760.0, 500)
+    coords, tangents = model.get_tangents(stations)
+    left = model.get_orthogonals(stations, 'Left')
+    right = model.get_orthogonals(stations, 'rt')
+
+    assert np.allclose(left[0], coords) and np.allclose(right[0], coords)
+    assert np.allclose(left[1], -right[1])
+
+    # Unit vectors a quarter turn counterclockwise of the tangents
+    assert np.allclose(np.einsum('ij,ij->i', left[1], tangents), 0)
+    assert np.allclose(
+        tangents[:, 0] * left[1][:, 1] - tangents[:, 1] * left[1][:, 0], 1)
+
+
+def test_tangents_before_the_start_are_nan():
+    model, reference = chain_model(turn(1.0), 100.0)
+
+    coords, tangents = model.get_tangents([50.0, 150.0])
+
+    assert np.isnan(coords[0]).all() and np.isnan(tangents[0]).all()
+    assert not np.isnan(coords[1]).any()
+
+
+def test_internal_stations_match_linear_scan():
+    model, legacy, stations = equation_model()
+
+    expected = [legacy.get_internal_station(i) for i in stations]
+
+    assert np.allclose(model.get_internal_stations(stations), expected)
+    assert np.allclose(
+        [model.get_internal_station(i) for i in stations], expected)
+
+
+def test_alignment_stations_match_linear_scan(monkeypatch):
+    model, legacy, stations = equation_model()
+    internal = model.get_internal_stations(stations)
+
+    # Stations are the inverse of internal stations outside the overlap
+    single = (stations < 450.0) | (stations > 500.0)
+    assert np.allclose(
+        model.get_alignment_stations(internal)[single], stations[single])
+
+    # The linear scan compares internal distances to stations unscaled
+    monkeypatch.setattr(units, 'scale_factor', lambda: 1.0)
+    internal = np.random.default_rng(5).uniform(0.0, 760.0, 300)
+
+    assert np.allclose(model.get_alignment_stations(internal),
+        [legacy.get_alignment_station(i) for i in internal])
+
+
+def test_locate_curves_matches_linear_scan():
+    model, legacy, stations = equation_model()
+
+    indices = model.locate_curves(stations)[0]
+    geometry = model.data['geometry']
+
+    assert (indices >= 0).all()
+    for station, index in zip(stations, indices):
+        assert legacy.locate_curve(station)['InternalStation'] \
+            == geometry[index]['InternalStation']
+
+
+@pytest.mark.parametrize("elements", [turn(1.0), turn(-1.0), meander()])
+def test_station_offsets_of_offset_points(elements):
+    model, reference = chain_model(elements, 100.0)
+    length = model.data['meta']['Length'] / 1000
+
+    rng = np.random.default_rng(6)
+    stations = 100.0 + rng.uniform(0.0, length, 3000)
+    offsets = rng.uniform(-40e3, 40e3, 3000)
+
+    coords, orthos = model.get_orthogonals(stations, 'Left')
+    points = coords + offsets[:, None] * orthos
+
+    found, found_offsets, indices = model.get_station_offsets(points)
+
+    assert (indices >= 0).all()
+    assert np.allclose(found, stations, rtol=0, atol=1e-6)
+    assert np.allclose(found_offsets, offsets, rtol=0, atol=1e-3)
+
+
+@pytest.mark.parametrize("max_offset", [None, 50e3])
+def test_projection_matches_every_element(max_offset):
+    model, reference = chain_model(meander(), 100.0)
+    geometry = model.data['geometry']
+
+    rng = np.random.default_rng(7)
+    curve = np.vstack([points for distances, points, bearings in reference])
+    points = curve[rng.integers(len(curve), size=3000)] \
+        + rng.normal(0.0, 100e3, (3000, 2))
+
+    internal, offsets, indices = model.project_points(points, max_offset)
+
+    # Closest projection on any element, by brute force
+    distances = np.full((len(geometry), len(points)), np.nan)
+    crossings = np.full((len(geometry), len(points)), np.nan)
+
+    for i, geo in enumerate(geometry):
+        module = {'Line': line, 'Curve': arc}[geo['Type']]
+        distances[i], crossings[i] = module.get_position_offsets(geo, points)
+        distances[i] += geo['InternalStation'][0]
+
+    nearest = np.abs(np.where(np.isnan(crossings), np.inf, crossings))
+    if max_offset is not None:
+        nearest[nearest > max_offset] = np.inf
+
+    best = nearest.argmin(axis=0)
+    found = np.isfinite(nearest.min(axis=0))
+    columns = np.arange(len(points))
+
+    assert found.any() and not found.all()
+    assert ((indices >= 0) == found).all()
+    assert np.isnan(internal[~found]).all() and np.isnan(offsets[~found]).all()
+    assert np.allclose(offsets[found], crossings[best, columns][found])
+    assert np.allclose(internal[found], distances[best, columns][found])
+
+    # Single coordinates take the same path
+    for i in np.flatnonzero(found)[:20]:
+        assert np.allclose(model.get_station_offset(points[i])[:2],
+            (internal[i], offsets[i]))
+
+
+@pytest.mark.parametrize("fresnel", [True, False])
+def test_local_coordinates_match_series(fresnel, monkeypatch):
+    if not fresnel:
+        monkeypatch.setattr(spiral, 'special', None)
+
+    radius, length = 300e3, 80e3
+    distances = np.linspace(0.0, length, 21)
+
+    along, across, theta = spiral.get_local_coordinates(
+        distances, radius, length)
+
+    # Clothoid totals of the scalar series at each distance
+    for i, distance in enumerate(distances):
+        angle = distance ** 2 / (2 * radius * length)
+
+        assert theta[i] == pytest.approx(angle)
+        assert along[i] == pytest.approx(
+            distance * spiral._calc_total_x(angle), rel=0, abs=1e-6)
+        assert across[i] == pytest.approx(
+            distance * spiral._calc_total_y(angle), rel=0, abs=1e-6)
+
+
+@pytest.mark.parametrize("direction", [1.0, -1.0])
+def test_point_arrays_lie_on_curves(direction):
+    geometry, reference = chain(turn(direction))
+
+    for geo, (distances, curve, bearings) in zip(geometry, reference):
+        if geo['Type'] == 'Line':
+            continue
+
+        module = {'Curve': arc, 'Spiral': spiral}[geo['Type']]
+        points = module.get_point_array(geo, size=5.0, method='Interval')
+
+        assert np.allclose(points[0, :2], geo['Start'][:2])
+        assert np.allclose(points[-1, :2], geo['End'][:2], rtol=0, atol=1e-3)
+        assert (polyline_distances(points[:, :2], curve) < 1e-3).all()
+
+        # Vector lists of the scalar interface hold the same points
+        assert np.allclose(
+            np.array(module.get_points(geo, 5.0, 'Interval')), points)
+
+
+def test_discretize_geometry_follows_the_alignment():
+    model, reference = chain_model(turn(1.0))
+    geometry = model.data['geometry']
+
+    curves, spirals, lines, points = model.discretize_geometry(
+        method='Interval', delta=7.0, types=True)
+
+    assert (len(curves), len(spirals), len(lines)) == (1, 2, 2)
+    assert np.allclose(points[0, :2], geometry[0]['Start'][:2])
+    assert np.allclose(points[-1, :2], geometry[-1]['End'][:2])
+
+    # Junction points appear once
+    assert (np.linalg.norm(np.diff(points, axis=0), axis=1) >= 0.01).all()
+
+    curve = np.vstack([i[1] for i in reference])
+    assert (polyline_distances(points[:, :2], curve) < 1e-3).all()
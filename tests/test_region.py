@@ -0,0 +1,95 @@
+'''
+Tests of region guide line station generation.
+'''
+
+import types
+
+import numpy as np
+
+from freecad.trails.geomatics.region.region_func import RegionFunc
+
+
+def line_alignment(length):
+    """
+    Return a stand-in of a plain line alignment object.
+    """
+    return types.SimpleNamespace(
+        Proxy=object(), Length=types.SimpleNamespace(Value=length))
+
+
+def model_alignment(elements, start):
+    """
+    Return a stand-in of an alignment object with a model of (type,
+    length) elements and no station equations.
+    """
+    geometry = []
+    position = 0.0
+    for kind, length in elements:
+        geometry.append({
+            'Type': kind, 'Length': length,
+            'InternalStation': (position, position + length)})
+        position += length
+
+    model = types.SimpleNamespace(
+        data={
+            'meta': {'StartStation': start, 'Length': position},
+            'geometry': geometry,
+            'station': [{'Back': start, 'Ahead': start}]},
+        get_equation_table=lambda first, equations: (
+            np.array([first]), np.array([np.inf]), np.zeros(1)))
+
+    return types.SimpleNamespace(Proxy=types.SimpleNamespace(model=model))
+
+
+def test_increment_stations_matches_loop():
+    first = np.array([0.0, 12.5, 40.0, 47.0])
+    last = np.array([12.5, 40.0, 47.0, 80.0])
+    increment = np.array([5.0, 10.0, 0.0, 3.0])
+
+    stations, piece = RegionFunc.increment_stations(first, last, increment)
+
+    expected = []
+    for i, (a, b, step) in enumerate(zip(first, last, increment)):
+        if step <= 0: continue
+        value = np.ceil(a / step) * step
+        while value < b:
+            expected.append((value, i))
+            value += step
+
+    assert np.allclose(stations, [i[0] for i in expected])
+    assert piece.tolist() == [i[1] for i in expected]
+
+
+def test_generate_on_line():
+    stations = RegionFunc().generate(
+        line_alignment(1234.5e3), [250e3, 1e3, 1e3], [0, 1e12])
+
+    assert np.allclose(stations, [0, 250, 500, 750, 1000, 1234.5])
+
+
+def test_generate_on_elements():
+    elements = [('Line', 120e3), ('Curve', 35e3), ('Spiral', 20e3)]
+    increments = [50e3, 10e3, 5e3]
+    alignment = model_alignment(elements, 100.0)
+
+    stations = RegionFunc().generate(alignment, increments, [0, 1e12])
+
+    # Multiples of the element increment and element limits
+    expected = set()
+    begin = 100.0
+    for (kind, length), step in zip(elements, increments):
+        end = begin + length / 1000
+        value = np.ceil(begin / (step / 1000)) * step / 1000
+        while value < end - 1e-9:
+            expected.add(round(value, 6))
+            value += step / 1000
+        expected.update([round(begin, 6), round(end, 6)])
+        begin = end
+
+    assert np.allclose(stations, sorted(expected))
+
+    # Region limits and stations of element starts only when requested
+    limited = RegionFunc().generate(
+        alignment, increments, [130e3, 240e3], horiz_pnts=False)
+
+    assert np.allclose(limited, [150, 200, 220, 230, 240])
@@ -0,0 +1,91 @@
+'''
+Tests of section sampling against surfaces.
+'''
+
+import numpy as np
+
+from freecad.trails.geomatics.surface.surface_func import DataFunctions
+from freecad.trails.geomatics.surface.triangle_index import TriangleIndex
+from freecad.trails.geomatics.section.section_sampler import (
+    sample_lines, sample_surfaces)
+
+
+def random_surface(seed, count=300, size=1e4):
+    """
+    Return a triangle index of a random surface.
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.random((count, 3)) * [size, size, 100]
+
+    return TriangleIndex(points, DataFunctions.full_delaunay(points))
+
+
+def edge_crossings(index, start, end):
+    """
+    Return parameters along a segment of its crossings with every mesh
+    edge and of its ends inside the triangulation, by brute force.
+    """
+    edges = np.unique(np.sort(np.concatenate([
+        index.facets[:, [0, 1]], index.facets[:, [1, 2]],
+        index.facets[:, [2, 0]]]), axis=1), axis=0)
+
+    p, q = index.points[edges[:, 0], :2], index.points[edges[:, 1], :2]
+    r, s = end - start, q - p
+
+    denominator = r[0] * s[:, 1] - r[1] * s[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((p[:, 0] - start[0]) * s[:, 1] - (p[:, 1] - start[1]) * s[:, 0]) \
+            / denominator
+        u = ((p[:, 0] - start[0]) * r[1] - (p[:, 1] - start[1]) * r[0]) \
+            / denominator
+
+    hit = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    ends = np.array([0.0, 1.0])
+    inside = index.locate(*np.array([start, end]).T)[0] >= 0
+
+    return np.sort(np.concatenate([t[hit], ends[inside]]))
+
+
+def test_sample_lines_matches_brute_force():
+    index = random_surface(1)
+    rng = np.random.default_rng(2)
+
+    lines = []
+    for i in range(80):
+        start, end = rng.random((2, 2)) * 1.2e4 - 1e3
+        lines.append(np.array([[*start, 0.0], [*end, 0.0]]))
+
+    profiles = sample_lines(index, lines, backend='Serial')
+
+    for line, profile in zip(lines, profiles):
+        start, end = line[0, :2], line[1, :2]
+        expected = edge_crossings(index, start, end)
+        length = np.hypot(*(end - start))
+
+        # Sampled points lie on the segment, on the surface, in order
+        t = np.hypot(*(profile[:, :2] - start).T) / length
+        assert np.allclose(np.unique(np.round(t, 9)), np.unique(np.round(expected, 9)))
+        assert np.all(np.diff(t) >= -1e-12)
+        assert np.allclose(profile[:, 2], index.elevations_at(
+            profile[:, 0], profile[:, 1]))
+
+
+def test_sample_backends_agree():
+    indexes = [random_surface(3), random_surface(4)]
+    rng = np.random.default_rng(5)
+
+    lines = []
+    for i in range(200):
+        start, end = rng.random((2, 2)) * 1e4
+        middle = (start + end) / 2 + rng.normal(0, 500, 2)
+        lines.append(np.column_stack([[start, middle, end], np.zeros(3)]))
+
+    jobs = [(index, lines) for index in indexes]
+    serial = sample_surfaces(jobs, backend='Serial')
+    threads = sample_surfaces(jobs, backend='Thread', workers=4)
+
+    for first, second in zip(serial, threads):
+        assert len(first) == len(second) == len(lines)
+        for a, b in zip(first, second):
+            assert a.shape == b.shape
+            assert np.allclose(a, b, rtol=0, atol=1e-6)
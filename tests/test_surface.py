@@ -0,0 +1,206 @@
+'''
+Tests of surface triangulation, contour and boundary engines.
+'''
+
+import types
+
+import numpy as np
+import pytest
+
+from freecad.trails.geomatics.point.point_group import PointGroup
+from freecad.trails.geomatics.surface.surface import Surface
+from freecad.trails.geomatics.surface.surface_func import (
+    DataFunctions, ViewFunctions, orient_ccw)
+from freecad.trails.geomatics.surface.triangle_index import TriangleIndex
+
+
+def triangle_set(simplices):
+    """
+    Return triangles as a set of sorted vertex index tuples.
+    """
+    simplices = np.asarray(simplices).reshape(-1, 3)
+    return set(map(tuple, np.sort(simplices, axis=1).tolist()))
+
+
+def grid_surface(size=20, step=1000.0, height=lambda x, y: 0 * x):
+    """
+    Return points and facets of a regular triangulated grid.
+    """
+    x, y = np.meshgrid(np.arange(size + 1) * step, np.arange(size + 1) * step)
+    x, y = x.ravel(), y.ravel()
+    points = np.column_stack([x, y, height(x, y)])
+
+    corner = (np.arange(size)[:, None] * (size + 1) + np.arange(size)).ravel()
+    facets = np.vstack([
+        np.column_stack([corner, corner + 1, corner + size + 2]),
+        np.column_stack([corner, corner + size + 2, corner + size + 1])])
+
+    return points, facets
+
+
+def surface_proxy():
+    """
+    Return a surface proxy as restored from a file and a stand-in of its
+    document object.
+    """
+    proxy = Surface.__new__(Surface)
+    proxy.__setstate__('Trails::Surface')
+    obj = types.SimpleNamespace(
+        State=[], PointGroups=[], Vectors=[], Delaunay=[])
+
+    return proxy, obj
+
+
+@pytest.mark.parametrize("edit", ["add", "remove", "replace"])
+def test_incremental_delaunay_matches_full_rebuild(edit):
+    rng = np.random.default_rng(1)
+    points = rng.random((5000, 3)) * [1e6, 1e6, 1e4] + [5e8, 4e9, 0]
+
+    surface = DataFunctions()
+    surface.reset_triangulation()
+    surface.triangulate(points)
+
+    # Edit the points of a small area
+    center = np.array([5e8 + 4e5, 4e9 + 6e5])
+    distance = np.hypot(*(points[:, :2] - center).T)
+    added = np.column_stack([
+        center + rng.normal(0, 2e4, (100, 2)), rng.random(100) * 1e4])
+
+    if edit == "add":
+        points = np.vstack([points, added])
+    elif edit == "remove":
+        points = points[distance > 3e4]
+    else:
+        points = np.vstack([points[distance > 1e4], added])
+        points = points[rng.permutation(len(points))]
+
+    simplices = surface.triangulate(points)
+
+    assert (surface.tri_source >= 0).any()
+    assert triangle_set(simplices) \
+        == triangle_set(DataFunctions.full_delaunay(points))
+
+
+def test_orient_ccw():
+    rng = np.random.default_rng(2)
+    points = rng.random((50, 3))
+    facets = rng.permutation(50)[:48].reshape(-1, 3)
+
+    oriented = orient_ccw(points, facets)
+
+    assert (DataFunctions.signed_areas(points[:, :2], oriented) > 0).all()
+    assert triangle_set(oriented) == triangle_set(facets)
+
+
+def test_contour_lines_of_plane():
+    points, facets = grid_surface(height=lambda x, y: x / 100)
+
+    lines = DataFunctions.contour_lines(points, facets, 15.0)
+
+    assert sorted(i for i, line in lines) == list(range(1, 14))
+    for i, line in lines:
+        # Straight lines across the whole grid, higher side on the right
+        assert np.allclose(line[:, 0], i * 1500.0)
+        assert np.allclose(line[:, 2], i * 15.0)
+        assert line[0, 1] == pytest.approx(0.0)
+        assert line[-1, 1] == pytest.approx(20000.0)
+
+
+def test_boundary_loops_with_hole():
+    points, facets = grid_surface()
+
+    # Remove the triangles of a 4 x 4 block of cells
+    cell = np.concatenate([np.arange(400)] * 2)
+    column, row = cell % 20, cell // 20
+    hole = (column >= 8) & (column < 12) & (row >= 8) & (row < 12)
+
+    loops = DataFunctions.boundary_loops(points, facets[~hole])
+
+    def area(loop):
+        x, y = points[loop, 0], points[loop, 1]
+        return (np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2
+
+    assert len(loops) == 2
+    assert area(loops[0]) == pytest.approx(20000.0 ** 2)
+    assert area(loops[1]) == pytest.approx(-4000.0 ** 2)
+
+
+def test_cluster_mesh_keeps_facets_counterclockwise():
+    points, facets = grid_surface(height=lambda x, y: x + y)
+
+    vertices, merged, source = ViewFunctions.cluster_mesh(points, facets, 2500.0)
+
+    assert len(merged) < len(facets)
+    assert (DataFunctions.signed_areas(vertices[:, :2], merged) > 0).all()
+    assert (source < len(facets)).all()
+
+
+def test_triangle_index_locate_matches_brute_force():
+    rng = np.random.default_rng(3)
+    points = rng.random((400, 3)) * [1e4, 1e4, 100]
+    facets = DataFunctions.full_delaunay(points)
+    index = TriangleIndex(points, facets)
+
+    query = rng.random((2000, 2)) * 1.2e4 - 1e3
+    found, weights = index.locate(query[:, 0], query[:, 1])
+
+    # Barycentric coordinates against every triangle
+    a, b, c = (points[facets[:, i], :2] for i in range(3))
+    d = query[:, None] - a
+    u_axis, v_axis = b - a, c - a
+    det = u_axis[:, 0] * v_axis[:, 1] - u_axis[:, 1] * v_axis[:, 0]
+    u = (d[..., 0] * v_axis[:, 1] - d[..., 1] * v_axis[:, 0]) / det
+    v = (u_axis[:, 0] * d[..., 1] - u_axis[:, 1] * d[..., 0]) / det
+    inside = (u >= -1e-9) & (v >= -1e-9) & (u + v <= 1 + 1e-9)
+
+    assert ((found >= 0) == inside.any(axis=1)).all()
+
+    hit = np.flatnonzero(found >= 0)
+    assert inside[hit, found[hit]].all()
+    assert np.allclose(weights[hit].sum(axis=1), 1)
+
+    z = index.elevations_at(query[:, 0], query[:, 1])
+    expected = np.einsum(
+        'ij,ij->i', weights[hit], points[:, 2][facets[found[hit]]])
+    assert np.allclose(z[hit], expected)
+    assert np.isnan(z[found < 0]).all()
+
+
+def test_assigned_triangles_replace_triangulation():
+    proxy, obj = surface_proxy()
+    points, facets = grid_surface()
+
+    # Points of a new surface are triangulated on the next recompute
+    obj.Vectors = points.tolist()
+    proxy.onChanged(obj, 'Vectors')
+    assert 'triangulation' in proxy.dirty
+
+    # Unless triangles are imported with them
+    obj.Delaunay = facets.ravel().tolist()
+    proxy.onChanged(obj, 'Delaunay')
+    assert 'triangulation' not in proxy.dirty and 'mesh' in proxy.dirty
+    assert proxy.tri_simplices is None
+
+
+def test_point_group_edits_update_points():
+    proxy, obj = surface_proxy()
+    proxy.get_cache_key = lambda obj: ''
+
+    group = PointGroup.__new__(PointGroup)
+    group.__setstate__('Trails::PointGroup')
+    member = types.SimpleNamespace(
+        Name='PointGroup', Proxy=group, State=[], Vectors=[(1.0, 2.0, 3.0)],
+        getPropertyByName=lambda prop: [])
+    obj.PointGroups = [member]
+
+    # Restored groups are not copied again
+    proxy.execute(obj)
+    assert obj.Vectors == []
+
+    group.onChanged(member, 'Vectors')
+    proxy.execute(obj)
+    assert obj.Vectors == [(1.0, 2.0, 3.0)]
+
+    member.Vectors = []
+    proxy.execute(obj)
+    assert obj.Vectors == [(1.0, 2.0, 3.0)]
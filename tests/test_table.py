@@ -0,0 +1,95 @@
+'''
+Tests of volume table and mass haul engines.
+'''
+
+import numpy as np
+import pytest
+
+from freecad.trails.geomatics.table.table_func import TableFunc
+
+
+def haul_inputs(count=2000, seed=1):
+    """
+    Return stations and cut, fill volumes alternating along them.
+    """
+    rng = np.random.default_rng(seed)
+    stations = np.cumsum(rng.random(count) * 20)
+    phase = np.sin(stations / 700)
+
+    volumes = np.zeros((count, 2))
+    volumes[:, 0] = np.maximum(phase, 0) * rng.random(count) * 300
+    volumes[:, 1] = np.maximum(-phase, 0) * rng.random(count) * 300
+
+    return stations, volumes
+
+
+def test_mass_haul_matches_brute_force():
+    stations, volumes = haul_inputs()
+    distance = 150.0
+
+    ordinates, balance, loops = TableFunc().mass_haul(
+        stations, volumes, (0.9, 1.0), distance)
+
+    assert np.allclose(ordinates, np.cumsum(volumes[:, 0] * 0.9 - volumes[:, 1]))
+
+    # Balance stations are where the interpolated mass curve is zero
+    assert np.allclose(np.interp(balance, stations, ordinates), 0, atol=1e-6)
+    assert len(balance) == np.count_nonzero(
+        np.diff(np.sign(ordinates[ordinates != 0])))
+
+    # Free haul levels and overhauls on a dense grid
+    x = np.linspace(stations[0], stations[-1], 2000001)
+    mass = np.abs(np.interp(x, stations, ordinates))
+    dx = x[1] - x[0]
+
+    for start, end, level, overhaul in zip(*loops):
+        part = mass[(x >= start) & (x <= end)]
+        width = np.sum(part >= level) * dx
+        assert width == pytest.approx(min(distance, (end - start)), abs=0.5) \
+            or level == 0
+
+        expected = max(np.sum(np.minimum(part, level)) * dx - level * distance, 0)
+        assert overhaul == pytest.approx(expected, rel=1e-3, abs=10)
+
+
+def test_mass_haul_updates_match_fresh_results():
+    stations, volumes = haul_inputs()
+    table = TableFunc()
+    table.mass_haul(stations, volumes, (0.9, 1.0), 150.0)
+
+    volumes[1500, 0] += 500
+    updated = table.mass_haul(stations, volumes, (0.9, 1.0), 150.0)
+    fresh = TableFunc().mass_haul(stations, volumes, (0.9, 1.0), 150.0)
+
+    assert np.allclose(updated[0], fresh[0])
+    assert np.allclose(updated[1], fresh[1])
+    for a, b in zip(updated[2], fresh[2]):
+        assert np.allclose(a, b)
+
+
+def test_mass_haul_of_empty_stations():
+    ordinates, balance, loops = TableFunc().mass_haul([], [])
+
+    assert len(ordinates) == len(balance) == 0
+    assert all(len(i) == 0 for i in loops)
+
+
+def test_average_end_area_volumes():
+    table = TableFunc()
+
+    # Station, cut area, fill area, cut width, offset, fill width, offset, curvature
+    inputs = np.zeros((3, len(TableFunc.columns)))
+    inputs[:, 0] = [0, 20, 50]
+    inputs[:, 1] = [10e6, 30e6, 0]
+    inputs[:, 2] = [0, 4e6, 8e6]
+
+    volumes, totals = table.volume_table(inputs)
+
+    assert np.allclose(volumes, [[0, 0], [400, 40], [450, 180]])
+    assert np.allclose(totals[-1], [850, 220])
+
+    # Changed rows give the same result as a new table
+    inputs[2, 1] = 6e6
+    updated = table.volume_table(inputs)[0]
+    table.volume_cache = None
+    assert np.allclose(updated, table.volume_table(inputs)[0])
@@ -0,0 +1,136 @@
+'''
+Tests of volume engines between surfaces and section profiles.
+'''
+
+import types
+
+import numpy as np
+import pytest
+
+from freecad.trails.geomatics.surface.surface_func import DataFunctions
+from freecad.trails.geomatics.surface.triangle_index import TriangleIndex
+from freecad.trails.geomatics.volume.tin_volume import (
+    composite_volume, surface_volumes)
+from freecad.trails.geomatics.volume.volume_func import VolumeFunc
+
+
+def plane_surface(seed, count, height, size=1e5):
+    """
+    Return a triangle index of a randomly triangulated square plane.
+    """
+    rng = np.random.default_rng(seed)
+    xy = np.vstack([
+        rng.random((count, 2)) * size,
+        [[0, 0], [size, 0], [0, size], [size, size]]])
+    points = np.column_stack([xy, height(xy[:, 0], xy[:, 1])])
+
+    return TriangleIndex(points, DataFunctions.full_delaunay(points))
+
+
+def test_composite_volume_of_planes():
+    top = plane_surface(1, 2000, lambda x, y: x - 5e4)
+    bottom = plane_surface(2, 3000, lambda x, y: 0 * x)
+
+    cut, fill, net = composite_volume(top, bottom, chunk=1000)
+
+    # Half of the square is above, half below the bottom plane
+    expected = 1e5 * 5e4 ** 2 / 2
+    assert cut == pytest.approx(expected, rel=1e-9)
+    assert fill == pytest.approx(expected, rel=1e-9)
+    assert net == pytest.approx(0, abs=expected * 1e-9)
+
+
+def test_composite_volume_of_offset_planes():
+    top = plane_surface(3, 500, lambda x, y: 0 * x + 2000)
+    bottom = plane_surface(4, 700, lambda x, y: 0 * x + 500)
+
+    cut, fill, net = composite_volume(top, bottom)
+
+    assert cut == pytest.approx(1e10 * 1500, rel=1e-9)
+    assert fill == pytest.approx(0, abs=1)
+    assert net == pytest.approx(cut)
+
+
+def test_surface_volumes_in_cubic_meters():
+    def surface(index):
+        return types.SimpleNamespace(
+            Proxy=types.SimpleNamespace(get_index=lambda: index))
+
+    top = plane_surface(5, 300, lambda x, y: 0 * x + 1000)
+    bottom = plane_surface(6, 300, lambda x, y: 0 * x)
+
+    cut, fill, net = surface_volumes(surface(top), surface(bottom))
+
+    # 100 m x 100 m x 1 m
+    assert cut == pytest.approx(1e4, rel=1e-9)
+    assert net == pytest.approx(1e4, rel=1e-9)
+
+
+def test_between_profiles_matches_dense_sampling():
+    rng = np.random.default_rng(7)
+
+    def profile(count):
+        x = np.sort(rng.random(count) * 3e4 + rng.random() * 5e3)
+        return np.column_stack([x, rng.random(count) * 100])
+
+    stations = 30
+    tops = [[profile(rng.integers(2, 30)) for i in range(stations)]
+        for j in range(2)]
+    bottoms = [[profile(rng.integers(2, 30)) for i in range(stations)]]
+
+    cut, fill, grid = VolumeFunc.between_profiles(tops, bottoms)
+
+    for i in range(stations):
+        first = max(p[i][0, 0] for p in tops + bottoms)
+        last = min(p[i][-1, 0] for p in tops + bottoms)
+        if last <= first:
+            assert cut[i] == fill[i] == 0
+            continue
+
+        # Lowest top against highest bottom on a dense grid
+        x = np.linspace(first, last, 400001)
+        top = np.min([np.interp(x, p[i][:, 0], p[i][:, 1]) for p in tops], axis=0)
+        bottom = np.max(
+            [np.interp(x, p[i][:, 0], p[i][:, 1]) for p in bottoms], axis=0)
+        d = top - bottom
+        dx = np.diff(x)
+
+        expected_cut = np.sum((np.maximum(d[:-1], 0) + np.maximum(d[1:], 0)) / 2 * dx)
+        expected_fill = np.sum((np.maximum(-d[:-1], 0) + np.maximum(-d[1:], 0)) / 2 * dx)
+
+        assert cut[i] == pytest.approx(expected_cut, rel=1e-4, abs=1)
+        assert fill[i] == pytest.approx(expected_fill, rel=1e-4, abs=1)
+
+
+def test_area_mesh_matches_areas():
+    rng = np.random.default_rng(8)
+    x = np.linspace(0, 2e4, 21)
+    tops = [[np.column_stack([x, rng.random(21) * 100]) for i in range(5)]]
+    bottoms = [[np.column_stack([x, rng.random(21) * 100]) for i in range(5)]]
+
+    cut, fill, grid = VolumeFunc.between_profiles(tops, bottoms)
+
+    for fill_side, expected in ((False, cut), (True, fill)):
+        vertices, triangles = VolumeFunc.area_mesh(*grid, fill=fill_side)
+        corners = vertices[triangles][:, :, :2]
+        u, v = corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+        areas = np.abs(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]) / 2
+
+        assert areas.sum() == pytest.approx(expected.sum(), rel=1e-9)
+
+
+def test_between_profiles_pads_missing_stations():
+    x = np.linspace(0, 1e4, 11)
+    top = np.column_stack([x, 0 * x + 100])
+    bottom = np.column_stack([x, 0 * x])
+
+    # The bottom section ends two stations before the guide lines
+    cut, fill, grid = VolumeFunc.between_profiles(
+        [[top] * 5], [[bottom] * 3], 5)
+
+    assert np.allclose(cut, [1e6, 1e6, 1e6, 0, 0])
+    assert np.allclose(fill, 0)
+    assert len(VolumeFunc.area_statistics(*grid, 5)[0]) == 5
+
+    with pytest.raises(ValueError):
+        VolumeFunc.between_profiles([[top] * 5], [[bottom] * 3], 4)